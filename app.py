@@ -1,21 +1,51 @@
 import os
+import sys
+import asyncio
 import logging
-import duckdb
-import pandas as pd
+import functools
+import threading
+import time
 from dotenv import load_dotenv
-from ortools.sat.python import cp_model
-from shiny import App, ui, render, reactive
-import plotly.express as px
-from shinywidgets import output_widget, render_widget
+from shiny import App, ui, render, reactive, req
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from dataset_cache import DatasetCache
+from solve_cache import SolveCache
+from solver_pool import SolverPool, QueueTimeout
+import telemetry
+
+# ortools, plotly, shinywidgets and duckdb are imported on first use; the
+# warm-up thread below pulls them in while the worker is already serving
 
 load_dotenv()
 S3_URL = os.getenv(
     "S3_URL",
     "https://stat468-final-project.s3.us-east-1.amazonaws.com/player_predictions.csv",
 )
+DATASET = DatasetCache(
+    S3_URL,
+    cache_dir=os.getenv("DATASET_CACHE_DIR", "data/cache"),
+    ttl=float(os.getenv("DATASET_CACHE_TTL", "300")),
+)
+RESULTS = SolveCache(
+    max_entries=int(os.getenv("SOLVE_CACHE_ENTRIES", "256")),
+    max_bytes=int(os.getenv("SOLVE_CACHE_BYTES", str(32 * 1024 * 1024))),
+)
+DATASET.add_listener(RESULTS.clear)
+
+# shared by every session: bounded concurrency, round robin across sessions,
+# CP-SAT workers sized to the free cores
+SOLVER = SolverPool()
+INCUMBENT_POLL = 0.25
+QUEUE_POLL = 0.5
+SOLVER_ENGINE = os.getenv("SOLVER_ENGINE")
+# local copy of the dataset installed as the snapshot when the cache has none
+SNAPSHOT_FILE = os.getenv("APP_SNAPSHOT", "data/processed/player_predictions.csv")
+WARMUP = os.getenv("APP_WARMUP", "1") == "1"
+WARM_SOLVE = os.getenv("APP_WARM_SOLVE", "1") == "1"
 
 logging.basicConfig(
-    filename="app.log",
+    filename=telemetry.LOG_FILE,
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(message)s"
 )
@@ -26,22 +56,76 @@ MIN_FORWARDS = 12
 MIN_DEFENSEMEN = 6
 MUST_INCLUDE = ["Auston Matthews", "William Nylander"]
 MUST_EXCLUDE = ["Mitch Marner"]
-EXCLUDE_LEAGUE_MIN = True
-LEAGUE_MIN = 999_000
 
-def to_group(pos):
-    p = str(pos).upper().strip()
-    if p == "D" or p == "LD" or p == "RD":
-        return "D"
-    else:
-        return "F"
+class Incumbent:
+    # Latest improving roster reported by the solver thread for one session.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._control = None
+        self._result = None
+
+    def reset(self, control):
+        with self._lock:
+            self._control = control
+            self._result = None
+
+    def offer(self, control, result):
+        with self._lock:
+            if control is self._control:
+                self._result = result
+
+    def take(self, control):
+        with self._lock:
+            if control is not self._control:
+                return None
+            result = self._result
+            self._result = None
+            return result
+
+def split_names(raw):
+    names = []
+    if raw is not None:
+        parts = str(raw).split(",")
+        i = 0
+        while i < len(parts):
+            s = parts[i].strip()
+            if s != "":
+                names.append(s)
+            i = i + 1
+    return names
 
 def load_data():
-    con = duckdb.connect()
-    con.execute("INSTALL httpfs;")
-    con.execute("LOAD httpfs;")
-    df = con.execute("SELECT * FROM read_csv_auto($1)", [S3_URL]).df()
-    return df
+    return DATASET.get()
+
+def warm_up():
+    # Runs once per worker in the background: heavy imports, the dataset
+    # from the local snapshot, and the default roster so the first click is
+    # a cache hit.
+    start = time.perf_counter()
+    try:
+        import pandas
+        import roster_model
+        import cap_frontier
+        import plotly.express
+        import shinywidgets
+        import league_plot
+        if os.path.exists(SNAPSHOT_FILE):
+            DATASET.seed(SNAPSHOT_FILE)
+        df = load_data()
+        league_plot.league_points(df, DATASET.version)
+        if WARM_SOLVE:
+            # through the shared pool like any click, so it is admitted and
+            # sized with the sessions already being served
+            SOLVER.submit(
+                "warm-up", optimize_roster,
+                df, CAP, ROSTER_SIZE, MIN_FORWARDS, MIN_DEFENSEMEN, MUST_INCLUDE, MUST_EXCLUDE,
+            ).future.result()
+        logging.info("warm-up done in %.2fs", time.perf_counter() - start)
+    except Exception:
+        logging.exception("warm-up failed")
+    finally:
+        WARM.set()
 
 def optimize_roster(
     df,
@@ -51,135 +135,109 @@ def optimize_roster(
     min_defense,
     must_include,
     must_exclude,
+    control=None,
+    hint=None,
+    trace=None,
+    num_workers=None,
 ):
-    df = df.copy()
-    df["cap_hit"] = pd.to_numeric(df["cap_hit"], errors="coerce")
-    df["pred_mp_value"] = pd.to_numeric(df["pred_mp_value"], errors="coerce")
-    df = df[df["cap_hit"].notna() & (df["cap_hit"] > 0)]
-    df = df[df["pred_mp_value"].notna()]
-    df["group"] = df["position"].apply(to_group)
-    if EXCLUDE_LEAGUE_MIN:
-        df = df[df["cap_hit"] > LEAGUE_MIN]
-    if must_exclude and len(must_exclude) > 0:
-        df = df[~df["Name"].isin(must_exclude)]
-    nF = int((df["group"] == "F").sum())
-    nD = int((df["group"] == "D").sum())
-    f_min = min(int(min_forwards), nF)
-    d_min = min(int(min_defense), nD)
-    while f_min + d_min > int(roster_size) and f_min > 0:
-        f_min = f_min - 1
-    while f_min + d_min > int(roster_size) and d_min > 0:
-        d_min = d_min - 1
-    idx = list(df.index)
-    F_idx = []
-    D_idx = []
-    i = 0
-    while i < len(idx):
-        row_i = idx[i]
-        if df.loc[row_i, "group"] == "F":
-            F_idx.append(row_i)
-        else:
-            if df.loc[row_i, "group"] == "D":
-                D_idx.append(row_i)
-        i = i + 1
-    model = cp_model.CpModel()
-    x = {}
-    i = 0
-    while i < len(idx):
-        row_i = idx[i]
-        x[row_i] = model.NewBoolVar("x_" + str(row_i))
-        i = i + 1
-    SCALE = 1000
-    obj_terms = []
-    i = 0
-    while i < len(idx):
-        row_i = idx[i]
-        val_scaled = int(df.loc[row_i, "pred_mp_value"] * SCALE)
-        obj_terms.append(val_scaled * x[row_i])
-        i = i + 1
-    model.Maximize(sum(obj_terms))
-    cap_terms = []
-    i = 0
-    while i < len(idx):
-        row_i = idx[i]
-        cap_terms.append(int(df.loc[row_i, "cap_hit"]) * x[row_i])
-        i = i + 1
-    model.Add(sum(cap_terms) <= int(cap))
-    size_terms = []
-    i = 0
-    while i < len(idx):
-        row_i = idx[i]
-        size_terms.append(x[row_i])
-        i = i + 1
-    model.Add(sum(size_terms) == int(roster_size))
-    f_terms = []
-    i = 0
-    while i < len(F_idx):
-        row_i = F_idx[i]
-        f_terms.append(x[row_i])
-        i = i + 1
-    model.Add(sum(f_terms) >= f_min)
-    d_terms = []
-    i = 0
-    while i < len(D_idx):
-        row_i = D_idx[i]
-        d_terms.append(x[row_i])
-        i = i + 1
-    model.Add(sum(d_terms) >= d_min)
-    if must_include and len(must_include) > 0:
-        ni = 0
-        while ni < len(must_include):
-            name_needed = must_include[ni]
-            rows = df.index[df["Name"] == name_needed].tolist()
-            rj = 0
-            while rj < len(rows):
-                r = rows[rj]
-                model.Add(x[r] == 1)
-                rj = rj + 1
-            ni = ni + 1
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 10
-    solver.parameters.num_search_workers = 8
-    solver.Solve(model)
-    chosen = []
-    i = 0
-    while i < len(idx):
-        row_i = idx[i]
-        if solver.Value(x[row_i]) == 1:
-            chosen.append(row_i)
-        i = i + 1
-    cols = ["Name", "team", "position", "group", "cap_hit", "pred_mp_value"]
-    if "mp_value" in df.columns:
-        cols.append("mp_value")
-    roster = df.loc[chosen, cols].copy()
-    if not roster.empty:
-        roster = roster.sort_values(["group", "pred_mp_value"], ascending=[True, False])
-    total_cap = 0.0
-    total_val = 0.0
-    if not roster.empty:
-        total_cap = float(roster["cap_hit"].sum())
-        total_val = float(roster["pred_mp_value"].sum())
-    return roster, total_cap, total_val
-
-app_ui = ui.page_fluid(
-    ui.h2("Simple Skater Roster Optimizer"),
-    ui.input_numeric("cap", "Salary Cap ($)", CAP),
-    ui.input_numeric("roster_size", "Roster Size", ROSTER_SIZE),
-    ui.input_numeric("min_forwards", "Minimum Forwards", MIN_FORWARDS),
-    ui.input_numeric("min_defense", "Minimum Defensemen", MIN_DEFENSEMEN),
-    ui.input_text("must_include", "Must Include (comma separated)", ", ".join(MUST_INCLUDE)),
-    ui.input_text("must_exclude", "Must Exclude (comma separated)", ", ".join(MUST_EXCLUDE)),
-    ui.input_action_button("run", "Run Optimizer"),
-    ui.hr(),
-    ui.h4("Summary"),
-    ui.output_text("summary"),
-    ui.h4("Roster"),
-    ui.output_data_frame("roster_table"),
-    ui.h4("Cap vs Value"),
-    output_widget("scatter"),
-)
+    import roster_model
+
+    # the trace is made current on the pool thread so roster_model's spans
+    # land in this request
+    with telemetry.activate(trace):
+        res = roster_model.solve_roster(
+            df, cap, roster_size, min_forwards, min_defense, must_include, must_exclude,
+            num_workers=num_workers or roster_model.NUM_WORKERS,
+            cache=RESULTS, control=control, hint=hint, engine=SOLVER_ENGINE or roster_model.ENGINE,
+        )
+    if trace is not None:
+        trace.annotate(status=telemetry.status_name(res.status), players=len(res.roster),
+                       total_value=res.total_value)
+    return res.as_tuple()
+
+def run_frontier_traced(trace, df, num_workers=None, stop=None, **kwargs):
+    import cap_frontier
+
+    try:
+        with trace.span("frontier", cores=num_workers):
+            out = cap_frontier.cap_frontier(df, cores=num_workers, stop=stop, **kwargs)
+    finally:
+        if stop is not None:
+            stop.clear()
+    trace.finish(outcome="success", points=len(out))
+    return out
+
+def app_ui(request):
+    from shinywidgets import output_widget
+    import cap_frontier
+
+    return ui.page_fluid(
+        ui.h2("Simple Skater Roster Optimizer"),
+        ui.input_numeric("cap", "Salary Cap ($)", CAP),
+        ui.input_numeric("roster_size", "Roster Size", ROSTER_SIZE),
+        ui.input_numeric("min_forwards", "Minimum Forwards", MIN_FORWARDS),
+        ui.input_numeric("min_defense", "Minimum Defensemen", MIN_DEFENSEMEN),
+        ui.input_text("must_include", "Must Include (comma separated)", ", ".join(MUST_INCLUDE)),
+        ui.input_text("must_exclude", "Must Exclude (comma separated)", ", ".join(MUST_EXCLUDE)),
+        ui.input_action_button("run", "Run Optimizer"),
+        ui.hr(),
+        ui.h4("Summary"),
+        ui.output_text("summary"),
+        ui.output_text("queue_status"),
+        ui.h4("Roster"),
+        ui.output_data_frame("roster_table"),
+        ui.h4("Cap vs Value"),
+        output_widget("scatter"),
+        ui.hr(),
+        ui.h4("Cap Frontier"),
+        ui.input_numeric("frontier_min", "Lowest Cap ($)", cap_frontier.CAP_MIN),
+        ui.input_numeric("frontier_max", "Highest Cap ($)", cap_frontier.CAP_MAX),
+        ui.input_numeric("frontier_step", "Cap Step ($)", cap_frontier.CAP_STEP),
+        ui.input_action_button("run_frontier", "Run Frontier"),
+        output_widget("frontier_plot"),
+        ui.output_data_frame("frontier_table"),
+    )
 
 def server(input, output, session):
+    import pandas as pd
+    from shinywidgets import render_widget
+    import roster_model
+    import cap_frontier
+    import league_plot
+
+    latest = reactive.Value(None)
+    data_version = reactive.Value(DATASET.version)
+    incumbent = Incumbent()
+    current = {"control": None, "last_names": None, "trace": None, "frontier_trace": None,
+               "job": None, "frontier_job": None, "frontier_stop": None, "df": None}
+
+    async def pooled(slot, trace, fn, *args, max_workers=None, **kwargs):
+        # queues the call on the shared solver pool under this session
+        job = SOLVER.submit(session.id, fn, *args, max_workers=max_workers, **kwargs)
+        current[slot] = job
+        try:
+            return await asyncio.wrap_future(job.future)
+        finally:
+            if job.started is not None:
+                trace.record("queue", job.wait_s * 1000.0, {"workers": job.workers})
+
+    @reactive.extended_task
+    async def solve_task(df, cap, roster_size, min_forwards, min_defense, must_inc, must_exc, control, hint, trace):
+        return await pooled(
+            "job", trace, optimize_roster,
+            df=df,
+            cap=cap,
+            roster_size=roster_size,
+            min_forwards=min_forwards,
+            min_defense=min_defense,
+            must_include=must_inc,
+            must_exclude=must_exc,
+            control=control,
+            hint=hint,
+            trace=trace,
+        )
+
+    @reactive.effect
     @reactive.event(input.run)
     def run_optimizer():
         logging.info(
@@ -191,75 +249,217 @@ def server(input, output, session):
             input.must_include(),
             input.must_exclude(),
         )
-        df = load_data()
-        must_inc_raw = input.must_include()
-        must_exc_raw = input.must_exclude()
-        must_inc = []
-        if must_inc_raw is not None:
-            parts = str(must_inc_raw).split(",")
-            i = 0
-            while i < len(parts):
-                s = parts[i].strip()
-                if s != "":
-                    must_inc.append(s)
-                i = i + 1
-        must_exc = []
-        if must_exc_raw is not None:
-            parts = str(must_exc_raw).split(",")
-            i = 0
-            while i < len(parts):
-                s = parts[i].strip()
-                if s != "":
-                    must_exc.append(s)
-                i = i + 1
-        return optimize_roster(
-            df=df,
-            cap=int(input.cap()),
-            roster_size=int(input.roster_size()),
-            min_forwards=int(input.min_forwards()),
-            min_defense=int(input.min_defense()),
+        if current["control"] is not None:
+            current["control"].cancel()
+            solve_task.cancel()
+        if current["trace"] is not None:
+            current["trace"].finish(outcome="cancelled")
+        must_inc = split_names(input.must_include())
+        must_exc = split_names(input.must_exclude())
+        trace = telemetry.Trace(
+            "optimize", cap=input.cap(), roster_size=input.roster_size(),
+            min_forwards=input.min_forwards(), min_defense=input.min_defense(),
+            must_include=len(must_inc), must_exclude=len(must_exc), warm=WARM.is_set(),
+        )
+        current["trace"] = trace
+        current["job"] = None
+        with trace.span("load_data"):
+            df = load_data()
+        current["df"] = df
+        data_version.set(df.attrs.get("dataset_version"))
+        trace.annotate(dataset_version=DATASET.version)
+        control = roster_model.SolveControl()
+        control.on_solution = functools.partial(incumbent.offer, control)
+        current["control"] = control
+        incumbent.reset(control)
+        # the previous constraints' roster must not stand in for this one
+        # while the first incumbent is found
+        latest.set(None)
+        solve_task.invoke(
+            df,
+            int(input.cap()),
+            int(input.roster_size()),
+            int(input.min_forwards()),
+            int(input.min_defense()),
+            must_inc,
+            must_exc,
+            control,
+            current["last_names"],
+            trace,
+        )
+
+    @reactive.effect
+    def stream_incumbents():
+        if solve_task.status() != "running":
+            return
+        reactive.invalidate_later(INCUMBENT_POLL)
+        found = incumbent.take(current["control"])
+        if found is not None:
+            latest.set(found.as_tuple())
+
+    @reactive.effect
+    def finish_solve():
+        if solve_task.status() == "success":
+            res = solve_task.result()
+            latest.set(res)
+            if not res[0].empty:
+                current["last_names"] = res[0]["Name"].tolist()
+            logging.info("solve cache %s", RESULTS.stats())
+            if current["trace"] is not None:
+                current["trace"].finish(outcome="success")
+        elif solve_task.status() == "error":
+            logging.error("solve failed: %s", solve_task.error.get())
+            if current["trace"] is not None:
+                current["trace"].finish(outcome="error", error=str(solve_task.error.get()))
+
+    @reactive.extended_task
+    async def frontier_task(df, cap_min, cap_max, step, roster_size, min_forwards, min_defense, must_inc, must_exc,
+                            trace, stop):
+        # a frontier spreads over processes, so it may claim every core
+        return await pooled(
+            "frontier_job", trace, run_frontier_traced, trace, df,
+            max_workers=SOLVER.cores,
+            stop=stop,
+            cap_min=cap_min,
+            cap_max=cap_max,
+            step=step,
+            roster_size=roster_size,
+            min_forwards=min_forwards,
+            min_defense=min_defense,
             must_include=must_inc,
             must_exclude=must_exc,
         )
 
+    @reactive.effect
+    @reactive.event(input.run_frontier)
+    def run_frontier():
+        logging.info(
+            "frontier clicked min=%s max=%s step=%s",
+            input.frontier_min(),
+            input.frontier_max(),
+            input.frontier_step(),
+        )
+        # cancelling the task only drops a queued job; the stop flag reaches
+        # the pool processes of one that is already running
+        job = current["frontier_job"]
+        if job is not None and job.started is not None and frontier_task.status() == "running":
+            current["frontier_stop"].set()
+        frontier_task.cancel()
+        if current["frontier_trace"] is not None:
+            current["frontier_trace"].finish(outcome="cancelled")
+        trace = telemetry.Trace(
+            "frontier", cap_min=input.frontier_min(), cap_max=input.frontier_max(),
+            step=input.frontier_step(), warm=WARM.is_set(),
+        )
+        current["frontier_trace"] = trace
+        current["frontier_job"] = None
+        stop = cap_frontier.StopFlag()
+        current["frontier_stop"] = stop
+        with trace.span("load_data"):
+            df = load_data()
+        frontier_task.invoke(
+            df,
+            int(input.frontier_min()),
+            int(input.frontier_max()),
+            int(input.frontier_step()),
+            int(input.roster_size()),
+            int(input.min_forwards()),
+            int(input.min_defense()),
+            split_names(input.must_include()),
+            split_names(input.must_exclude()),
+            trace,
+            stop,
+        )
+
+    @output
+    @render.data_frame
+    def frontier_table():
+        if frontier_task.status() != "success":
+            return pd.DataFrame()
+        with telemetry.span("render", trace=current["frontier_trace"], output="table"):
+            out = frontier_task.result()
+            return out[["cap", "best_value", "total_value", "total_cap", "status", "roster"]]
+
+    @output
+    @render_widget
+    def frontier_plot():
+        if frontier_task.status() != "success":
+            return None
+        with telemetry.span("render", trace=current["frontier_trace"], output="plot"):
+            return cap_frontier.frontier_figure(frontier_task.result())
+
     @output
     @render.text
     def summary():
-        res = run_optimizer()
+        res = latest()
         if not res:
+            if solve_task.status() == "running":
+                return "Solving..."
             return "Click Run Optimizer."
         roster, total_cap, total_val = res
         if roster.empty:
             return "No feasible roster."
-        return f"Total Cap: ${total_cap:,.0f} | Total Value: {total_val:.2f}"
+        text = f"Total Cap: ${total_cap:,.0f} | Total Value: {total_val:.2f}"
+        if solve_task.status() == "running":
+            text = text + " (searching for a better roster...)"
+        return text
+
+    @output
+    @render.text
+    def queue_status():
+        parts = []
+        for label, task, slot in [("Optimizer", solve_task, "job"), ("Frontier", frontier_task, "frontier_job")]:
+            status = task.status()
+            if status == "running":
+                reactive.invalidate_later(QUEUE_POLL)
+                job = current[slot]
+                pos = SOLVER.position(job) if job is not None else None
+                if pos:
+                    parts.append("{}: queued, position {} of {} (waiting {:.0f}s)".format(
+                        label, pos, SOLVER.status()["queued"], job.wait_s))
+                elif pos == 0:
+                    parts.append("{}: running on {} of {} cores".format(label, job.workers, SOLVER.cores))
+            elif status == "error" and isinstance(task.error.get(), QueueTimeout):
+                parts.append("{}: the solver is busy right now, please try again".format(label))
+        return " | ".join(parts)
 
     @output
     @render.data_frame
     def roster_table():
-        res = run_optimizer()
+        res = latest()
         if not res:
             return pd.DataFrame()
         roster, _, _ = res
-        return roster.reset_index(drop=True)
+        with telemetry.span("render", trace=current["trace"], output="table"):
+            return roster.reset_index(drop=True)
 
     @output
     @render_widget
     def scatter():
-        res = run_optimizer()
-        if not res:
-            return None
-        roster, _, _ = res
-        if roster.empty:
-            return None
-        fig = px.scatter(
-            roster,
-            x="cap_hit",
-            y="pred_mp_value",
-            color="group",
-            hover_data=["Name", "team", "position"],
-            labels={"cap_hit": "Cap Hit ($)", "pred_mp_value": "Predicted Value"},
-            title="Cap Hit vs Predicted Value",
-        )
-        return fig
+        # the whole league, rebuilt only when the dataset version changes;
+        # rosters are drawn by highlight_roster below
+        data_version()
+        if current["df"] is None and not WARM.is_set():
+            # drawn once the warm-up has the dataset in memory, instead of
+            # blocking the first render on the load
+            reactive.invalidate_later(QUEUE_POLL)
+            req(False)
+        df = current["df"] if current["df"] is not None else load_data()
+        version = df.attrs.get("dataset_version")
+        with telemetry.span("render", trace=current["trace"], output="league"):
+            return league_plot.league_figure(league_plot.league_points(df, version), version)
+
+    @reactive.effect
+    def highlight_roster():
+        res = latest()
+        fig = scatter.widget
+        with telemetry.span("render", trace=current["trace"], output="plot"):
+            league_plot.highlight(fig, res[0] if res else None)
 
 app = App(app_ui, server)
+
+WARM = threading.Event()
+if WARMUP:
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+else:
+    WARM.set()
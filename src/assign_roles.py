@@ -0,0 +1,145 @@
+import os
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+from table_io import read_table, write_table
+
+ARTIFACTS_FILE = "artifacts/clusters/cluster_artifacts.joblib"
+ROLES_FILE = "artifacts/clusters/player_roles.csv"
+IN_FILE = "data/processed/player_salary_efficiency.csv"
+
+KEY_COLS = ["Name", "team"]
+ROLE_COLS = ["Name", "team", "position", "cap_hit", "mp_value"]
+BATCH_ROWS = 50_000
+
+# Share of the input players that sit further from their centroid than
+# 95% of the training players did. About 5% is expected; well above that means
+# the new stats no longer fit the clusters and they are refit.
+DRIFT_THRESHOLD = 0.15
+MIN_DRIFT_ROWS = 30
+
+
+class RoleAssigner:
+    # Labels players with the saved scaler and centroids, without refitting.
+
+    def __init__(self, path=ARTIFACTS_FILE):
+        self.path = path
+        art = joblib.load(path)
+        self.scaler = art["scaler"]
+        self.kmeans = art["kmeans"]
+        self.columns = list(art["columns"])
+        # artifacts from before the medians were saved fall back to the
+        # training means, which the scaler kept
+        self.medians = pd.Series(art.get("medians") or dict(zip(self.columns, self.scaler.mean_)))
+        self.distance_p95 = art.get("distance_p95")
+        self.k = art.get("k", self.kmeans.n_clusters)
+
+    def features(self, df):
+        mat = df.reindex(columns=self.columns).astype(float)
+        mat = mat.replace([np.inf, -np.inf], np.nan)
+        return mat.fillna(self.medians).fillna(0.0)
+
+    def assign(self, df, batch_rows=BATCH_ROWS):
+        # role_distance is the scaled distance to the assigned centroid;
+        # role_margin is 1 - nearest / second nearest, so 0 means the player
+        # sits on the border between two roles
+        mat = self.features(df)
+        labels = np.empty(len(mat), dtype=np.int32)
+        dist = np.empty(len(mat))
+        margin = np.empty(len(mat))
+        for start in range(0, len(mat), batch_rows):
+            block = self.scaler.transform(mat.iloc[start:start + batch_rows].to_numpy())
+            d = self.kmeans.transform(block)
+            order = np.argsort(d, axis=1)
+            nearest = np.take_along_axis(d, order[:, :1], axis=1)[:, 0]
+            second = np.take_along_axis(d, order[:, 1:2], axis=1)[:, 0] if d.shape[1] > 1 else nearest
+            stop = start + len(block)
+            labels[start:stop] = order[:, 0]
+            dist[start:stop] = nearest
+            margin[start:stop] = np.where(second > 0, 1.0 - nearest / np.where(second > 0, second, 1.0), 0.0)
+        return pd.DataFrame({
+            "role_cluster": labels,
+            "role_distance": dist,
+            "role_margin": margin,
+            "feature_hash": feature_hash(mat),
+        }, index=df.index)
+
+    def drift(self, distances):
+        if self.distance_p95 is None or len(distances) < MIN_DRIFT_ROWS:
+            return None
+        return float((np.asarray(distances) > self.distance_p95).mean())
+
+
+def feature_hash(mat):
+    # hex strings survive the CSV round trip, unlike uint64 next to gaps
+    return np.array(["{:016x}".format(h) for h in pd.util.hash_pandas_object(mat, index=False).to_numpy()], dtype=object)
+
+
+def load_roles(path=ROLES_FILE):
+    if not os.path.exists(path) and not os.path.exists(os.path.splitext(path)[0] + ".parquet"):
+        return pd.DataFrame(columns=ROLE_COLS + ["role_cluster"])
+    return read_table(path)
+
+
+def update_roles(df, assigner, roles):
+    # Re-labels only players that are new or whose cluster features changed
+    # since they were last labelled, then upserts them by Name/team.
+    df = df.drop_duplicates(subset=KEY_COLS, keep="last")
+    hashes = pd.Series(feature_hash(assigner.features(df)), index=df.index)
+    if "feature_hash" in roles.columns and len(roles):
+        known = roles.dropna(subset=["feature_hash"]).set_index(KEY_COLS)["feature_hash"]
+        old = pd.MultiIndex.from_frame(df[KEY_COLS]).map(known.to_dict().get)
+        changed = np.asarray([o is None or str(o) != h for o, h in zip(old, hashes)])
+    else:
+        changed = np.ones(len(df), dtype=bool)
+    todo = df[changed]
+
+    fresh = todo[[c for c in ROLE_COLS if c in todo.columns]].copy()
+    fresh = fresh.join(assigner.assign(todo))
+    keep = roles
+    if len(roles) and len(fresh):
+        hit = pd.MultiIndex.from_frame(roles[KEY_COLS]).isin(pd.MultiIndex.from_frame(fresh[KEY_COLS]))
+        keep = roles[~hit]
+    out = pd.concat([keep, fresh], ignore_index=True) if len(keep) else fresh.reset_index(drop=True)
+    return out, fresh
+
+
+def refit(df, k, path=ARTIFACTS_FILE):
+    # refits on the players being labelled, keeping the current k
+    import cluster_roles
+
+    _, artifacts, _ = cluster_roles.cluster(df, k=k, artifacts_path=path)
+    joblib.dump(artifacts, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign roles to new or updated players from the saved clusters.")
+    parser.add_argument("--input", default=IN_FILE, help="player table to label (default: %(default)s)")
+    parser.add_argument("--no-refit", action="store_true", help="never refit, even past the drift threshold")
+    args = parser.parse_args()
+
+    assigner = RoleAssigner()
+    df = read_table(args.input)
+    roles, fresh = update_roles(df, assigner, load_roles())
+    # drift is judged on every player in the input, not just this batch, so
+    # a run with --no-refit does not hide it from the next one
+    current = roles.merge(df[KEY_COLS].drop_duplicates(), on=KEY_COLS)
+    drift = assigner.drift(current["role_distance"].dropna())
+
+    print("Labelled {} new/changed of {} players (k = {})".format(len(fresh), len(df), assigner.k))
+    if drift is not None:
+        print("Drift: {:.1%} beyond the training p95 distance (threshold {:.0%})".format(drift, DRIFT_THRESHOLD))
+    if drift is not None and drift > DRIFT_THRESHOLD and not args.no_refit:
+        print("Drift over threshold, refitting clusters")
+        refit(df, assigner.k)
+        assigner = RoleAssigner()
+        # every label is stale after a refit
+        roles, fresh = update_roles(df, assigner, load_roles().iloc[0:0])
+
+    write_table(roles, ROLES_FILE)
+    print("Saved ->", ROLES_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import time
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+from cluster_roles import CLUSTER_COLS, IN_FILE, K_RANGE, SEED, N_INIT, cluster, feature_matrix, fit_k
+
+SIZES = [2_000, 50_000]
+FULL_SILHOUETTE_MAX = 10_000
+
+
+def synthetic_pool(n, seed=0):
+    # resample real rows and jitter them so a multi-season pool keeps the
+    # shape of the real feature distribution
+    base = pd.read_csv(IN_FILE)
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+    for col in CLUSTER_COLS:
+        df[col] = df[col] * rng.normal(1.0, 0.1, n)
+    return df
+
+
+def legacy_sweep(Xz, ks):
+    # what picking k by hand looked like: full KMeans and full silhouette per k
+    out = []
+    for k in ks:
+        labels = KMeans(n_clusters=k, random_state=SEED, n_init=N_INIT).fit_predict(Xz)
+        out.append(silhouette_score(Xz, labels))
+    return out
+
+
+def main(sizes=SIZES):
+    ks = list(range(K_RANGE[0], K_RANGE[1] + 1))
+    print("cores: {}".format(os.cpu_count()))
+    for n in sizes:
+        df = synthetic_pool(n)
+        Xz = StandardScaler().fit_transform(feature_matrix(df))
+        print("\n{} players, k = {}..{}".format(n, ks[0], ks[-1]))
+
+        if n <= FULL_SILHOUETTE_MAX:
+            t0 = time.perf_counter()
+            legacy_sweep(Xz, ks)
+            print("  kmeans + full silhouette, serial    {:8.2f}s".format(time.perf_counter() - t0))
+
+        for backend in ["kmeans", "minibatch"]:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "artifacts.joblib")
+                t0 = time.perf_counter()
+                _, art, _ = cluster(df, k="auto", backend=backend, artifacts_path=path)
+                first = time.perf_counter() - t0
+                joblib.dump(art, path)
+                t0 = time.perf_counter()
+                _, again, refit = cluster(df, k="auto", backend=backend, artifacts_path=path)
+                cached = time.perf_counter() - t0
+            best = art["sweep"].set_index("k").loc[art["k"]]
+            print("  {:<9} sampled sweep             {:8.2f}s  (cached rerun {:.2f}s, refit {}) k={} sil={:.3f} inertia={:.0f}".format(
+                backend, first, cached, refit or "none", art["k"], best["silhouette"], best["inertia"]))
+
+        # inertia of minibatch vs full kmeans at one k, to show the quality cost
+        k = 6
+        full = fit_k(Xz, k, "kmeans")[2]
+        mini = fit_k(Xz, k, "minibatch")[2]
+        print("  inertia at k={}: kmeans {:.0f}, minibatch {:.0f} ({:+.1%})".format(k, full, mini, mini / full - 1))
+
+
+if __name__ == "__main__":
+    main()
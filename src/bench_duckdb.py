@@ -0,0 +1,74 @@
+import os
+import io
+import time
+import filecmp
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+import table_io
+import prepare_moneypuck
+import merge_player_data
+from bench_formats import REPO, tagged, write_raw
+
+SEASONS = [1, 8, 24]
+OUTPUTS = [
+    "data/processed/moneypuck_clean.csv",
+    "data/processed/player_data.csv",
+    "data/processed/player_salary_efficiency.csv",
+    "data/processed/unmatched_names.csv",
+    "data/processed/name_matches.csv",
+]
+
+
+def run_engine(root, engine, raw_glob, sal):
+    # prepare + merge with one engine; Parquet hand-off between them, CSV
+    # copies kept so the two runs can be compared byte for byte
+    table_io.FORMAT = "parquet"
+    table_io.CSV_EXPORT = True
+    os.makedirs(root, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        os.makedirs("data/processed", exist_ok=True)
+        table_io.write_table(sal, "data/processed/puckpedia_salaries.csv")
+        times = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            prepare_moneypuck.main([raw_glob], engine=engine)
+            times["prepare"] = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            merge_player_data.main(engine=engine)
+            times["merge"] = time.perf_counter() - t0
+    finally:
+        os.chdir(cwd)
+    return times
+
+
+def main(seasons=SEASONS):
+    base = pd.read_csv(os.path.join(REPO, "data/processed/moneypuck_clean.csv"))
+    sal = pd.read_csv(os.path.join(REPO, "data/processed/puckpedia_salaries.csv"))
+    rng = np.random.default_rng(0)
+    print("{:>8} {:>8} {:>12} {:>12} {:>12} {:>12} {:>10}".format(
+        "seasons", "raw_MB", "pd_prepare", "duck_prepare", "pd_merge", "duck_merge", "identical"))
+    for n in seasons:
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_dir = os.path.join(tmp, "raw")
+            os.makedirs(raw_dir)
+            write_raw(raw_dir, n, base, rng)
+            raw_mb = sum(os.path.getsize(os.path.join(raw_dir, f)) for f in os.listdir(raw_dir)) / 1e6
+            sal_n = tagged(sal, "Name", n)
+            times = {}
+            for engine in ["pandas", "duckdb"]:
+                times[engine] = run_engine(os.path.join(tmp, engine), engine, os.path.join(raw_dir, "*.csv"), sal_n)
+            same = all(
+                filecmp.cmp(os.path.join(tmp, "pandas", p), os.path.join(tmp, "duckdb", p), shallow=False)
+                for p in OUTPUTS
+            )
+            print("{:>8} {:>8.1f} {:>12.3f} {:>12.3f} {:>12.3f} {:>12.3f} {:>10}".format(
+                n, raw_mb, times["pandas"]["prepare"], times["duckdb"]["prepare"],
+                times["pandas"]["merge"], times["duckdb"]["merge"], str(same)))
+
+
+if __name__ == "__main__":
+    main()
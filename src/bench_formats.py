@@ -0,0 +1,112 @@
+import os
+import time
+import shutil
+import tempfile
+import importlib
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import table_io
+from bench_ingest import season_frame
+
+SEASONS = [1, 8]
+STAGES = ["prepare_moneypuck", "merge_player_data", "cluster_roles", "train_predictive_model", "generate_predictions"]
+TABLES = [
+    "data/processed/moneypuck_clean.csv",
+    "data/processed/puckpedia_salaries.csv",
+    "data/processed/player_data.csv",
+    "data/processed/player_salary_efficiency.csv",
+    "artifacts/clusters/player_roles.csv",
+    "data/processed/player_predictions.csv",
+]
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def tagged(df, col, n):
+    # n copies of the table with a per-copy name prefix, so names stay unique
+    # and the Name/team joins do not fan out
+    copies = []
+    for i in range(n):
+        c = df.copy()
+        c[col] = "Q" + str(i) + " " + c[col].astype(str)
+        copies.append(c)
+    return pd.concat(copies, ignore_index=True)
+
+
+def write_raw(raw_dir, n, base, rng):
+    for i in range(n):
+        season = base.copy()
+        season["name"] = "Q" + str(i) + " " + season["name"].astype(str)
+        path = os.path.join(raw_dir, "skaters_{}.csv".format(2000 + i))
+        season_frame(season, 2000 + i, rng).to_csv(path, index=False)
+
+
+def run_pipeline(root, fmt, raw_glob, sal):
+    # Runs every stage in-process from root, so timings leave out interpreter
+    # and sklearn import time. clean_puckpedia needs an Excel reader, so the
+    # salary table is seeded from the repo copy instead.
+    table_io.FORMAT = fmt
+    table_io.CSV_EXPORT = fmt == "csv"
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        table_io.write_table(sal, "data/processed/puckpedia_salaries.csv")
+        shutil.copy(os.path.join(REPO, "data/processed/name_overrides.csv"), "data/processed/name_overrides.csv")
+        times = {}
+        for name in STAGES:
+            mod = importlib.import_module(name)
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if name == "prepare_moneypuck":
+                    mod.main(raw_glob)
+                else:
+                    mod.main()
+            times[name] = time.perf_counter() - t0
+        sizes = {}
+        for path in TABLES:
+            p = table_io.parquet_path(path) if fmt == "parquet" else path
+            sizes[path] = file_size(p)
+        preds = pd.read_csv("data/processed/player_predictions.csv")
+    finally:
+        os.chdir(cwd)
+    return times, sizes, preds
+
+
+def main(seasons=SEASONS):
+    base = pd.read_csv(os.path.join(REPO, "data/processed/moneypuck_clean.csv"))
+    sal = pd.read_csv(os.path.join(REPO, "data/processed/puckpedia_salaries.csv"))
+    rng = np.random.default_rng(0)
+    for n in seasons:
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            raw_dir = os.path.join(tmp, "raw")
+            os.makedirs(raw_dir)
+            write_raw(raw_dir, n, base, rng)
+            for fmt in ["csv", "parquet"]:
+                root = os.path.join(tmp, fmt)
+                for d in ["data/processed", "artifacts/clusters", "artifacts/model"]:
+                    os.makedirs(os.path.join(root, d))
+                results[fmt] = run_pipeline(root, fmt, os.path.join(raw_dir, "*.csv"), tagged(sal, "Name", n))
+
+        print("\n{} season(s)".format(n))
+        print("{:<26} {:>10} {:>10}".format("stage (s)", "csv", "parquet"))
+        for name in STAGES:
+            print("{:<26} {:>10.3f} {:>10.3f}".format(name, results["csv"][0][name], results["parquet"][0][name]))
+        print("{:<26} {:>10.3f} {:>10.3f}".format(
+            "total", sum(results["csv"][0].values()), sum(results["parquet"][0].values())))
+        print("{:<26} {:>10} {:>10}".format("table (KB)", "csv", "parquet"))
+        for path in TABLES:
+            print("{:<26} {:>10.0f} {:>10.0f}".format(
+                os.path.basename(path), results["csv"][1][path] / 1024, results["parquet"][1][path] / 1024))
+        a = results["csv"][2]["pred_mp_value"].to_numpy()
+        b = results["parquet"][2]["pred_mp_value"].to_numpy()
+        print("rows {} / {}, max |pred diff| {:.2e}".format(len(a), len(b), np.max(np.abs(a - b)) if len(a) == len(b) else np.nan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import filecmp
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+from prepare_moneypuck import BASE_COLS
+
+SEASONS = [1, 4, 16]
+SITUATIONS = ["all", "5on5", "5on4", "4on5", "other"]
+FILLER_COLS = 130
+CLEAN_FILE = "data/processed/moneypuck_clean.csv"
+# not present in the MoneyPuck dumps; prepare_moneypuck fills them with 0
+ABSENT = ["ppTimeOnIce", "pkTimeOnIce", "powerPlayIcetime", "shortHandedIcetime", "pp_toi", "pk_toi"]
+
+# Each run happens in a fresh interpreter so ru_maxrss is the peak of that
+# run alone.
+RUNNER = """
+import sys, resource
+sys.path.insert(0, {src!r})
+import pandas as pd
+import prepare_moneypuck as pm
+mode, out, paths = sys.argv[1], sys.argv[2], sys.argv[3:]
+pm.OUT_FILE = out
+if mode == "legacy":
+    # the old path: whole file with every column, then filter
+    df = pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+    pm.clean_frame(df).to_csv(out, index=False)
+else:
+    pm.main(paths)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+"""
+
+
+def season_frame(base, season, rng):
+    cols = [c for c in BASE_COLS if c not in ABSENT and c != "situation"]
+    rows = base[cols].copy()
+    rows["season"] = season
+    frames = []
+    for sit in SITUATIONS:
+        f = rows.copy()
+        f["situation"] = sit
+        if sit != "all":
+            f["icetime"] = (f["icetime"] * rng.uniform(0.05, 0.8, len(f))).round().astype("int64")
+        frames.append(f)
+    df = pd.concat(frames, ignore_index=True)
+    filler = pd.DataFrame(
+        np.round(rng.random((len(df), FILLER_COLS)), 4),
+        columns=["extra_{}".format(i) for i in range(FILLER_COLS)],
+    )
+    return pd.concat([df, filler], axis=1)
+
+
+def write_seasons(tmp, n, base, rng):
+    paths = []
+    for i in range(n):
+        path = os.path.join(tmp, "skaters_{}.csv".format(2000 + i))
+        season_frame(base, 2000 + i, rng).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def run(mode, out, paths):
+    src = os.path.dirname(os.path.abspath(__file__))
+    code = RUNNER.format(src=src)
+    res = subprocess.run([sys.executable, "-c", code, mode, out] + paths,
+                         capture_output=True, text=True, check=True)
+    return float(res.stdout.strip().splitlines()[-1])
+
+
+def main(seasons=SEASONS):
+    base = pd.read_csv(CLEAN_FILE)
+    # blow one season up to a realistic size for a multi-season dump
+    base = pd.concat([base] * 3, ignore_index=True)
+    rng = np.random.default_rng(0)
+    print("{:>8} {:>10} {:>12} {:>12} {:>10}".format("seasons", "raw_MB", "legacy_MB", "stream_MB", "identical"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in seasons:
+            paths = write_seasons(tmp, n, base, rng)
+            raw_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+            legacy_out = os.path.join(tmp, "legacy.csv")
+            stream_out = os.path.join(tmp, "stream.csv")
+            legacy_rss = run("legacy", legacy_out, paths)
+            stream_rss = run("stream", stream_out, paths)
+            same = filecmp.cmp(legacy_out, stream_out, shallow=False)
+            print("{:>8} {:>10.1f} {:>12.1f} {:>12.1f} {:>10}".format(n, raw_mb, legacy_rss, stream_rss, str(same)))
+            for p in paths:
+                os.remove(p)
+
+
+if __name__ == "__main__":
+    main()
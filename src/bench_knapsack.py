@@ -0,0 +1,71 @@
+import time
+import numpy as np
+import pandas as pd
+from roster_model import prepare_pool, RosterModel, solve_model
+from bench_model_build import synthetic_players
+
+CASES = 40
+POOL_SIZES = [300, 1_000, 3_000]
+
+
+def check_roster(rm, res):
+    roster = res.roster
+    assert len(roster) == rm.roster_size
+    assert roster["cap_hit"].astype("int64").sum() <= rm.cap
+    assert (roster["group"] == "F").sum() >= rm.f_min
+    assert (roster["group"] == "D").sum() >= rm.d_min
+
+
+def random_case(rng):
+    df = synthetic_players(int(rng.integers(40, 400)), seed=int(rng.integers(1 << 30)))
+    if rng.random() < 0.3:
+        df["pred_mp_value"] = df["pred_mp_value"] - 0.03
+    args = {
+        "cap": int(rng.integers(20_000_000, 90_000_000)),
+        "roster_size": int(rng.integers(5, 24)),
+        "min_forwards": int(rng.integers(0, 14)),
+        "min_defense": int(rng.integers(0, 8)),
+    }
+    forced = list(rng.choice(df["Name"], size=int(rng.integers(0, 3)), replace=False))
+    return df, args, forced
+
+
+def cross_check(cases=CASES, seed=7):
+    # knapsack and CP-SAT must agree on the optimal objective and on
+    # feasibility for every random instance
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for _ in range(cases):
+        df, args, forced = random_case(rng)
+        pool = prepare_pool(df, exclude_league_min=False)
+        a = solve_model(RosterModel(pool, must_include=forced, **args), engine="knapsack")
+        b = solve_model(RosterModel(pool, must_include=forced, **args), engine="cpsat")
+        if a.feasible != b.feasible or (a.feasible and a.objective != b.objective):
+            mismatches += 1
+            print("MISMATCH", args, forced, a.status, a.objective, b.status, b.objective)
+        if a.feasible:
+            check_roster(RosterModel(pool, must_include=forced, **args), a)
+    print("cross-check: {} cases, {} mismatches".format(cases, mismatches))
+    return mismatches
+
+
+def timing():
+    rows = []
+    for n in POOL_SIZES:
+        pool = prepare_pool(synthetic_players(n, seed=3), exclude_league_min=False)
+        out = {"players": n}
+        for engine in ("knapsack", "cpsat"):
+            t0 = time.perf_counter()
+            res = solve_model(RosterModel(pool, 83_500_000, 21, 12, 6), engine=engine)
+            out[engine + "_s"] = round(time.perf_counter() - t0, 4)
+            out[engine + "_obj"] = res.objective
+        rows.append(out)
+        print(out)
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    bad = cross_check()
+    timing()
+    if bad:
+        raise SystemExit(1)
@@ -0,0 +1,54 @@
+import os
+import time
+import league_optimizer as lo
+from bench_model_build import synthetic_players
+
+SIZES = [800, 1_000, 2_000, 5_000]
+OBJECTIVES = ["total", "maxmin"]
+TIME_LIMIT = 30
+# the full model is only tried while it stays this small
+FULL_MAX_PLAYERS = 1_000
+
+
+def run(df, method, objective, time_limit=TIME_LIMIT):
+    t0 = time.perf_counter()
+    try:
+        res = lo.league_rosters(df, teams=lo.TEAMS, method=method, objective=objective, time_limit=time_limit)
+    except ValueError as e:
+        return {"status": "ERROR: " + str(e), "wall_s": time.perf_counter() - t0}
+    t = res.teams
+    ok = ((t["total_cap"] <= lo.CAP).all() and (t["players"] == lo.ROSTER_SIZE).all()
+          and (t["forwards"] >= lo.MIN_FORWARDS).all() and (t["defense"] >= lo.MIN_DEFENSEMEN).all()
+          and res.rosters["Name"].is_unique)
+    return {
+        "status": res.status if ok else "INVALID",
+        "wall_s": time.perf_counter() - t0,
+        "rounds": res.rounds,
+        "total": res.total_value,
+        "min": res.min_value,
+        "max": res.max_value,
+        "gap": res.gap,
+    }
+
+
+def main(sizes=SIZES):
+    print("cores: {}  teams: {}  roster: {}  time limit: {}s".format(
+        os.cpu_count(), lo.TEAMS, lo.ROSTER_SIZE, TIME_LIMIT))
+    print("{:>7} {:>10} {:>7} {:>9} {:>8} {:>7} {:>9} {:>8} {:>8} {:>7}".format(
+        "players", "method", "obj", "status", "wall_s", "rounds", "total", "min", "max", "gap"))
+    for n in sizes:
+        df = synthetic_players(n, seed=1)
+        methods = ["full", "decompose"] if n <= FULL_MAX_PLAYERS else ["decompose"]
+        for objective in OBJECTIVES:
+            for method in methods:
+                r = run(df, method, objective)
+                if "total" not in r:
+                    print("{:>7} {:>10} {:>7} {}".format(n, method, objective, r["status"]))
+                    continue
+                print("{:>7} {:>10} {:>7} {:>9} {:>8.1f} {:>7} {:>9.3f} {:>8.3f} {:>8.3f} {:>7}".format(
+                    n, method, objective, r["status"], r["wall_s"], r["rounds"], r["total"], r["min"], r["max"],
+                    "-" if r["gap"] is None else "{:.2%}".format(r["gap"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import time
+import json
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import league_plot
+import roster_model
+
+DATA_FILE = "data/processed/player_predictions.csv"
+SIZES = [None, 5_000, 50_000, 500_000]
+RUNS = 5
+
+
+def league_pool(n, seed=0):
+    # real players resampled and jittered into an n-row multi-season pool
+    base = pd.read_csv(DATA_FILE)
+    if n is None:
+        return base
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+    df["cap_hit"] = (df["cap_hit"] * rng.normal(1.0, 0.15, n)).clip(lower=775_000).round()
+    df["pred_mp_value"] = df["pred_mp_value"] * rng.normal(1.0, 0.15, n)
+    df["season"] = 2000 + rng.integers(0, 25, n)
+    df["Name"] = df["Name"] + " #" + pd.Series(np.arange(n)).astype(str)
+    return df
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main(sizes=SIZES):
+    rosters = []
+    base = pd.read_csv(DATA_FILE)
+    for cap in range(80_000_000, 80_000_000 + RUNS * 1_000_000, 1_000_000):
+        rosters.append(roster_model.solve_roster(
+            base, cap, 21, 12, 6, ["Auston Matthews", "William Nylander"], ["Mitch Marner"]).roster)
+
+    # first FigureWidget pays for the plotly/anywidget imports; keep it out
+    pio.to_json(league_plot.league_figure(league_plot.league_points(base, "warm"), "warm"))
+
+    print("{:>8} {:>7} {:>10} {:>10} {:>12} {:>12} {:>12}".format(
+        "players", "shown", "points_s", "rebuild_s", "rebuild_KB", "update_ms", "update_KB"))
+    for n in sizes:
+        df = league_pool(n)
+        league_plot._points.clear()
+        points, points_s = timed(lambda: league_plot.league_points(df, "v"))
+
+        # every run rebuilding and shipping the whole figure
+        def rebuild():
+            fig = league_plot.league_figure(points, "v")
+            league_plot.highlight(fig, rosters[0])
+            return pio.to_json(fig)
+        payload, rebuild_s = timed(rebuild)
+
+        # built once, then only the roster trace changes
+        fig = league_plot.league_figure(points, "v")
+        t0 = time.perf_counter()
+        for roster in rosters:
+            league_plot.highlight(fig, roster)
+        update_ms = (time.perf_counter() - t0) / len(rosters) * 1000.0
+        update_kb = len(pio.to_json(fig.data[1])) / 1024
+
+        print("{:>8} {:>7} {:>10.3f} {:>10.3f} {:>12.0f} {:>12.1f} {:>12.1f}".format(
+            points["players"], points["shown"], points_s, rebuild_s, len(payload) / 1024, update_ms, update_kb))
+
+    # what binning saves at the largest size
+    big = league_pool(max(s for s in sizes if s))
+    raw = league_plot.downsample(big, max_points=len(big) + 1)
+    print("\nunbinned {:,} points -> {:,.0f} KB of x/y alone; binned to {:,} points".format(
+        len(raw), len(json.dumps(raw[["cap_hit", "pred_mp_value"]].to_numpy().tolist())) / 1024,
+        len(league_plot.downsample(big))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import time
+import numpy as np
+import pandas as pd
+from merge_player_data import OUT_EFF_FILE, add_efficiency_metrics, nz_div
+
+SCALES = [1, 10, 100]
+METRIC_COLS = [
+    "cost_per_point", "cost_per_goal", "cost_per_primary_assist", "cost_per_xgoal",
+    "net_takeaway_value", "possession_impact_index", "cost_per_corsi_above_50",
+    "cost_per_mp_value",
+]
+
+
+def legacy_metrics(df):
+    # the per-row loop merge_player_data used before add_efficiency_metrics
+    out = {c: [] for c in METRIC_COLS}
+    for i in range(len(df)):
+        ch = df.iloc[i]["cap_hit"]
+        pts = df.iloc[i]["I_F_points"]
+        goals = df.iloc[i]["I_F_goals"]
+        pas = df.iloc[i]["I_F_primaryAssists"]
+        xg = df.iloc[i]["I_F_xGoals"]
+        take = df.iloc[i]["I_F_takeaways"]
+        give = df.iloc[i]["I_F_giveaways"]
+        corsi = df.iloc[i]["onIce_corsiPercentage"] if "onIce_corsiPercentage" in df.columns else pd.NA
+        mpv = df.iloc[i]["mp_value"] if "mp_value" in df.columns else pd.NA
+        out["cost_per_point"].append(nz_div(ch, pts))
+        out["cost_per_goal"].append(nz_div(ch, goals))
+        out["cost_per_primary_assist"].append(nz_div(ch, pas))
+        out["cost_per_xgoal"].append(nz_div(ch, xg))
+        out["net_takeaway_value"].append(nz_div(take - give, ch))
+        give_for_index = give
+        if give_for_index == 0:
+            give_for_index = 1
+        out["possession_impact_index"].append(nz_div(take / give_for_index, ch))
+        if pd.notna(corsi):
+            above50 = corsi - 50
+            if above50 < 0:
+                above50 = 0
+            out["cost_per_corsi_above_50"].append(nz_div(ch, above50))
+        else:
+            out["cost_per_corsi_above_50"].append(pd.NA)
+        out["cost_per_mp_value"].append(nz_div(ch, mpv))
+    df = df.copy()
+    for c in METRIC_COLS:
+        df[c] = out[c]
+    return df
+
+
+def base_frame():
+    df = pd.read_csv(OUT_EFF_FILE).drop(columns=METRIC_COLS)
+    # rows that exercise every NA path: zero / missing denominators, corsi
+    # above 50, zero giveaways
+    edge = df.head(6).copy()
+    edge["I_F_points"] = [0, 10, 10, 10, 10, 10]
+    edge["I_F_goals"] = [5, 0, 5, 5, 5, 5]
+    edge["I_F_giveaways"] = [3, 3, 0, 3, 3, 3]
+    edge["onIce_corsiPercentage"] = [0.5, 55.0, 50.0, np.nan, 51.5, 0.4]
+    edge["mp_value"] = [0.0, 0.02, np.nan, 0.01, -0.01, 0.03]
+    edge["I_F_xGoals"] = [np.nan, 1.5, 0.0, 2.0, 2.0, 2.0]
+    return pd.concat([df, edge], ignore_index=True)
+
+
+def main():
+    base = base_frame()
+    for scale in SCALES:
+        df = pd.concat([base] * scale, ignore_index=True)
+        t0 = time.perf_counter()
+        old = legacy_metrics(df)
+        t_old = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        new = add_efficiency_metrics(df.copy())
+        t_new = time.perf_counter() - t0
+        same = old.to_csv(index=False) == new.to_csv(index=False)
+        print("rows={:>7} loop={:8.3f}s vectorized={:7.4f}s speedup={:7.0f}x identical_csv={}".format(
+            len(df), t_old, t_new, t_old / t_new, same))
+        if not same:
+            raise SystemExit("vectorized metrics differ from the row loop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from ortools.sat.python import cp_model
+from roster_model import prepare_pool, RosterModel, solve_model
+
+SIZES = [1_000, 10_000, 100_000]
+LEGACY_MAX = 10_000
+REPEATS = 3
+
+CAP = 83_500_000
+ROSTER_SIZE = 21
+MIN_FORWARDS = 12
+MIN_DEFENSEMEN = 6
+
+
+def synthetic_players(n, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = rng.choice(["C", "L", "R", "D"], size=n, p=[0.3, 0.2, 0.2, 0.3])
+    cap_hit = np.round(rng.lognormal(np.log(2_500_000), 0.7, size=n) / 2500) * 2500
+    cap_hit = np.clip(cap_hit, 775_000, 14_000_000)
+    value = 0.012 + 0.05 * rng.beta(2, 4, size=n) + 0.004 * np.log(cap_hit / 775_000)
+    return pd.DataFrame({
+        "Name": ["Player " + str(i) for i in range(n)],
+        "team": rng.choice(["TOR", "MTL", "BOS", "EDM", "VAN", "NYR"], size=n),
+        "position": positions,
+        "cap_hit": cap_hit,
+        "pred_mp_value": value,
+        "mp_value": value + rng.normal(0, 0.003, size=n),
+    })
+
+
+def legacy_build(df, cap, roster_size, min_forwards, min_defense):
+    # the row-by-row construction the app used before roster_model existed
+    idx = list(df.index)
+    F_idx = []
+    D_idx = []
+    i = 0
+    while i < len(idx):
+        row_i = idx[i]
+        if df.loc[row_i, "group"] == "F":
+            F_idx.append(row_i)
+        else:
+            if df.loc[row_i, "group"] == "D":
+                D_idx.append(row_i)
+        i = i + 1
+    model = cp_model.CpModel()
+    x = {}
+    for row_i in idx:
+        x[row_i] = model.NewBoolVar("x_" + str(row_i))
+    model.Maximize(sum(int(df.loc[r, "pred_mp_value"] * 1000) * x[r] for r in idx))
+    model.Add(sum(int(df.loc[r, "cap_hit"]) * x[r] for r in idx) <= int(cap))
+    model.Add(sum(x[r] for r in idx) == int(roster_size))
+    model.Add(sum(x[r] for r in F_idx) >= min_forwards)
+    model.Add(sum(x[r] for r in D_idx) >= min_defense)
+    return model
+
+
+def best_of(fn, repeats=REPEATS):
+    best = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(sizes=SIZES, legacy_max=LEGACY_MAX):
+    rows = []
+    for n in sizes:
+        df = synthetic_players(n)
+        pool = prepare_pool(df, exclude_league_min=False)
+
+        build = best_of(lambda: RosterModel(pool, CAP, ROSTER_SIZE, MIN_FORWARDS, MIN_DEFENSEMEN))
+        legacy = np.nan
+        if n <= legacy_max:
+            legacy = best_of(lambda: legacy_build(pool, CAP, ROSTER_SIZE, MIN_FORWARDS, MIN_DEFENSEMEN), 1)
+
+        rm = RosterModel(pool, CAP, ROSTER_SIZE, MIN_FORWARDS, MIN_DEFENSEMEN)
+        t0 = time.perf_counter()
+        res = solve_model(rm)
+        solve = time.perf_counter() - t0
+
+        rows.append({
+            "players": n,
+            "build_s": round(build, 4),
+            "legacy_build_s": round(legacy, 4),
+            "solve_s": round(solve, 3),
+            "status": str(res.status),
+        })
+        print(rows[-1])
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--legacy-all":
+        main(legacy_max=max(SIZES))
+    else:
+        main()
@@ -0,0 +1,63 @@
+import os
+import time
+import numpy as np
+import multi_season as ms
+from bench_model_build import synthetic_players
+from roster_model import prepare_pool
+
+SIZES = [300, 1_000, 5_000]
+HORIZONS = [3, 4, 5]
+START = 2024
+TIME_LIMIT = 20
+WORKERS = os.cpu_count() or 1
+
+
+def contract_pool(n, seed=0):
+    # synthetic players with contracts of 1-8 seasons signed up to that
+    # many seasons before START
+    df = synthetic_players(n, seed)
+    rng = np.random.default_rng(seed)
+    length = rng.integers(1, 9, n)
+    first = START - rng.integers(0, length)
+    df["Length"] = length
+    df["Start Year"] = [ms.season_label(y) for y in first]
+    df["season"] = START
+    return df
+
+
+def build_only(df, horizon):
+    t0 = time.perf_counter()
+    pool = prepare_pool(df)
+    mats = ms.SeasonMatrices(pool, START, horizon)
+    model = ms.build_model(mats, pool["group"].to_numpy() == "F", ms.default_caps(horizon),
+                           ms.ROSTER_SIZE, ms.MIN_FORWARDS, ms.MIN_DEFENSEMEN,
+                           np.zeros(len(pool), dtype=bool))
+    return mats, model, time.perf_counter() - t0
+
+
+def fmt(plan):
+    gap = "-" if plan.gap is None else "{:.2%}".format(plan.gap)
+    return "{:>8} {:>7.1f} {:>9.3f} {:>7}".format(plan.status, plan.elapsed, plan.objective, gap)
+
+
+def main(sizes=SIZES):
+    print("cores: {}  time limit: {}s  workers: {}".format(os.cpu_count(), TIME_LIMIT, WORKERS))
+    print("{:>7} {:>3} {:>7} {:>7} {:>8} | {:>8} {:>7} {:>9} {:>7} | {:>8} {:>7} {:>9} {:>7}".format(
+        "players", "H", "vars", "cons", "build_s",
+        "cold", "wall_s", "value", "gap", "warm", "wall_s", "value", "gap"))
+    for n in sizes:
+        df = contract_pool(n)
+        previous = None
+        for h in HORIZONS:
+            mats, model, build_s = build_only(df, h)
+            cold = ms.plan_seasons(df, horizon=h, start=START, time_limit=TIME_LIMIT, num_workers=WORKERS)
+            warm = ms.plan_seasons(df, horizon=h, start=START, time_limit=TIME_LIMIT, num_workers=WORKERS,
+                                   warm_start=previous) if previous is not None else None
+            print("{:>7} {:>3} {:>7} {:>7} {:>8.3f} | {} | {}".format(
+                n, h, mats.num_vars, len(model.Proto().constraints), build_s, fmt(cold),
+                fmt(warm) if warm is not None else "{:>35}".format("-")))
+            previous = warm if warm is not None else cold
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import time
+import tempfile
+import importlib
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import table_io
+from bench_formats import tagged
+
+# generate_predictions on n copies of the efficiency table: a first run, a
+# rerun with nothing changed, and reruns with a share of the rows edited.
+# Scoring only the changed rows does not make the stage O(changes): it still
+# reads and hashes the whole input, and any change rewrites the whole output
+# (the app reads one CSV). The read/hash and write columns time those two
+# parts on their own.
+COPIES = [1, 20, 100]
+CHANGED = [0.01, 0.1]
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = "data/processed/player_salary_efficiency.csv"
+OUT_FILE = "data/processed/player_predictions.csv"
+
+
+def quiet(fn, *args):
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(*args)
+    return time.perf_counter() - t0
+
+
+def read_and_hash(gp):
+    t0 = time.perf_counter()
+    df = table_io.read_table(DATA_FILE)
+    gp.row_hashes(df)
+    return time.perf_counter() - t0
+
+
+def write_only():
+    df = table_io.read_table(OUT_FILE)
+    t0 = time.perf_counter()
+    table_io.write_table(df, OUT_FILE, csv_export=True)
+    return time.perf_counter() - t0
+
+
+def edit_rows(share, rng):
+    df = table_io.read_table(DATA_FILE)
+    rows = rng.choice(len(df), max(1, int(len(df) * share)), replace=False)
+    df.loc[df.index[rows], "cap_hit"] = df["cap_hit"].iloc[rows] + 1
+    table_io.write_table(df, DATA_FILE)
+
+
+def main(copies=COPIES):
+    base = pd.read_csv(os.path.join(REPO, DATA_FILE))
+    rng = np.random.default_rng(0)
+    print("{:>7} {:<14} {:>8} {:>10} {:>8}".format("rows", "run", "total_s", "read_hash", "write_s"))
+    cwd = os.getcwd()
+    for n in copies:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                for d in ["data/processed", "artifacts/clusters", "artifacts/model"]:
+                    os.makedirs(d)
+                table_io.write_table(tagged(base, "Name", n), DATA_FILE)
+                for name in ["cluster_roles", "train_predictive_model"]:
+                    quiet(importlib.import_module(name).main)
+                gp = importlib.import_module("generate_predictions")
+                runs = [("first", None), ("unchanged", None)] + [("{:.0%} changed".format(s), s) for s in CHANGED]
+                for label, share in runs:
+                    if share:
+                        edit_rows(share, rng)
+                    total = quiet(gp.main)
+                    write_s = "-" if label == "unchanged" else "{:.3f}".format(write_only())
+                    print("{:>7} {:<14} {:>8.3f} {:>10.3f} {:>8}".format(
+                        len(base) * n, label, total, read_and_hash(gp), write_s))
+            finally:
+                os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
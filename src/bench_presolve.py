@@ -0,0 +1,79 @@
+import time
+import numpy as np
+import pandas as pd
+from roster_model import prepare_pool, presolve_pool, RosterModel, solve_model
+from presolve import dominated_mask
+from bench_model_build import synthetic_players
+from bench_knapsack import random_case
+
+SIZES = [1_000, 10_000, 100_000]
+CAP = 83_500_000
+ROSTER_SIZE = 21
+MIN_FORWARDS = 12
+MIN_DEFENSEMEN = 6
+CPSAT_FULL_MAX = 10_000
+
+
+def brute_dominated(values, costs, groups, roster_size):
+    # O(n^2) reference for the block algorithm in presolve.py
+    n = len(values)
+    out = np.zeros(n, dtype=bool)
+    for i in range(n):
+        same = groups == groups[i]
+        earlier = (costs < costs[i]) | ((costs == costs[i]) & (values > values[i])) | (
+            (costs == costs[i]) & (values == values[i]) & (np.arange(n) < i))
+        out[i] = (same & earlier & (values >= values[i])).sum() >= roster_size
+    return out
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    pool = prepare_pool(synthetic_players(3_000, seed=5), exclude_league_min=False)
+    values = (pool["pred_mp_value"].to_numpy() * 1000).astype(np.int64)
+    costs = pool["cap_hit"].to_numpy().astype(np.int64)
+    groups = pool["group"].to_numpy()
+    fast = dominated_mask(values, costs, groups, np.zeros(len(pool), dtype=bool), ROSTER_SIZE)
+    assert (fast == brute_dominated(values, costs, groups, ROSTER_SIZE)).all()
+    print("block dominance count matches the O(n^2) reference")
+
+    rng = np.random.default_rng(11)
+    for _ in range(30):
+        df, args, forced = random_case(rng)
+        full = prepare_pool(df, exclude_league_min=False)
+        a = solve_model(RosterModel(full, must_include=forced, **args), engine="cpsat")
+        small = presolve_pool(full, args["roster_size"], forced)
+        b = solve_model(RosterModel(small, must_include=forced, **args), engine="cpsat")
+        assert a.feasible == b.feasible and a.objective == b.objective, (args, forced)
+    print("presolved models match the full models on 30 random instances")
+
+    rows = []
+    for n in SIZES:
+        pool = prepare_pool(synthetic_players(n, seed=4), exclude_league_min=False)
+        reduced, t_pre = timed(lambda: presolve_pool(pool, ROSTER_SIZE))
+        row = {"players": n, "kept": len(reduced), "presolve_s": round(t_pre, 4)}
+        for label, p in (("full", pool), ("reduced", reduced)):
+            for engine in ("cpsat", "knapsack"):
+                if label == "full" and n > CPSAT_FULL_MAX:
+                    continue
+                rm, t_build = timed(lambda: RosterModel(p, CAP, ROSTER_SIZE, MIN_FORWARDS, MIN_DEFENSEMEN))
+                if engine == "cpsat":
+                    _, t_cp = timed(lambda: rm.model)
+                    t_build += t_cp
+                res, t_solve = timed(lambda: solve_model(rm, engine=engine))
+                row[label + "_" + engine + "_build_s"] = round(t_build, 4)
+                row[label + "_" + engine + "_solve_s"] = round(t_solve, 4)
+                row[label + "_" + engine + "_obj"] = res.objective
+        objs = {v for k, v in row.items() if k.endswith("_obj")}
+        row["same_objective"] = len(objs) == 1
+        rows.append(row)
+        print(row)
+    print(pd.DataFrame(rows).T.to_string(header=False))
+
+
+if __name__ == "__main__":
+    main()
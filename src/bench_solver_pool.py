@@ -0,0 +1,103 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import roster_model
+from solver_pool import SolverPool
+
+DATA_FILE = "data/processed/player_predictions.csv"
+SESSIONS = [2, 4, 8]
+CLICKS = 4          # sequential requests per interactive session
+BURST = 8           # requests the bulk session queues at once
+TIME_LIMIT = 10
+LEGACY_THREADS = 2  # the app's old shared ThreadPoolExecutor
+LEGACY_WORKERS = 8  # CP-SAT workers per solve before the pool
+
+
+class LegacyPool:
+    # what app.py did before: FIFO executor, 8 search workers per solve
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=LEGACY_THREADS)
+
+    def submit(self, session, fn, *args, **kwargs):
+        return self.executor.submit(fn, *args, num_workers=LEGACY_WORKERS, **kwargs)
+
+
+def solve(df, cap, num_workers=None):
+    # a CP-SAT solve on the full pool, no cache, so every request does work
+    return roster_model.solve_roster(
+        df, cap, 21, 12, 6, ["Auston Matthews", "William Nylander"], ["Mitch Marner"],
+        time_limit=TIME_LIMIT, num_workers=num_workers, engine="cpsat", presolve=False,
+    )
+
+
+def future_of(job):
+    return getattr(job, "future", job)
+
+
+def run_load(pool, df, sessions, clicks=CLICKS, burst=BURST):
+    # session 0 queues a burst (repeated clicks / a big batch); the others
+    # click, wait for their roster, and click again
+    caps = iter(range(80_000_000, 200_000_000, 50_000))
+    lock = threading.Lock()
+    latencies = {"interactive": [], "bulk": []}
+
+    def record(kind, start):
+        with lock:
+            latencies[kind].append(time.perf_counter() - start)
+
+    def bulk():
+        start = time.perf_counter()
+        with lock:
+            jobs = [pool.submit("bulk", solve, df, next(caps)) for _ in range(burst)]
+        for job in jobs:
+            future_of(job).result()
+            record("bulk", start)
+
+    def interactive(name):
+        for _ in range(clicks):
+            start = time.perf_counter()
+            with lock:
+                job = pool.submit(name, solve, df, next(caps))
+            future_of(job).result()
+            record("interactive", start)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=bulk)]
+    threads += [threading.Thread(target=interactive, args=("s{}".format(i),)) for i in range(1, sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    done = len(latencies["interactive"]) + len(latencies["bulk"])
+    lat = np.asarray(latencies["interactive"]) * 1000.0
+    return {
+        "wall_s": wall,
+        "solves_per_s": done / wall,
+        "p50_ms": np.percentile(lat, 50),
+        "p95_ms": np.percentile(lat, 95),
+        "p99_ms": np.percentile(lat, 99),
+        "bulk_s": max(latencies["bulk"]),
+    }
+
+
+def main(sessions=SESSIONS):
+    df = pd.read_csv(DATA_FILE)
+    print("cores: {}  (pool: {} concurrent, up to {} workers each)".format(
+        os.cpu_count(), SolverPool().max_concurrent, SolverPool().max_workers))
+    solve(df, 83_500_000, num_workers=1)  # load ortools before timing
+    print("{:>8} {:>7} {:>8} {:>10} {:>10} {:>10} {:>10} {:>8}".format(
+        "sessions", "mode", "wall_s", "solves/s", "p50_ms", "p95_ms", "p99_ms", "bulk_s"))
+    for n in sessions:
+        for mode, pool in [("legacy", LegacyPool()), ("pool", SolverPool())]:
+            r = run_load(pool, df, n)
+            print("{:>8} {:>7} {:>8.2f} {:>10.1f} {:>10.0f} {:>10.0f} {:>10.0f} {:>8.2f}".format(
+                n, mode, r["wall_s"], r["solves_per_s"], r["p50_ms"], r["p95_ms"], r["p99_ms"], r["bulk_s"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 3
+
+# what app.py used to import before it could serve anything
+EAGER = """
+import time
+t0 = time.perf_counter()
+import sys
+sys.path.insert(0, "src")
+import pandas, shiny, plotly.express, shinywidgets, duckdb
+from ortools.sat.python import cp_model
+import roster_model, cap_frontier, dataset_cache, solve_cache
+print(json.dumps({"import_s": time.perf_counter() - t0}))
+"""
+
+# the app with a click arriving as soon as it is imported (no warm-up), or
+# after the background warm-up has finished
+APP = """
+import time
+t0 = time.perf_counter()
+import sys
+sys.path.insert(0, ".")
+import app
+imported = time.perf_counter() - t0
+if app.WARMUP:
+    app.WARM.wait()
+else:
+    app.DATASET.seed(app.SNAPSHOT_FILE)
+warm = time.perf_counter() - t0
+t1 = time.perf_counter()
+res = app.optimize_roster(app.load_data(), app.CAP, app.ROSTER_SIZE, app.MIN_FORWARDS,
+                          app.MIN_DEFENSEMEN, app.MUST_INCLUDE, app.MUST_EXCLUDE)
+click = time.perf_counter() - t1
+print(json.dumps({"import_s": imported, "ready_s": warm, "click_s": click,
+                  "first_roster_s": time.perf_counter() - t0, "value": res[2]}))
+"""
+
+
+def run(code, env):
+    out = subprocess.run(
+        [sys.executable, "-c", "import json\n" + code],
+        cwd=REPO, env=dict(os.environ, **env), capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def best(code, env):
+    # fastest of RUNS, each with an empty dataset cache so the snapshot is
+    # built from the local CSV every time
+    results = []
+    for _ in range(RUNS):
+        with tempfile.TemporaryDirectory() as tmp:
+            # the app log goes to the temp dir too, not the repo root
+            run_env = dict(env, DATASET_CACHE_DIR=tmp, DATASET_CACHE_TTL="1e9",
+                           TELEMETRY_LOG=os.path.join(tmp, "app.log"))
+            results.append(run(code, run_env))
+    return min(results, key=lambda r: r.get("first_roster_s", r["import_s"]))
+
+
+def main():
+    print("cores: {}".format(os.cpu_count()))
+    eager = best(EAGER, {})
+    print("{:<36} import {:6.2f}s".format("eager imports (old app.py)", eager["import_s"]))
+    for label, env in [("lazy, no warm-up, click at once", {"APP_WARMUP": "0"}),
+                       ("lazy + warm-up (imports, data)", {"APP_WARM_SOLVE": "0"}),
+                       ("lazy + warm-up incl. default solve", {})]:
+        r = best(APP, env)
+        print("{:<36} import {:6.2f}s  ready {:6.2f}s  click {:6.2f}s  first roster {:6.2f}s  value {:.3f}".format(
+            label, r["import_s"], r["ready_s"], r["click_s"], r["first_roster_s"], r["value"]))
+
+
+if __name__ == "__main__":
+    main()
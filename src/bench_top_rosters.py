@@ -0,0 +1,34 @@
+import time
+import pandas as pd
+from roster_model import prepare_pool, RosterModel
+from top_rosters import enumerate_rosters
+from bench_model_build import synthetic_players
+
+POOL_SIZES = [300, 1_000, 3_000]
+K = 20
+MIN_DISTANCE = 4
+
+
+def main():
+    rows = []
+    for n in POOL_SIZES:
+        pool = prepare_pool(synthetic_players(n, seed=2))
+        t0 = time.perf_counter()
+        rm = RosterModel(pool, 83_500_000, 21, 12, 6)
+        build = time.perf_counter() - t0
+        results = enumerate_rosters(rm, K, MIN_DISTANCE)
+        total = time.perf_counter() - t0
+        rows.append({
+            "players": n,
+            "rosters": len(results),
+            "build_s": round(build, 4),
+            "total_s": round(total, 2),
+            "per_roster_s": round(total / max(1, len(results)), 3),
+            "worst_gap": results[0].objective - results[-1].objective if results else None,
+        })
+        print(rows[-1])
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
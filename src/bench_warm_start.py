@@ -0,0 +1,70 @@
+import time
+import numpy as np
+import pandas as pd
+from roster_model import solve_roster
+from bench_model_build import synthetic_players
+
+POOL_SIZES = [300, 3_000, 20_000]
+
+ROSTER_SIZE = 21
+MIN_FORWARDS = 12
+MIN_DEFENSEMEN = 6
+
+
+def slider_edits(df):
+    # a GM dragging the cap slider, then pinning two of the roster's players
+    edits = []
+    for cap in range(80_000_000, 86_500_001, 500_000):
+        edits.append({"cap": cap, "must_include": []})
+    top = df.sort_values("pred_mp_value", ascending=False)["Name"].tolist()
+    edits.append({"cap": 86_500_000, "must_include": top[5:6]})
+    edits.append({"cap": 86_500_000, "must_include": top[5:7]})
+    edits.append({"cap": 86_000_000, "must_include": top[5:7]})
+    return edits
+
+
+def run(df, warm):
+    # pinned to CP-SAT: the knapsack engine takes no hint, so "auto" would
+    # compare it against itself
+    times = []
+    values = []
+    previous = None
+    for edit in slider_edits(df):
+        t0 = time.perf_counter()
+        res = solve_roster(
+            df,
+            cap=edit["cap"],
+            roster_size=ROSTER_SIZE,
+            min_forwards=MIN_FORWARDS,
+            min_defense=MIN_DEFENSEMEN,
+            must_include=edit["must_include"],
+            hint=previous if warm else None,
+            engine="cpsat",
+        )
+        times.append(time.perf_counter() - t0)
+        values.append(res.objective)
+        previous = res.roster["Name"].tolist()
+    return np.array(times), values
+
+
+def main():
+    rows = []
+    for n in POOL_SIZES:
+        df = synthetic_players(n, seed=1)
+        cold, cold_vals = run(df, warm=False)
+        warm, warm_vals = run(df, warm=True)
+        rows.append({
+            "players": n,
+            "edits": len(cold),
+            "cold_mean_s": round(cold[1:].mean(), 3),
+            "cold_max_s": round(cold[1:].max(), 3),
+            "warm_mean_s": round(warm[1:].mean(), 3),
+            "warm_max_s": round(warm[1:].max(), 3),
+            "same_objective": cold_vals == warm_vals,
+        })
+        print(rows[-1])
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
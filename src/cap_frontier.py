@@ -0,0 +1,190 @@
+import os
+import time
+import uuid
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import telemetry
+from roster_model import (
+    prepare_pool, presolve_pool, RosterModel, solve_model, knapsack_fits, ROSTER_COLS, ENGINE, PRESOLVE,
+)
+
+CAP_MIN = 70_000_000
+CAP_MAX = 95_000_000
+CAP_STEP = 250_000
+
+ROSTER_SIZE = 21
+MIN_FORWARDS = 12
+MIN_DEFENSEMEN = 6
+MUST_INCLUDE = ["Auston Matthews", "William Nylander"]
+MUST_EXCLUDE = ["Mitch Marner"]
+
+POINT_TIME_LIMIT = 10
+MAX_PROCESSES = int(os.getenv("FRONTIER_PROCESSES", str(min(8, os.cpu_count() or 1))))
+OUT_FILE = "data/processed/cap_frontier.csv"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # one long-lived pool per process; spawn keeps it safe to start from the
+    # threaded Shiny server
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+class FrontierCancelled(RuntimeError):
+    pass
+
+
+class StopFlag:
+    # A cancel flag the pool processes can see: a marker file, so it pickles
+    # as a path and needs no manager process.
+
+    def __init__(self):
+        self.path = os.path.join(tempfile.gettempdir(), "frontier-stop-" + uuid.uuid4().hex)
+
+    def set(self):
+        open(self.path, "w").close()
+
+    def is_set(self):
+        return os.path.exists(self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def cap_grid(cap_min, cap_max, step):
+    if step <= 0:
+        raise ValueError("step must be positive")
+    return np.arange(int(cap_min), int(cap_max) + 1, int(step), dtype=np.int64)
+
+
+def _solve_block(pool, caps, roster_size, min_forwards, min_defense, must_include, time_limit, num_workers, engine,
+                 stop=None):
+    # Solves one contiguous run of caps from low to high. The roster at the
+    # previous cap always fits under the next one, so it is a valid hint.
+    # A set stop flag ends the block before its next point.
+    rows = []
+    previous = None
+    for cap in caps:
+        if stop is not None and stop.is_set():
+            break
+        t0 = time.perf_counter()
+        rm = RosterModel(pool, int(cap), roster_size, min_forwards, min_defense, must_include)
+        if previous is not None and not (engine != "cpsat" and knapsack_fits(rm)):
+            rm.add_hint(rm.repair(rm.mask_for(previous)))
+        res = solve_model(rm, time_limit, num_workers, engine=engine)
+        names = res.roster["Name"].tolist()
+        if res.feasible:
+            previous = names
+        rows.append({
+            "cap": int(cap),
+            "status": telemetry.status_name(res.status),
+            "total_value": res.total_value if res.feasible else np.nan,
+            "total_cap": res.total_cap if res.feasible else np.nan,
+            "objective": res.objective,
+            "solve_s": time.perf_counter() - t0,
+            "roster": "; ".join(names),
+        })
+    return rows
+
+
+def cap_frontier(
+    df,
+    cap_min=CAP_MIN,
+    cap_max=CAP_MAX,
+    step=CAP_STEP,
+    roster_size=ROSTER_SIZE,
+    min_forwards=MIN_FORWARDS,
+    min_defense=MIN_DEFENSEMEN,
+    must_include=None,
+    must_exclude=None,
+    processes=None,
+    time_limit=POINT_TIME_LIMIT,
+    engine=ENGINE,
+    presolve=PRESOLVE,
+    cores=None,
+    stop=None,
+):
+    caps = cap_grid(cap_min, cap_max, step)
+    pool = prepare_pool(df, must_exclude)
+    if presolve:
+        # dominance does not depend on the cap, so one pass covers every point
+        pool = presolve_pool(pool, roster_size, must_include)
+    pool = pool[[c for c in ROSTER_COLS + ["mp_value"] if c in pool.columns]]
+
+    # cores: how many of the machine's cores this frontier may use (all of
+    # them by default; the app passes what its solver pool granted)
+    cores = cores or os.cpu_count() or 1
+    processes = min(processes or MAX_PROCESSES, cores, len(caps))
+    blocks = [b for b in np.array_split(caps, processes) if len(b) > 0]
+    cp_threads = max(1, cores // len(blocks))
+    args = (roster_size, min_forwards, min_defense, list(must_include or []), time_limit, cp_threads, engine, stop)
+
+    # stop: a StopFlag; once set, queued blocks are dropped, running ones
+    # stop after their current point and FrontierCancelled is raised
+    rows = []
+    if len(blocks) == 1:
+        rows.extend(_solve_block(pool, blocks[0], *args))
+    else:
+        executor = _get_executor()
+        futures = [executor.submit(_solve_block, pool, block, *args) for block in blocks]
+        for fut in futures:
+            if stop is not None and stop.is_set():
+                for f in futures:
+                    f.cancel()
+            if not fut.cancelled():
+                rows.extend(fut.result())
+    if stop is not None and stop.is_set():
+        raise FrontierCancelled("frontier cancelled after {} of {} points".format(len(rows), len(caps)))
+
+    out = pd.DataFrame(rows).sort_values("cap").reset_index(drop=True)
+    # a larger cap can never do worse; smooth over points a time limit cut short
+    out["best_value"] = out["total_value"].cummax()
+    return out
+
+
+def frontier_figure(frontier):
+    import plotly.express as px
+
+    fig = px.line(
+        frontier,
+        x="cap",
+        y="best_value",
+        markers=True,
+        hover_data=["total_cap", "status"],
+        labels={"cap": "Salary Cap ($)", "best_value": "Best Total Predicted Value"},
+        title="Cap vs Best Achievable Value",
+    )
+    return fig
+
+
+def main():
+    from optimize_roster import load_players
+
+    df = load_players()
+    t0 = time.perf_counter()
+    out = cap_frontier(df, must_include=MUST_INCLUDE, must_exclude=MUST_EXCLUDE)
+    elapsed = time.perf_counter() - t0
+
+    os.makedirs(os.path.dirname(OUT_FILE), exist_ok=True)
+    out.to_csv(OUT_FILE, index=False)
+    print("Saved ->", OUT_FILE)
+    print("Points: {} in {:.1f}s (sum of point solves {:.1f}s)".format(
+        len(out), elapsed, out["solve_s"].sum()))
+    print(out[["cap", "best_value", "total_cap", "status"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
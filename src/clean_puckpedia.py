@@ -1,10 +1,9 @@
 import pandas as pd
 import re
+from table_io import write_table
 
-df = pd.read_excel("data/raw/puckpedia_raw.xlsx")
-
-# we'll keep the important columns
-df = df[["Name", "Pos", "GP", "Cap Hit", "Length", "Start Year"]]
+RAW_FILE = "data/raw/puckpedia_raw.xlsx"
+OUT_FILE = "data/processed/puckpedia_salaries.csv"
 
 def clean_name(n):
     if pd.isna(n):
@@ -15,7 +14,16 @@ def clean_name(n):
         n = f"{first.strip()} {last.strip()}"
     return n
 
-df["Name"] = df["Name"].apply(clean_name)
+def main():
+    df = pd.read_excel(RAW_FILE)
+
+    # we'll keep the important columns
+    df = df[["Name", "Pos", "GP", "Cap Hit", "Length", "Start Year"]]
+
+    df["Name"] = df["Name"].apply(clean_name)
+
+    write_table(df, OUT_FILE)
+    print(f"Saved cleaned salaries: {df.shape[0]} rows")
 
-df.to_csv("data/processed/puckpedia_salaries.csv", index=False)
-print(f"Saved cleaned salaries: {df.shape[0]} rows")
+if __name__ == "__main__":
+    main()
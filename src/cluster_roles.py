@@ -1,9 +1,15 @@
 import os
+import hashlib
+import argparse
 import joblib
 import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from table_io import read_table, write_table
+from features import CLUSTER_COLS
 
 IN_FILE = "data/processed/player_salary_efficiency.csv"
 OUT_DIR = "artifacts/clusters"
@@ -12,42 +18,163 @@ OUT_ARTIFACTS = os.path.join(OUT_DIR, "cluster_artifacts.joblib")
 
 os.makedirs(OUT_DIR, exist_ok=True)
 
-CLUSTER_COLS = [
-    "I_F_goals_per60",
-    "I_F_primaryAssists_per60",
-    "I_F_secondaryAssists_per60",
-    "I_F_points_per60",
-    "I_F_shotsOnGoal_per60",
-    "I_F_xGoals_per60",
-    "I_F_hits_per60",
-    "I_F_takeaways_per60",
-    "I_F_giveaways_per60",
-]
-
-def main(k=6):
-    df = pd.read_csv(IN_FILE)
+# "auto" sweeps K_RANGE and picks k; a number fixes k
+K = os.getenv("CLUSTER_K", "6")
+K_RANGE = (3, 10)
+# "kmeans", "minibatch", or "auto" (minibatch from MINIBATCH_ROWS rows up)
+BACKEND = os.getenv("CLUSTER_BACKEND", "auto")
+MINIBATCH_ROWS = 20_000
+N_INIT = 20
+SEED = 42
+SILHOUETTE_SAMPLE = 5_000
+N_JOBS = int(os.getenv("CLUSTER_JOBS", "-1"))
+
+def feature_matrix(df):
     mat = df[CLUSTER_COLS].copy()
     mat = mat.replace([np.inf, -np.inf], np.nan)
     for col in CLUSTER_COLS:
         col_median = mat[col].median()
         mat[col] = mat[col].fillna(col_median)
     mat = mat.fillna(0.0)
+    return mat
+
+def input_hash(mat):
+    h = hashlib.blake2b(digest_size=16)
+    h.update("\x1f".join(mat.columns).encode())
+    h.update(np.ascontiguousarray(mat.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+def resolve_backend(backend, n_rows):
+    if backend == "auto":
+        return "minibatch" if n_rows >= MINIBATCH_ROWS else "kmeans"
+    if backend not in ("kmeans", "minibatch"):
+        raise ValueError("unknown backend: {}".format(backend))
+    return backend
+
+def make_model(k, backend):
+    if backend == "minibatch":
+        return MiniBatchKMeans(n_clusters=k, random_state=SEED, n_init=3, batch_size=4096)
+    return KMeans(n_clusters=k, random_state=SEED, n_init=N_INIT)
+
+def fit_k(Xz, k, backend, sample=SILHOUETTE_SAMPLE):
+    model = make_model(k, backend)
+    labels = model.fit_predict(Xz)
+    # silhouette is quadratic in the rows, so large pools are scored on a
+    # fixed-size sample
+    if len(set(labels)) > 1:
+        size = sample if len(Xz) > sample else None
+        sil = float(silhouette_score(Xz, labels, sample_size=size, random_state=SEED))
+    else:
+        sil = float("nan")
+    return k, model, float(model.inertia_), sil
+
+def elbow_k(ks, inertias):
+    # point of the inertia curve furthest below the chord joining its ends
+    ks = np.asarray(ks, dtype=float)
+    y = np.asarray(inertias, dtype=float)
+    if len(ks) < 3:
+        return int(ks[0])
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (y - y[-1]) / (y[0] - y[-1]) if y[0] != y[-1] else np.zeros_like(y)
+    return int(ks[int(np.argmax((1 - x) - y))])
+
+def choose_k(sweep):
+    # best sampled silhouette; the elbow breaks near-ties (within 0.01)
+    ok = sweep.dropna(subset=["silhouette"])
+    if ok.empty:
+        return elbow_k(sweep["k"], sweep["inertia"])
+    best = ok["silhouette"].max()
+    close = ok[ok["silhouette"] >= best - 0.01]
+    elbow = elbow_k(sweep["k"], sweep["inertia"])
+    return int(close.iloc[(close["k"] - elbow).abs().argsort().iloc[0]]["k"])
+
+def fit_params(backend):
+    # everything besides the input that decides a cached fit and its score
+    return {"backend": backend, "n_init": N_INIT, "seed": SEED, "silhouette_sample": SILHOUETTE_SAMPLE}
+
+def load_cache(path, digest, params):
+    # fits from an earlier run on the same input and fit settings, keyed by k
+    if not os.path.exists(path):
+        return {}
+    try:
+        old = joblib.load(path)
+    except Exception:
+        return {}
+    if old.get("input_hash") != digest or old.get("fit_params") != params:
+        return {}
+    return dict(old.get("fits", {}))
+
+def cluster(df, k=K, k_range=K_RANGE, backend=BACKEND, n_jobs=N_JOBS, artifacts_path=OUT_ARTIFACTS):
+    mat = feature_matrix(df)
+    digest = input_hash(mat)
+    backend = resolve_backend(backend, len(mat))
 
     scaler = StandardScaler()
     Xz = scaler.fit_transform(mat)
 
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=20)
-    labels = kmeans.fit_predict(Xz)
+    auto = str(k) == "auto"
+    ks = list(range(k_range[0], k_range[1] + 1)) if auto else [int(k)]
+    ks = [c for c in ks if c <= len(mat)]
+    if not ks:
+        raise ValueError("not enough players to cluster")
+
+    params = fit_params(backend)
+    fits = load_cache(artifacts_path, digest, params)
+    todo = [c for c in ks if c not in fits]
+    if todo:
+        jobs = n_jobs if len(todo) > 1 else 1
+        for c, model, inertia, sil in Parallel(n_jobs=jobs)(delayed(fit_k)(Xz, c, backend) for c in todo):
+            fits[c] = {"kmeans": model, "inertia": inertia, "silhouette": sil}
+
+    sweep = pd.DataFrame([
+        {"k": c, "inertia": fits[c]["inertia"], "silhouette": fits[c]["silhouette"]} for c in ks
+    ])
+    chosen = choose_k(sweep) if auto else ks[0]
+    kmeans = fits[chosen]["kmeans"]
+    labels = kmeans.predict(Xz)
+    # reference for assign_roles: how far training players sit from their
+    # centroid, and the medians used to fill their gaps
+    dist = kmeans.transform(Xz).min(axis=1)
+
+    artifacts = {
+        "scaler": scaler,
+        "kmeans": kmeans,
+        "columns": CLUSTER_COLS,
+        "medians": mat.median().to_dict(),
+        "distance_p95": float(np.percentile(dist, 95)),
+        "k": chosen,
+        "backend": backend,
+        "input_hash": digest,
+        "fit_params": params,
+        "fits": fits,
+        "sweep": sweep,
+    }
+    return labels, artifacts, todo
+
+def main(k=None, k_range=K_RANGE, backend=BACKEND):
+    k = K if k is None else k
+    df = read_table(IN_FILE)
+
+    labels, artifacts, refit = cluster(df, k=k, k_range=k_range, backend=backend)
 
     out = df[["Name", "team", "position", "cap_hit", "mp_value"]].copy()
     out["role_cluster"] = labels
 
-    out.to_csv(OUT_ROLES, index=False)
-    artifacts = {"scaler": scaler, "kmeans": kmeans, "columns": CLUSTER_COLS}
+    write_table(out, OUT_ROLES)
     joblib.dump(artifacts, OUT_ARTIFACTS)
 
+    if len(artifacts["sweep"]) > 1:
+        print(artifacts["sweep"].to_string(index=False))
+    print("k = {} ({} backend, refit k: {})".format(
+        artifacts["k"], artifacts["backend"], refit if refit else "none, cached"))
     print("Saved clustered player roles to:", OUT_ROLES)
     print("Saved model artifacts to:", OUT_ARTIFACTS)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Cluster players into roles.")
+    parser.add_argument("--k", default=None, help="number of clusters, or 'auto' to sweep --k-range")
+    parser.add_argument("--k-range", default=None, help="sweep range as MIN-MAX (default {}-{})".format(*K_RANGE))
+    parser.add_argument("--backend", default=BACKEND, choices=["auto", "kmeans", "minibatch"])
+    args = parser.parse_args()
+    k_range = tuple(int(v) for v in args.k_range.split("-")) if args.k_range else K_RANGE
+    main(k=args.k, k_range=k_range, backend=args.backend)
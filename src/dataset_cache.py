@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "data/cache")
+CACHE_TTL = float(os.getenv("DATASET_CACHE_TTL", "300"))
+RETRY_AFTER = 30
+FETCH_TIMEOUT = 30
+CHUNK_BYTES = 1 << 20
+
+
+def _sql_path(path):
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+def _temp_path(directory, suffix):
+    # a private name in the shared cache dir, so processes using the same
+    # cache_dir never write the same temp file
+    fd, path = tempfile.mkstemp(dir=directory, prefix=".", suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    # One shared copy of a remote CSV per process, backed by a local Parquet
+    # snapshot and revalidated with ETag / Last-Modified once the TTL expires.
+    # The version is a hash of the CSV's bytes wherever it came from, so a
+    # seeded snapshot and the same file downloaded later are one version.
+
+    def __init__(self, url, cache_dir=CACHE_DIR, ttl=CACHE_TTL, name="player_predictions"):
+        self.url = url
+        self.ttl = float(ttl)
+        self.cache_dir = cache_dir
+        self.snapshot_path = os.path.join(cache_dir, name + ".parquet")
+        self.meta_path = os.path.join(cache_dir, name + ".json")
+        self._fetch_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._refresh_thread = None
+        self._listeners = []
+        self._df = None
+        self._meta = {}
+        self._checked_at = 0.0
+
+    @property
+    def version(self):
+        return self._meta.get("version")
+
+    @property
+    def meta(self):
+        return dict(self._meta)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def get(self):
+        # Only a cold process with no snapshot on disk waits on the network;
+        # everything else is served from memory while revalidation runs in
+        # the background.
+        df = self._df
+        if df is None:
+            with self._fetch_lock:
+                if self._df is None:
+                    self._load_snapshot()
+                if self._df is None:
+                    self._revalidate()
+            return self._df
+        if time.time() - self._checked_at >= self.ttl:
+            self.refresh_async()
+        return df
+
+    def refresh(self):
+        with self._fetch_lock:
+            if self._df is None:
+                self._load_snapshot()
+            return self._revalidate()
+
+    def refresh_async(self):
+        with self._thread_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return self._refresh_thread
+            t = threading.Thread(target=self.refresh, name="dataset-refresh", daemon=True)
+            self._refresh_thread = t
+        t.start()
+        return t
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return False
+        meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        import duckdb
+
+        con = duckdb.connect()
+        try:
+            df = con.execute(
+                "SELECT * FROM read_parquet(" + _sql_path(self.snapshot_path) + ")"
+            ).df()
+        finally:
+            con.close()
+        self._set_frame(df, meta)
+        self._checked_at = float(meta.get("checked_at", 0.0))
+        logging.info("dataset snapshot loaded path=%s version=%s rows=%s",
+                     self.snapshot_path, meta.get("version"), len(df))
+        return True
+
+    def _set_frame(self, df, meta):
+        df.attrs["dataset_version"] = meta.get("version")
+        self._meta = meta
+        self._df = df
+
+    def _write_meta(self):
+        tmp = _temp_path(self.cache_dir, ".json")
+        with open(tmp, "w") as f:
+            json.dump(self._meta, f, indent=2)
+        os.replace(tmp, self.meta_path)
+
+    def _revalidate(self):
+        # Returns True when a new version was installed.
+        os.makedirs(self.cache_dir, exist_ok=True)
+        req = urllib.request.Request(self.url)
+        if self._df is not None:
+            if self._meta.get("etag"):
+                req.add_header("If-None-Match", self._meta["etag"])
+            if self._meta.get("last_modified"):
+                req.add_header("If-Modified-Since", self._meta["last_modified"])
+
+        download = _temp_path(self.cache_dir, ".csv")
+        digest = hashlib.sha256()
+        try:
+            with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT) as resp:
+                etag = resp.headers.get("ETag")
+                last_modified = resp.headers.get("Last-Modified")
+                with open(download, "wb") as out:
+                    while True:
+                        chunk = resp.read(CHUNK_BYTES)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        out.write(chunk)
+        except urllib.error.HTTPError as e:
+            os.remove(download)
+            if e.code == 304 and self._df is not None:
+                self._checked_at = time.time()
+                self._meta["checked_at"] = self._checked_at
+                self._write_meta()
+                logging.info("dataset not modified version=%s", self.version)
+                return False
+            return self._fetch_failed(e)
+        except (urllib.error.URLError, OSError) as e:
+            if os.path.exists(download):
+                os.remove(download)
+            return self._fetch_failed(e)
+
+        version = digest.hexdigest()[:16]
+        if self._df is not None and version == self.version:
+            # same bytes (e.g. the seeded file): keep the snapshot, remember
+            # the validators for the next conditional request
+            os.remove(download)
+            self._checked_at = time.time()
+            self._meta.update({"checked_at": self._checked_at, "etag": etag, "last_modified": last_modified})
+            self._write_meta()
+            return False
+
+        try:
+            self._install(download, {
+                "url": self.url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "version": version,
+            })
+        finally:
+            os.remove(download)
+        return True
+
+    def seed(self, path):
+        # Installs a CSV shipped with the deployment as the snapshot, so a
+        # fresh worker starts without a download. It counts as checked when
+        # the file was written; once that is older than the TTL the usual
+        # background revalidation replaces it from the URL.
+        with self._fetch_lock:
+            if self._df is not None or self._load_snapshot():
+                return False
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._install(path, {
+                "url": self.url,
+                "etag": None,
+                "last_modified": None,
+                "version": _file_digest(path)[:16],
+                "seeded_from": path,
+            }, checked_at=os.path.getmtime(path))
+            return True
+
+    def _install(self, csv_path, meta, checked_at=None):
+        import duckdb
+
+        tmp_snapshot = _temp_path(self.cache_dir, ".parquet")
+        con = duckdb.connect()
+        try:
+            con.execute(
+                "COPY (SELECT * FROM read_csv_auto(" + _sql_path(csv_path) + ")) TO "
+                + _sql_path(tmp_snapshot) + " (FORMAT PARQUET)"
+            )
+            df = con.execute("SELECT * FROM read_parquet(" + _sql_path(tmp_snapshot) + ")").df()
+        finally:
+            con.close()
+        os.replace(tmp_snapshot, self.snapshot_path)
+
+        now = time.time()
+        meta = dict(meta)
+        meta.update({
+            "fetched_at": now,
+            "checked_at": now if checked_at is None else checked_at,
+            "rows": int(len(df)),
+        })
+        self._set_frame(df, meta)
+        self._checked_at = meta["checked_at"]
+        self._write_meta()
+        logging.info("dataset refreshed version=%s rows=%s", meta["version"], len(df))
+
+        for callback in list(self._listeners):
+            try:
+                callback(self)
+            except Exception:
+                logging.exception("dataset refresh listener failed")
+
+    def _fetch_failed(self, err):
+        if self._df is None:
+            raise RuntimeError("Could not fetch dataset from " + self.url + ": " + str(err))
+        # keep serving the last good snapshot and try again a little later
+        self._checked_at = time.time() - self.ttl + min(RETRY_AFTER, self.ttl)
+        logging.warning("dataset refresh failed, serving version=%s: %s", self.version, err)
+        return False
+
+
+if __name__ == "__main__":
+    # Prebuilds the serving snapshot at deploy time:
+    #   python src/dataset_cache.py data/processed/player_predictions.csv
+    import sys
+
+    cache = DatasetCache(os.getenv("S3_URL", ""))
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/processed/player_predictions.csv"
+    if cache.seed(path):
+        print("Snapshot {} rows -> {} (version {})".format(cache.meta["rows"], cache.snapshot_path, cache.version))
+    else:
+        print("Snapshot already present ->", cache.snapshot_path)
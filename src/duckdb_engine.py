@@ -0,0 +1,102 @@
+import os
+import duckdb
+import pandas as pd
+import table_io
+from table_io import parquet_path, apply_schema, TableWriter
+
+# Settings for the DuckDB execution mode of the pipeline stages. DuckDB uses
+# every core by default and spills to TEMP_DIR once MEMORY_LIMIT is reached.
+THREADS = int(os.getenv("DUCKDB_THREADS", "0"))
+MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "")
+TEMP_DIR = os.getenv("DUCKDB_TEMP_DIR", "data/cache/duckdb_tmp")
+
+SQL_TYPES = {str: "VARCHAR", "Int64": "BIGINT", "float64": "DOUBLE"}
+INT_TYPES = {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT",
+             "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT"}
+BATCH_ROWS = 100_000
+
+
+def sql_path(path):
+    return "'" + str(path).replace("'", "''") + "'"
+
+
+def ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def connect():
+    con = duckdb.connect()
+    if THREADS > 0:
+        con.execute("SET threads = {}".format(THREADS))
+    if MEMORY_LIMIT:
+        con.execute("SET memory_limit = " + sql_path(MEMORY_LIMIT))
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    con.execute("SET temp_directory = " + sql_path(TEMP_DIR))
+    con.execute("SET preserve_insertion_order = true")
+    return con
+
+
+def table_source(path, fmt=None):
+    # same file choice as table_io.read_table
+    if table_io.use_parquet(path, fmt):
+        return "read_parquet({})".format(sql_path(parquet_path(path)))
+    return "read_csv({}, header = true)".format(sql_path(path))
+
+
+def csv_source(paths, types=None):
+    files = "[" + ", ".join(sql_path(p) for p in paths) + "]"
+    opts = ["header = true", "union_by_name = true"]
+    if types:
+        opts.append("types = {" + ", ".join(
+            "{}: {}".format(sql_path(c), sql_path(t)) for c, t in types.items()) + "}")
+    return "read_csv({}, {})".format(files, ", ".join(opts))
+
+
+def columns_of(con, source):
+    return [row[0] for row in con.execute("DESCRIBE SELECT * FROM " + source).fetchall()]
+
+
+def fetch(con, query, schema=True):
+    # DuckDB hands back nullable integer columns; pandas would have read an
+    # integer column with gaps as float64, so match that before the declared
+    # pipeline schema is applied
+    df = con.execute(query).df()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(df[col].dtype):
+            if df[col].isna().any():
+                df[col] = df[col].astype("float64")
+            else:
+                df[col] = df[col].astype(df[col].dtype.numpy_dtype)
+    return apply_schema(df) if schema else df
+
+
+def stream_table(con, query, path, schema=True, batch_rows=BATCH_ROWS):
+    # Writes a query's result with TableWriter one Arrow batch at a time, so
+    # it is never held in pandas whole; the files match
+    # write_table(fetch(con, query, schema), path). The result is stored
+    # once in a temp table (spilled to TEMP_DIR past MEMORY_LIMIT) so the
+    # query is not re-run for each pass. Integer columns with gaps are made
+    # DOUBLE for the whole result, the way fetch does it, so every batch
+    # formats them alike.
+    con.execute("CREATE OR REPLACE TEMP TABLE _stream AS " + query)
+    described = con.execute("DESCRIBE SELECT * FROM _stream").fetchall()
+    ints = [row[0] for row in described if row[1] in INT_TYPES]
+    gaps = []
+    if ints:
+        counts = con.execute("SELECT {} FROM _stream".format(
+            ", ".join("count(*) - count({})".format(ident(c)) for c in ints))).fetchone()
+        gaps = [c for c, n in zip(ints, counts) if n]
+    select = "SELECT * FROM _stream"
+    if gaps:
+        select = "SELECT * REPLACE ({}) FROM _stream".format(
+            ", ".join("CAST({0} AS DOUBLE) AS {0}".format(ident(c)) for c in gaps))
+    reader = con.execute(select).fetch_record_batch(batch_rows)
+    with TableWriter(path) as out:
+        for batch in reader:
+            df = batch.to_pandas()
+            out.write(apply_schema(df) if schema else df)
+        if out.rows == 0:
+            df = reader.schema.empty_table().to_pandas()
+            out.write(apply_schema(df) if schema else df)
+    con.execute("DROP TABLE _stream")
+    return out.rows, out.columns
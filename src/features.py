@@ -0,0 +1,27 @@
+# Column lists shared by the clustering and training stages and by
+# run_pipeline, which hashes only the columns each stage reads. No imports,
+# so fingerprinting a stage does not load sklearn.
+CLUSTER_COLS = [
+    "I_F_goals_per60",
+    "I_F_primaryAssists_per60",
+    "I_F_secondaryAssists_per60",
+    "I_F_points_per60",
+    "I_F_shotsOnGoal_per60",
+    "I_F_xGoals_per60",
+    "I_F_hits_per60",
+    "I_F_takeaways_per60",
+    "I_F_giveaways_per60",
+]
+
+TARGET = "mp_value"
+
+NUMERIC_FEATURES = [
+    "games_played", "cap_hit", "onIce_corsiPercentage", "icetime_minutes",
+    "I_F_points", "I_F_goals", "I_F_primaryAssists", "I_F_xGoals",
+    "I_F_takeaways", "I_F_giveaways",
+    "I_F_goals_per60", "I_F_primaryAssists_per60", "I_F_secondaryAssists_per60",
+    "I_F_points_per60", "I_F_shotsOnGoal_per60", "I_F_xGoals_per60",
+    "I_F_hits_per60", "I_F_takeaways_per60", "I_F_giveaways_per60"
+]
+
+CATEGORICAL_FEATURES = ["position"]
@@ -1,14 +1,78 @@
 import os
+import hashlib
+import argparse
 import joblib
+import numpy as np
 import pandas as pd
+import table_io
+from table_io import read_table, write_table, parquet_path
 
 DATA_FILE = "data/processed/player_salary_efficiency.csv"
-MODEL_FILE = "artifacts/model/mp_value_ridge_pipeline.joblib"
+MODEL_FILE = "artifacts/model/mp_value_pipeline.joblib"
 ROLES_FILE = "artifacts/clusters/player_roles.csv"
+ARTIFACTS_FILE = "artifacts/clusters/cluster_artifacts.joblib"
 OUT_FILE = "data/processed/player_predictions.csv"
 
-def main():
-    df = pd.read_csv(DATA_FILE)
+# rows are scored in blocks of this many so a multi-season table never builds
+# one huge feature matrix
+BATCH_ROWS = 50_000
+PRED_COLS = ["pred_mp_value", "role_cluster", "row_hash", "model_version"]
+
+def model_version(paths):
+    # digest of the saved model (and cluster artifacts, when used): any
+    # retrain changes it and every row is scored again
+    h = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+def row_hashes(df):
+    # hex strings so the hash survives the CSV copy
+    values = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return np.array(["{:016x}".format(v) for v in values], dtype=object)
+
+def load_previous(path, version):
+    # earlier predictions made by the same model, keyed by row hash
+    if not os.path.exists(path) and not os.path.exists(parquet_path(path)):
+        return None
+    old = read_table(path)
+    if "row_hash" not in old.columns or "model_version" not in old.columns:
+        return None
+    old = old[old["model_version"].astype(str) == version]
+    old = old.drop_duplicates(subset="row_hash", keep="last")
+    return old.set_index(old["row_hash"].astype(str))
+
+def unchanged(previous, df):
+    # The table still has to be read and hashed to find the changed rows, and
+    # any change rewrites the whole file, since the app reads one CSV. Only a
+    # run where the file on disk already holds this exact table (same rows in
+    # the same order, same columns and predictions, both copies as this
+    # format writes them) skips the write.
+    if previous is None or len(previous) != len(df) or list(previous.columns) != list(df.columns):
+        return False
+    if not os.path.exists(OUT_FILE) or os.path.exists(parquet_path(OUT_FILE)) != (table_io.FORMAT == "parquet"):
+        return False
+    if previous["row_hash"].astype(str).tolist() != df["row_hash"].tolist():
+        return False
+    cols = [c for c in PRED_COLS if c in df.columns]
+    return previous[cols].reset_index(drop=True).equals(df[cols].reset_index(drop=True))
+
+def score(df, pipeline, features, assigner, batch_rows=BATCH_ROWS):
+    preds = np.empty(len(df))
+    for start in range(0, len(df), batch_rows):
+        preds[start:start + batch_rows] = pipeline.predict(df[features].iloc[start:start + batch_rows])
+    out = pd.DataFrame({"pred_mp_value": preds}, index=df.index)
+    if assigner is not None:
+        out["role_cluster"] = assigner.assign(df, batch_rows=batch_rows)["role_cluster"]
+    return out
+
+def main(full=False):
+    df = read_table(DATA_FILE)
+    # the hash covers every input column, so a row is reused only when the
+    # output row would come out the same
+    df["row_hash"] = row_hashes(df)
 
     bundle = joblib.load(MODEL_FILE)
     pipeline = bundle["pipeline"]
@@ -19,18 +83,52 @@ def main():
         if col in df.columns:
             present_features.append(col)
 
-    X = df[present_features]
-    preds = pipeline.predict(X)
-    df["pred_mp_value"] = preds
+    assigner = None
+    version_files = [MODEL_FILE]
+    if os.path.exists(ARTIFACTS_FILE):
+        # label every row from the saved centroids; a Name/team merge misses
+        # traded players and fans out on repeated names
+        from assign_roles import RoleAssigner
+
+        assigner = RoleAssigner(ARTIFACTS_FILE)
+        version_files.append(ARTIFACTS_FILE)
+    version = model_version(version_files)
+
+    previous = None if full else load_previous(OUT_FILE, version)
+    if previous is not None:
+        reuse = df["row_hash"].isin(previous.index).to_numpy()
+    else:
+        reuse = np.zeros(len(df), dtype=bool)
 
-    if os.path.exists(ROLES_FILE):
-        roles = pd.read_csv(ROLES_FILE)
+    scored = score(df[~reuse], pipeline, present_features, assigner)
+    if reuse.any():
+        kept = [c for c in scored.columns if c in previous.columns]
+        old = previous.loc[df.loc[reuse, "row_hash"], kept]
+        old.index = df.index[reuse]
+        scored = pd.concat([scored, old]).loc[df.index]
+    for col in scored.columns:
+        df[col] = scored[col]
+
+    if assigner is None and (os.path.exists(ROLES_FILE) or os.path.exists(parquet_path(ROLES_FILE))):
+        roles = read_table(ROLES_FILE)
         cols = ["Name", "team", "role_cluster"]
         roles = roles[cols]
         df = df.merge(roles, on=["Name", "team"], how="left")
 
-    df.to_csv(OUT_FILE, index=False)
+    df["model_version"] = version
+    df = df[[c for c in df.columns if c not in PRED_COLS] + [c for c in PRED_COLS if c in df.columns]]
+
+    print("Scored {} of {} rows (model {}, {} unchanged)".format(
+        int((~reuse).sum()), len(df), version, int(reuse.sum())))
+    if unchanged(previous, df):
+        print("Predictions unchanged, kept", OUT_FILE)
+        return
+    # the app and the S3 upload read the CSV, so it is always exported
+    write_table(df, OUT_FILE, csv_export=True)
     print("Saved ->", OUT_FILE)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Score players with the saved model.")
+    parser.add_argument("--full", action="store_true", help="re-score every row, ignoring earlier predictions")
+    args = parser.parse_args()
+    main(full=args.full)
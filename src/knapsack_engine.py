@@ -0,0 +1,119 @@
+import numpy as np
+
+MAX_CELLS = 60_000_000
+INF = np.int64(2) ** 62
+
+
+def _value_offset(values):
+    # DP tables are indexed by value, so shift everything to be >= 0. Every
+    # roster has the same size, so a common shift does not change the argmax.
+    low = int(values.min()) if len(values) else 0
+    return -low if low < 0 else 0
+
+
+def _group_span(values, k):
+    if k <= 0 or len(values) == 0:
+        return 0
+    top = np.sort(values)[::-1][:k]
+    return int(top.sum())
+
+
+def dp_cells(values, is_forward, forced, roster_size):
+    free = ~forced
+    k = max(0, int(roster_size) - int(forced.sum()))
+    vals = values + _value_offset(values)
+    cells = 0
+    for g in (is_forward & free, ~is_forward & free):
+        n = int(g.sum())
+        cells += n * (k + 1) * (_group_span(vals[g], k) + 1)
+    return cells
+
+
+def _min_cost_table(vals, costs, k):
+    # cost[j, v] = cheapest way to pick j players worth exactly v.
+    # take[i, j, v] records whether player i improved state (j, v).
+    span = _group_span(vals, k)
+    cost = np.full((k + 1, span + 1), INF, dtype=np.int64)
+    cost[0, 0] = 0
+    take = np.zeros((len(vals), k + 1, span + 1), dtype=bool)
+    if k == 0:
+        return cost, take
+    # only the rows and value columns reachable so far need updating
+    reach = np.minimum(np.cumsum(vals), span)
+    for i in range(len(vals)):
+        vi = int(vals[i])
+        rows = min(i + 1, k)
+        top = int(reach[i]) + 1
+        cand = cost[:rows, :top - vi] + costs[i]
+        dest = cost[1:rows + 1, vi:top]
+        better = cand < dest
+        np.copyto(dest, cand, where=better)
+        take[i, 1:rows + 1, vi:top] = better
+    return cost, take
+
+
+def _backtrack(take, vals, j, v):
+    picked = []
+    for i in range(take.shape[0] - 1, -1, -1):
+        if j == 0:
+            break
+        if take[i, j, v]:
+            picked.append(i)
+            j -= 1
+            v -= int(vals[i])
+    return picked
+
+
+def _suffix_min(row):
+    return np.minimum.accumulate(row[::-1])[::-1]
+
+
+def solve_knapsack(values, costs, is_forward, forced, cap, roster_size, f_min, d_min):
+    # Exact solver for the core roster model: exactly roster_size players,
+    # total cost <= cap, at least f_min forwards and d_min defense, forced
+    # players in. Values and costs must be integers. Returns a boolean
+    # selection mask, or None when the model is infeasible.
+    values = np.asarray(values, dtype=np.int64)
+    costs = np.asarray(costs, dtype=np.int64)
+    is_forward = np.asarray(is_forward, dtype=bool)
+    forced = np.asarray(forced, dtype=bool)
+
+    k = int(roster_size) - int(forced.sum())
+    budget = int(cap) - int(costs[forced].sum())
+    f_need = max(0, int(f_min) - int((forced & is_forward).sum()))
+    d_need = max(0, int(d_min) - int((forced & ~is_forward).sum()))
+    if k < 0 or budget < 0 or f_need + d_need > k:
+        return None
+
+    vals = values + _value_offset(values)
+    f_idx = np.flatnonzero(is_forward & ~forced)
+    d_idx = np.flatnonzero(~is_forward & ~forced)
+    cost_f, take_f = _min_cost_table(vals[f_idx], costs[f_idx], min(k, len(f_idx)))
+    cost_d, take_d = _min_cost_table(vals[d_idx], costs[d_idx], min(k, len(d_idx)))
+
+    best = None
+    for nf in range(f_need, k - d_need + 1):
+        nd = k - nf
+        if nf >= cost_f.shape[0] or nd >= cost_d.shape[0]:
+            continue
+        row_f = cost_f[nf]
+        reach = np.flatnonzero(row_f <= budget)
+        if len(reach) == 0:
+            continue
+        g = _suffix_min(cost_d[nd])
+        vd = np.searchsorted(g, budget - row_f[reach], side="right") - 1
+        ok = vd >= 0
+        if not ok.any():
+            continue
+        totals = reach[ok] + vd[ok]
+        pos = int(np.argmax(totals))
+        if best is None or totals[pos] > best[0]:
+            best = (int(totals[pos]), nf, int(reach[ok][pos]), nd, int(vd[ok][pos]))
+
+    if best is None:
+        return None
+    _, nf, vf, nd, vd = best
+    mask = forced.copy()
+    mask[f_idx[_backtrack(take_f, vals[f_idx], nf, vf)]] = True
+    mask[d_idx[_backtrack(take_d, vals[d_idx], nd, vd)]] = True
+    return mask
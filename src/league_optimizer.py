@@ -0,0 +1,424 @@
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from ortools.sat.python import cp_model
+import telemetry
+from roster_model import (
+    prepare_pool, group_minimums, add_linear, scaled_values, RosterModel, solve_model, ROSTER_COLS,
+)
+
+# Assigns players to every team of a league at once: each player on at most
+# one team, each team with its own cap, size and F/D minimums. Unless a team
+# count is given, the league has as many full teams as the pool can field,
+# up to TEAMS.
+TEAMS = 32
+CAP = 83_500_000
+ROSTER_SIZE = 21
+MIN_FORWARDS = 12
+MIN_DEFENSEMEN = 6
+OBJECTIVES = ["total", "maxmin"]
+METHODS = ["auto", "full", "decompose"]
+
+TIME_LIMIT = 60
+# one CP-SAT model over every (player, team) pair up to this many variables;
+# past it the league is decomposed
+FULL_MAX_VARS = 20_000
+# decomposition: teams re-solved together per sub-problem, free players
+# offered to each sub-problem, and seconds per sub-solve
+LNS_TEAMS = 4
+FREE_PER_GROUP = 60
+SUB_TIME_LIMIT = 5
+PATIENCE = 3
+THREADS = int(os.getenv("LEAGUE_THREADS", str(os.cpu_count() or 1)))
+SEED = 0
+
+IN_FILE = "data/processed/player_predictions.csv"
+OUT_FILE = "data/processed/league_rosters.csv"
+
+
+def fit_teams(pool, cap, roster_size, min_forwards, min_defense, most=TEAMS):
+    # per-team limits fix the count; scalar ones allow as many teams as there
+    # are players, forwards and defensemen for, and whose cheapest possible
+    # rosters fit under their caps together
+    lengths = [np.size(v) for v in (cap, roster_size, min_forwards, min_defense)]
+    if max(lengths) > 1:
+        return max(lengths)
+    n_f = int((pool["group"] == "F").sum())
+    n_d = len(pool) - n_f
+    teams = min(most, len(pool) // max(1, int(roster_size)))
+    if min_forwards:
+        teams = min(teams, n_f // int(min_forwards))
+    if min_defense:
+        teams = min(teams, n_d // int(min_defense))
+    while teams > 0 and cheapest_league(pool, teams, roster_size, min_forwards, min_defense) > teams * cap:
+        teams -= 1
+    return teams
+
+
+def cheapest_league(pool, teams, roster_size, min_forwards, min_defense):
+    # least that many rosters can cost together: the cheapest forwards and
+    # defensemen for the minimums, then the cheapest of everyone else
+    costs = pool["cap_hit"].to_numpy(dtype=float)
+    is_f = (pool["group"] == "F").to_numpy()
+    f_need, d_need = teams * int(min_forwards), teams * int(min_defense)
+    f = np.sort(costs[is_f])
+    d = np.sort(costs[~is_f])
+    rest = np.sort(np.concatenate([f[f_need:], d[d_need:]]))
+    return f[:f_need].sum() + d[:d_need].sum() + rest[:max(0, teams * int(roster_size) - f_need - d_need)].sum()
+
+
+def per_team(value, teams):
+    return np.broadcast_to(np.asarray(value, dtype=np.int64), (teams,)).copy()
+
+
+class League:
+    # Arrays for the pool and the per-team limits, shared by both methods.
+
+    def __init__(self, pool, teams, cap, roster_size, min_forwards, min_defense):
+        self.pool = pool
+        self.teams = int(teams)
+        self.values = scaled_values(pool)
+        self.costs = pool["cap_hit"].to_numpy(dtype=float).astype(np.int64)
+        self.is_forward = pool["group"].to_numpy() == "F"
+        self.is_defense = ~self.is_forward
+        self.caps = per_team(cap, self.teams)
+        self.sizes = per_team(roster_size, self.teams)
+        mins = [group_minimums(self.is_forward, s, f, d) for s, f, d in zip(
+            self.sizes, per_team(min_forwards, self.teams), per_team(min_defense, self.teams))]
+        self.f_mins = np.array([m[0] for m in mins], dtype=np.int64)
+        self.d_mins = np.array([m[1] for m in mins], dtype=np.int64)
+
+    def check(self):
+        n = len(self.pool)
+        if self.sizes.sum() > n:
+            raise ValueError("{} teams need {} players, the pool has {}".format(self.teams, int(self.sizes.sum()), n))
+        if self.f_mins.sum() > self.is_forward.sum() or self.d_mins.sum() > self.is_defense.sum():
+            raise ValueError("not enough forwards or defensemen for every team's minimum")
+
+    def valid(self, assign):
+        # the decomposition is not solved as one model, so its final
+        # assignment is checked against every team's limits before it is
+        # called feasible; one slot per player keeps each on at most one team
+        if len(assign) != len(self.pool) or (assign < -1).any() or (assign >= self.teams).any():
+            return False
+        picked = assign >= 0
+        slots = assign[picked]
+        size = np.bincount(slots, minlength=self.teams)
+        cost = np.bincount(slots, weights=self.costs[picked], minlength=self.teams)
+        fwd = np.bincount(slots[self.is_forward[picked]], minlength=self.teams)
+        dfn = np.bincount(slots[self.is_defense[picked]], minlength=self.teams)
+        return bool((size == self.sizes).all() and (cost <= self.caps).all()
+                    and (fwd >= self.f_mins).all() and (dfn >= self.d_mins).all())
+
+    def team_values(self, assign):
+        return np.bincount(assign[assign >= 0], weights=self.values[assign >= 0], minlength=self.teams).astype(np.int64)
+
+
+class LeagueResult:
+    def __init__(self, status, league, assign, method, elapsed, rounds=0, gap=None):
+        self.status = status
+        self.method = method
+        self.elapsed = elapsed
+        self.rounds = rounds
+        self.assign = assign
+        pool = league.pool
+        picked = assign >= 0
+        cols = list(ROSTER_COLS) + (["mp_value"] if "mp_value" in pool.columns else [])
+        rosters = pool.loc[pool.index[picked], cols].copy()
+        rosters.insert(0, "slot", assign[picked])
+        self.rosters = rosters.sort_values(["slot", "group", "pred_mp_value"], ascending=[True, True, False])
+        self.teams = rosters.groupby("slot").agg(
+            players=("Name", "size"),
+            forwards=("group", lambda g: int((g == "F").sum())),
+            defense=("group", lambda g: int((g == "D").sum())),
+            total_cap=("cap_hit", "sum"),
+            total_value=("pred_mp_value", "sum"),
+        ).reindex(range(league.teams))
+        self.total_value = float(self.teams["total_value"].sum())
+        self.min_value = float(self.teams["total_value"].min())
+        self.max_value = float(self.teams["total_value"].max())
+        # CP-SAT's relative optimality gap, for full solves
+        self.gap = gap
+
+    @property
+    def feasible(self):
+        return self.status in ("OPTIMAL", "FEASIBLE")
+
+
+def build_assignment(league, players, teams, objective, hint=None, symmetry=False):
+    # CP-SAT model over players x teams, written straight into the proto the
+    # way roster_model does it. Variable p * k + j is player players[p] on
+    # team teams[j].
+    model = cp_model.CpModel()
+    n, k = len(players), len(teams)
+    proto = model.Proto()
+    for _ in range(n * k):
+        var = proto.variables.add()
+        var.domain.extend([0, 1])
+    grid = np.arange(n * k, dtype=np.int64).reshape(n, k)
+    values = league.values[players]
+    costs = league.costs[players]
+    is_f = league.is_forward[players]
+    is_d = league.is_defense[players]
+    # a team's total lies between the sum of the negative values and the sum
+    # of the positive ones
+    lo = int(values[values < 0].sum())
+    hi = int(values[values > 0].sum())
+
+    if k > 1:
+        for p in range(n):
+            add_linear(model, grid[p], np.ones(k), 0, 1)
+    for j, t in enumerate(teams):
+        col = grid[:, j]
+        add_linear(model, col, costs, 0, league.caps[t])
+        add_linear(model, col, np.ones(n), league.sizes[t], league.sizes[t])
+        add_linear(model, col[is_f], np.ones(int(is_f.sum())), league.f_mins[t], n)
+        add_linear(model, col[is_d], np.ones(int(is_d.sum())), league.d_mins[t], n)
+
+    if symmetry:
+        # identical teams are interchangeable, so their totals can be ordered
+        limits = np.stack([league.caps, league.sizes, league.f_mins, league.d_mins], axis=1)[list(teams)]
+        for j in range(k - 1):
+            if (limits[j] == limits[j + 1]).all():
+                add_linear(model, np.concatenate([grid[:, j], grid[:, j + 1]]),
+                           np.concatenate([values, -values]), 0, hi - lo)
+
+    obj = proto.objective
+    obj.vars.extend(grid.ravel().tolist())
+    obj.coeffs.extend(np.repeat(-values, k).tolist())
+    if objective == "maxmin":
+        # z is the weakest team's value; it dominates, the total breaks ties
+        z = len(proto.variables)
+        var = proto.variables.add()
+        var.domain.extend([lo, hi])
+        weight = (hi - lo) * k + 1
+        for j in range(k):
+            add_linear(model, np.append(grid[:, j], z), np.append(values, -1), 0, hi - lo)
+        obj.vars.append(z)
+        obj.coeffs.append(-weight)
+    obj.scaling_factor = -1
+
+    if hint is not None:
+        hint_x = np.zeros((n, k), dtype=np.int64)
+        for j, t in enumerate(teams):
+            hint_x[:, j] = hint == t
+        proto.solution_hint.vars.extend(grid.ravel().tolist())
+        proto.solution_hint.values.extend(hint_x.ravel().tolist())
+    return model, grid
+
+
+def solve_assignment(league, players, teams, objective, hint=None, time_limit=SUB_TIME_LIMIT,
+                     num_workers=1, symmetry=False):
+    # Returns the team (or -1) for each of players, the CP-SAT status and the
+    # relative gap between the solution and the proven bound.
+    model, grid = build_assignment(league, players, teams, objective, hint, symmetry)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max(0.1, float(time_limit))
+    solver.parameters.num_search_workers = int(num_workers)
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None, status, None
+    sol = np.asarray(solver.ResponseProto().solution, dtype=np.int64)[grid.ravel()].reshape(grid.shape)
+    out = np.full(len(players), -1, dtype=np.int64)
+    p, j = np.nonzero(sol)
+    out[p] = np.asarray(teams, dtype=np.int64)[j]
+    best, bound = solver.ObjectiveValue(), solver.BestObjectiveBound()
+    return out, status, (bound - best) / max(abs(bound), 1.0)
+
+
+def group_score(league, assign, teams, objective):
+    vals = league.team_values(assign)[list(teams)]
+    if objective == "maxmin":
+        return (int(vals.min()), int(vals.sum()))
+    return (int(vals.sum()),)
+
+
+def snake_buckets(league):
+    # deals forwards and defensemen, best first, across the teams in snake
+    # order so every bucket gets a similar spread of talent and salary
+    buckets = [[] for _ in range(league.teams)]
+    for mask in (league.is_forward, league.is_defense):
+        idx = np.flatnonzero(mask)
+        idx = idx[np.argsort(-league.values[idx], kind="stable")]
+        order = np.concatenate([np.arange(league.teams), np.arange(league.teams)[::-1]])
+        for i, p in enumerate(idx):
+            buckets[order[i % len(order)]].append(p)
+    return [np.array(b, dtype=np.int64) for b in buckets]
+
+
+def solve_team(league, players, team, engine="auto"):
+    # one team alone on its own candidates, with roster_model's solver
+    rm = RosterModel(league.pool.iloc[players], league.caps[team], league.sizes[team],
+                     league.f_mins[team], league.d_mins[team])
+    res = solve_model(rm, time_limit=SUB_TIME_LIMIT, num_workers=1, engine=engine)
+    if not res.feasible:
+        return None
+    chosen = rm.pool.index.get_indexer(res.roster.index)
+    return players[chosen]
+
+
+def initial_assignment(league, executor):
+    assign = np.full(len(league.pool), -1, dtype=np.int64)
+    buckets = snake_buckets(league)
+    results = list(executor.map(lambda t: solve_team(league, buckets[t], t), range(league.teams)))
+    for t, picked in enumerate(results):
+        if picked is not None:
+            assign[picked] = t
+    # a bucket that could not field a team under its cap picks from every
+    # player nobody has taken yet, its own leftovers included
+    for t, picked in enumerate(results):
+        if picked is None:
+            picked = solve_team(league, np.flatnonzero(assign < 0), t)
+            if picked is None:
+                raise ValueError("could not build a roster for team slot {} from the players left; "
+                                 "the league may be infeasible, try method=\"full\"".format(t))
+            assign[picked] = t
+    return assign
+
+
+def free_slices(league, assign, groups, per_group):
+    # spreads the unassigned players over the sub-problems without overlap:
+    # half by value, half by value per dollar so there is cap room to trade
+    free = np.flatnonzero(assign < 0)
+    if len(free) == 0:
+        return [np.array([], dtype=np.int64) for _ in groups]
+    by_value = free[np.argsort(-league.values[free], kind="stable")]
+    by_ratio = free[np.argsort(-league.values[free] / np.maximum(league.costs[free], 1), kind="stable")]
+    take = per_group * len(groups)
+    ranked = pd.unique(np.concatenate([by_value[: take // 2], by_ratio[:take]]))[:take]
+    return [ranked[g::len(groups)] for g in range(len(groups))]
+
+
+def improve_group(league, assign, teams, free, objective, time_limit):
+    players = np.concatenate([np.flatnonzero(np.isin(assign, teams)), free])
+    before = group_score(league, assign, teams, objective)
+    out, status, _ = solve_assignment(league, players, teams, objective, hint=assign[players],
+                                      time_limit=time_limit)
+    if out is None:
+        return None
+    trial = assign.copy()
+    trial[players] = out
+    if group_score(league, trial, teams, objective) > before:
+        return players, out
+    return None
+
+
+def decompose(league, objective, time_limit, threads=THREADS, seed=SEED):
+    # Start from independent per-team solves on snake-dealt buckets, then
+    # repeatedly re-solve disjoint groups of LNS_TEAMS teams together with a
+    # share of the free players. Groups touch different teams and players,
+    # so each round's sub-solves run in parallel and all apply.
+    start = time.perf_counter()
+    deadline = start + time_limit
+    rng = np.random.default_rng(seed)
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        assign = initial_assignment(league, executor)
+        rounds = 0
+        stale = 0
+        while stale < PATIENCE and time.perf_counter() < deadline:
+            order = rng.permutation(league.teams)
+            if objective == "maxmin":
+                # the weakest team always leads a group
+                weakest = int(np.argmin(league.team_values(assign)))
+                order = np.concatenate([[weakest], order[order != weakest]])
+            groups = [order[i:i + LNS_TEAMS] for i in range(0, league.teams, LNS_TEAMS)]
+            frees = free_slices(league, assign, groups, FREE_PER_GROUP)
+            # groups beyond the thread count wait their turn, so the round's
+            # sub-solves share what is left of the budget
+            waves = -(-len(groups) // max(1, threads))
+            budget = min(SUB_TIME_LIMIT, max(0.1, (deadline - time.perf_counter()) / waves))
+            snapshot = assign.copy()
+            results = list(executor.map(
+                lambda g: improve_group(league, snapshot, groups[g], frees[g], objective, budget),
+                range(len(groups))))
+            improved = [r for r in results if r is not None]
+            for players, out in improved:
+                assign[players] = out
+            rounds += 1
+            stale = 0 if improved else stale + 1
+            logging.info("league LNS round %d: %d of %d groups improved", rounds, len(improved), len(groups))
+    status = "FEASIBLE" if league.valid(assign) else "UNKNOWN"
+    if status != "FEASIBLE":
+        logging.warning("league LNS: the final assignment breaks a team limit")
+    return LeagueResult(status, league, assign, "decompose", time.perf_counter() - start, rounds)
+
+
+def full(league, objective, time_limit, threads=THREADS):
+    start = time.perf_counter()
+    players = np.arange(len(league.pool))
+    out, status, gap = solve_assignment(
+        league, players, list(range(league.teams)), objective,
+        time_limit=time_limit, num_workers=max(1, threads), symmetry=True,
+    )
+    if out is None:
+        raise ValueError("no feasible league assignment ({})".format(telemetry.status_name(status)))
+    return LeagueResult(telemetry.status_name(status), league, out, "full", time.perf_counter() - start, gap=gap)
+
+
+def league_rosters(
+    df,
+    teams=None,
+    cap=CAP,
+    roster_size=ROSTER_SIZE,
+    min_forwards=MIN_FORWARDS,
+    min_defense=MIN_DEFENSEMEN,
+    objective="total",
+    method="auto",
+    time_limit=TIME_LIMIT,
+    must_exclude=None,
+    threads=THREADS,
+    seed=SEED,
+):
+    # cap, roster_size, min_forwards and min_defense take a scalar for every
+    # team or one value per team
+    if objective not in OBJECTIVES:
+        raise ValueError("unknown objective: " + str(objective))
+    if method not in METHODS:
+        raise ValueError("unknown method: " + str(method))
+    pool = prepare_pool(df, must_exclude)
+    if teams is None:
+        teams = fit_teams(pool, cap, roster_size, min_forwards, min_defense)
+        if teams < 1:
+            raise ValueError("the pool of {} players cannot field a single team".format(len(pool)))
+    league = League(pool, teams, cap, roster_size, min_forwards, min_defense)
+    league.check()
+    if method == "auto":
+        method = "full" if len(pool) * league.teams <= FULL_MAX_VARS else "decompose"
+    if method == "full":
+        return full(league, objective, time_limit, threads)
+    return decompose(league, objective, time_limit, threads, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build rosters for every team of a league at once.")
+    parser.add_argument("--input", default=IN_FILE)
+    parser.add_argument("--teams", type=int, default=None,
+                        help="number of teams (default: as many as the pool can field, up to {})".format(TEAMS))
+    parser.add_argument("--cap", type=int, default=CAP)
+    parser.add_argument("--roster-size", type=int, default=ROSTER_SIZE)
+    parser.add_argument("--min-forwards", type=int, default=MIN_FORWARDS)
+    parser.add_argument("--min-defense", type=int, default=MIN_DEFENSEMEN)
+    parser.add_argument("--objective", default="total", choices=OBJECTIVES)
+    parser.add_argument("--method", default="auto", choices=METHODS)
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+    res = league_rosters(
+        df, teams=args.teams, cap=args.cap, roster_size=args.roster_size,
+        min_forwards=args.min_forwards, min_defense=args.min_defense,
+        objective=args.objective, method=args.method, time_limit=args.time_limit,
+    )
+    res.rosters.to_csv(OUT_FILE, index=False)
+    print(res.teams.to_string())
+    print("{} teams, {} ({}, {:.1f}s, {} rounds): total value {:.3f}, weakest team {:.3f}, strongest {:.3f}".format(
+        len(res.teams), res.status, res.method, res.elapsed, res.rounds, res.total_value, res.min_value, res.max_value))
+    print("Saved ->", OUT_FILE)
+
+
+if __name__ == "__main__":
+    main()
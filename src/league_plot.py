@@ -0,0 +1,131 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# The app's "Cap vs Value" plot: every player in the dataset as a WebGL
+# (Scattergl) trace, with the optimized roster drawn on top as a second
+# trace. The league trace is built once per dataset version; a new roster
+# only rewrites the highlight trace of the widget already on the page.
+MAX_POINTS = 20_000
+# above MAX_POINTS, players are binned on a GRID x GRID lattice over
+# (cap hit, value) and the best-valued player of each cell is drawn
+GRID = int(np.sqrt(MAX_POINTS))
+CACHE_VERSIONS = 2
+GROUP_COLORS = {"F": "#1f77b4", "D": "#d62728"}
+TITLE = "Cap Hit vs Predicted Value"
+
+_points = {}
+_points_lock = threading.Lock()
+
+
+def _hover(df):
+    text = df["Name"].astype(str)
+    extra = []
+    for col in ["team", "position", "season"]:
+        if col in df.columns:
+            extra.append(df[col].astype(str))
+    if extra:
+        inner = extra[0]
+        for part in extra[1:]:
+            inner = inner + ", " + part
+        text = text + " (" + inner + ")"
+    cap = (df["cap_hit"] / 1e6).map("${:.2f}M".format)
+    value = df["pred_mp_value"].map("{:.3f}".format)
+    return text + "<br>" + cap + " | value " + value
+
+
+def downsample(df, max_points=MAX_POINTS, grid=GRID):
+    # keeps every player up to max_points, otherwise one per occupied grid
+    # cell (the highest value, so the frontier of the cloud survives) and
+    # how many players that cell stands for
+    if len(df) <= max_points:
+        return df.assign(bin_count=1)
+    x = df["cap_hit"].to_numpy(dtype=float)
+    y = df["pred_mp_value"].to_numpy(dtype=float)
+    span_x = max(x.max() - x.min(), 1e-9)
+    span_y = max(y.max() - y.min(), 1e-9)
+    cx = np.minimum(((x - x.min()) / span_x * grid).astype(np.int64), grid - 1)
+    cy = np.minimum(((y - y.min()) / span_y * grid).astype(np.int64), grid - 1)
+    cell = cx * grid + cy
+    counts = np.bincount(cell, minlength=grid * grid)
+    order = np.lexsort((-y, cell))
+    first = order[np.r_[True, cell[order][1:] != cell[order][:-1]]]
+    out = df.iloc[np.sort(first)].copy()
+    out["bin_count"] = counts[cell[np.sort(first)]]
+    return out
+
+
+def league_points(df, version=None):
+    # Plot arrays for the whole dataset, shared by every session that shows
+    # the same dataset version.
+    key = version if version is not None else id(df)
+    with _points_lock:
+        hit = _points.get(key)
+    if hit is not None:
+        return hit
+    pool = df[["Name", "cap_hit", "pred_mp_value"] + [c for c in ["team", "position", "season"] if c in df.columns]]
+    pool = pool[np.isfinite(pd.to_numeric(pool["cap_hit"], errors="coerce"))
+                & np.isfinite(pd.to_numeric(pool["pred_mp_value"], errors="coerce"))]
+    shown = downsample(pool)
+    hover = _hover(shown)
+    many = shown["bin_count"] > 1
+    if many.any():
+        hover = hover.where(~many, hover + " (+" + (shown["bin_count"] - 1).astype(str) + " similar)")
+    points = {
+        "x": shown["cap_hit"].to_numpy(dtype=float),
+        "y": shown["pred_mp_value"].to_numpy(dtype=float),
+        "text": hover.to_numpy(dtype=object),
+        "players": int(len(pool)),
+        "shown": int(len(shown)),
+    }
+    with _points_lock:
+        _points[key] = points
+        while len(_points) > CACHE_VERSIONS:
+            _points.pop(next(iter(_points)))
+    return points
+
+
+def league_figure(points, version=None):
+    import plotly.graph_objects as go
+
+    title = TITLE
+    if points["shown"] < points["players"]:
+        title = "{} ({:,} players, binned to {:,} points)".format(TITLE, points["players"], points["shown"])
+    return go.FigureWidget(
+        data=[
+            go.Scattergl(
+                x=points["x"], y=points["y"], mode="markers", name="League",
+                marker=dict(size=5, color="#9e9e9e", opacity=0.45),
+                hovertext=points["text"], hoverinfo="text",
+            ),
+            go.Scattergl(
+                x=[], y=[], mode="markers", name="Roster",
+                marker=dict(size=11, color=[], line=dict(width=1, color="black")),
+                hovertext=[], hoverinfo="text",
+            ),
+        ],
+        layout=dict(
+            title=title,
+            xaxis_title="Cap Hit ($)",
+            yaxis_title="Predicted Value",
+            dragmode="select",
+            # keeps zoom and selection across highlight updates
+            uirevision=str(version),
+        ),
+    )
+
+
+def highlight(fig, roster):
+    # rewrites only the roster trace; the league trace is left as sent
+    trace = fig.data[1]
+    if roster is None or roster.empty:
+        with fig.batch_update():
+            trace.x, trace.y, trace.hovertext = [], [], []
+            trace.marker.color = []
+        return
+    colors = roster["group"].map(GROUP_COLORS).fillna("#2ca02c") if "group" in roster.columns else "#2ca02c"
+    with fig.batch_update():
+        trace.x = roster["cap_hit"].to_numpy(dtype=float)
+        trace.y = roster["pred_mp_value"].to_numpy(dtype=float)
+        trace.hovertext = _hover(roster).to_numpy(dtype=object)
+        trace.marker.color = colors if isinstance(colors, str) else colors.tolist()
@@ -1,23 +1,62 @@
 import os
 import re
+import functools
 import unicodedata
+import numpy as np
 import pandas as pd
+from name_matcher import NameMatcher, load_overrides
+from table_io import read_table, write_table
 
 MP_FILE = "data/processed/moneypuck_clean.csv"
 SAL_FILE = "data/processed/puckpedia_salaries.csv"
 OUT_MERGED_FILE = "data/processed/player_data.csv"
 OUT_EFF_FILE = "data/processed/player_salary_efficiency.csv"
 UNMATCHED_FILE = "data/processed/unmatched_names.csv"
+MATCHES_FILE = "data/processed/name_matches.csv"
+OVERRIDES_FILE = "data/processed/name_overrides.csv"
 
 MIN_POINTS = 30
 MIN_GP = 41
 
 ALIASES = {"MITCHELL": "MITCH"}
 
+FUZZY_MATCH = True
+
+# "pandas" or "duckdb" (see merge_duckdb)
+ENGINE = os.getenv("PIPELINE_ENGINE", "pandas")
+
+KEEP_NUMERIC = [
+    "I_F_points", "I_F_goals", "I_F_primaryAssists", "I_F_xGoals",
+    "I_F_takeaways", "I_F_giveaways", "onIce_corsiPercentage",
+    "mp_value", "gs_per_game", "gs_per60", "icetime_minutes",
+    "I_F_goals_per60", "I_F_primaryAssists_per60", "I_F_secondaryAssists_per60",
+    "I_F_points_per60", "I_F_shotsOnGoal_per60", "I_F_xGoals_per60",
+    "I_F_hits_per60", "I_F_takeaways_per60", "I_F_giveaways_per60",
+]
+
+EFF_COLS = [
+    "Name", "team", "position", "season", "games_played",
+    "cap_hit", "cap_millions",
+    "I_F_points", "I_F_goals", "I_F_primaryAssists", "I_F_xGoals",
+    "I_F_takeaways", "I_F_giveaways", "onIce_corsiPercentage",
+    "mp_value", "gs_per_game", "gs_per60", "icetime_minutes",
+    "I_F_goals_per60", "I_F_primaryAssists_per60", "I_F_secondaryAssists_per60",
+    "I_F_points_per60", "I_F_shotsOnGoal_per60", "I_F_xGoals_per60",
+    "I_F_hits_per60", "I_F_takeaways_per60", "I_F_giveaways_per60",
+    "cost_per_point", "cost_per_goal", "cost_per_primary_assist", "cost_per_xgoal",
+    "net_takeaway_value", "possession_impact_index", "cost_per_corsi_above_50",
+    "cost_per_mp_value",
+]
+
 def normalize(name):
     if pd.isna(name):
         return ""
-    text = str(name)
+    return _normalize_text(str(name))
+
+# unicodedata + regex per name is the slow part; names repeat across seasons
+# and situations, so each distinct spelling is only normalized once
+@functools.lru_cache(maxsize=None)
+def _normalize_text(text):
     text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
     text = re.sub(r"[^\w\s]", " ", text)
     text = text.upper().strip()
@@ -28,6 +67,9 @@ def normalize(name):
             parts[0] = ALIASES[first]
     return " ".join(parts)
 
+def normalize_names(names):
+    return names.astype(object).map(normalize)
+
 def nz_div(num, den):
     if pd.isna(den):
         return pd.NA
@@ -35,23 +77,73 @@ def nz_div(num, den):
         return pd.NA
     return num / den
 
+def nz_div_cols(num, den):
+    # column-wise nz_div: NA wherever the denominator is NA or zero
+    num = pd.to_numeric(num, errors="coerce").astype(float)
+    den = pd.to_numeric(den, errors="coerce").astype(float)
+    return num / den.where(den != 0)
+
+def add_efficiency_metrics(df):
+    ch = df["cap_hit"]
+    take = pd.to_numeric(df["I_F_takeaways"], errors="coerce").astype(float)
+    give = pd.to_numeric(df["I_F_giveaways"], errors="coerce").astype(float)
+    if "onIce_corsiPercentage" in df.columns:
+        corsi = pd.to_numeric(df["onIce_corsiPercentage"], errors="coerce").astype(float)
+    else:
+        corsi = pd.Series(np.nan, index=df.index)
+    if "mp_value" in df.columns:
+        mpv = df["mp_value"]
+    else:
+        mpv = pd.Series(np.nan, index=df.index)
+
+    df["cost_per_point"] = nz_div_cols(ch, df["I_F_points"])
+    df["cost_per_goal"] = nz_div_cols(ch, df["I_F_goals"])
+    df["cost_per_primary_assist"] = nz_div_cols(ch, df["I_F_primaryAssists"])
+    df["cost_per_xgoal"] = nz_div_cols(ch, df["I_F_xGoals"])
+    df["net_takeaway_value"] = nz_div_cols(take - give, ch)
+    df["possession_impact_index"] = nz_div_cols(take / give.mask(give == 0, 1.0), ch)
+    above50 = (corsi - 50).clip(lower=0)
+    df["cost_per_corsi_above_50"] = nz_div_cols(ch, above50)
+    df["cost_per_mp_value"] = nz_div_cols(ch, mpv)
+    return df
+
 def safe_num(series_like, col):
     if col in series_like.columns:
         return pd.to_numeric(series_like[col], errors="coerce")
     else:
         return pd.Series(pd.NA, index=series_like.index)
 
-def main():
-    os.makedirs(os.path.dirname(OUT_MERGED_FILE), exist_ok=True)
-    os.makedirs(os.path.dirname(OUT_EFF_FILE), exist_ok=True)
-    os.makedirs(os.path.dirname(UNMATCHED_FILE), exist_ok=True)
-
-    stats = pd.read_csv(MP_FILE)
+def match_salary_keys(names, sal, weights=None):
+    # names holds one row per stats row (or per distinct name, with weights
+    # giving how many stats rows it stands for); returns the salary key each
+    # row joins on
+    if not FUZZY_MATCH:
+        return names["Name_norm"]
+    matcher = NameMatcher(
+        sal["Name_norm"],
+        positions=sal["Pos"],
+        overrides=load_overrides(OVERRIDES_FILE, normalize),
+    )
+    matches = matcher.match(names["Name_norm"], names.get("position"))
+    review = names[["Name", "team", "position"]].assign(
+        salary_name=matches["match_key"],
+        match_type=matches["match_type"],
+        match_score=matches["match_score"],
+    )
+    review = review[review["match_type"].isin(["fuzzy", "override", "ambiguous"])].drop_duplicates()
+    review.to_csv(MATCHES_FILE, index=False)
+    w = weights if weights is not None else pd.Series(1, index=names.index)
+    print("Name matches: {} exact, {} fuzzy, {} override, {} ambiguous".format(
+        *[int(w[matches["match_type"] == t].sum()) for t in ["exact", "fuzzy", "override", "ambiguous"]]))
+    return matches["match_key"]
+
+def merge_pandas():
+    stats = read_table(MP_FILE)
     stats = stats.rename(columns={"name": "Name"})
-    sal = pd.read_csv(SAL_FILE)
+    sal = read_table(SAL_FILE)
 
-    stats["Name_norm"] = stats["Name"].apply(normalize)
-    sal["Name_norm"] = sal["Name"].apply(normalize)
+    stats["Name_norm"] = normalize_names(stats["Name"])
+    sal["Name_norm"] = normalize_names(sal["Name"])
 
     if "Cap Hit" in sal.columns and "CapHit" not in sal.columns:
         sal = sal.rename(columns={"Cap Hit": "CapHit"})
@@ -59,22 +151,14 @@ def main():
     sal = sal.sort_values("CapHit", ascending=False)
     sal = sal.drop_duplicates(subset=["Name_norm"], keep="first")
 
-    cols_to_keep = ["Name_norm", "CapHit", "Pos", "Length", "Start Year"]
-    sal_small = sal[cols_to_keep]
-    merged = stats.merge(sal_small, on="Name_norm", how="left")
+    stats["sal_key"] = match_salary_keys(stats, sal)
 
-    merged.to_csv(OUT_MERGED_FILE, index=False)
-
-    if "CapHit" in merged.columns:
-        unmatched = merged[merged["CapHit"].isna()]
-        cols2 = ["Name", "team", "position", "games_played"]
-        cols2 = [c for c in cols2 if c in unmatched.columns]
-        unmatched = unmatched[cols2].drop_duplicates()
-        unmatched.to_csv(UNMATCHED_FILE, index=False)
-    else:
-        empty_df = pd.DataFrame(columns=["Name", "team", "position", "games_played"])
-        empty_df.to_csv(UNMATCHED_FILE, index=False)
+    cols_to_keep = ["Name_norm", "CapHit", "Pos", "Length", "Start Year"]
+    sal_small = sal[cols_to_keep].rename(columns={"Name_norm": "sal_key"})
+    merged = stats.merge(sal_small, on="sal_key", how="left").drop(columns=["sal_key"])
+    return merged, efficiency_frame(merged)
 
+def efficiency_frame(merged):
     df = merged.copy()
 
     if "CapHit" in df.columns:
@@ -88,16 +172,7 @@ def main():
 
     df["cap_millions"] = df["cap_hit"] / 1000000.0
 
-    keep_numeric = [
-        "I_F_points", "I_F_goals", "I_F_primaryAssists", "I_F_xGoals",
-        "I_F_takeaways", "I_F_giveaways", "onIce_corsiPercentage",
-        "mp_value", "gs_per_game", "gs_per60", "icetime_minutes",
-        "I_F_goals_per60", "I_F_primaryAssists_per60", "I_F_secondaryAssists_per60",
-        "I_F_points_per60", "I_F_shotsOnGoal_per60", "I_F_xGoals_per60",
-        "I_F_hits_per60", "I_F_takeaways_per60", "I_F_giveaways_per60",
-    ]
-
-    for col in keep_numeric:
+    for col in KEEP_NUMERIC:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce")
         else:
@@ -112,83 +187,161 @@ def main():
             MIN_POINTS, MIN_GP, before, len(df))
         )
 
-    cost_per_point = []
-    cost_per_goal = []
-    cost_per_primary_assist = []
-    cost_per_xgoal = []
-    net_takeaway_value = []
-    possession_impact_index = []
-    cost_per_corsi_above_50 = []
-    cost_per_mp_value = []
-
-    for i in range(len(df)):
-        ch = df.iloc[i]["cap_hit"]
-        pts = df.iloc[i]["I_F_points"]
-        goals = df.iloc[i]["I_F_goals"]
-        pas = df.iloc[i]["I_F_primaryAssists"]
-        xg = df.iloc[i]["I_F_xGoals"]
-        take = df.iloc[i]["I_F_takeaways"]
-        give = df.iloc[i]["I_F_giveaways"]
-        corsi = df.iloc[i]["onIce_corsiPercentage"] if "onIce_corsiPercentage" in df.columns else pd.NA
-        mpv = df.iloc[i]["mp_value"] if "mp_value" in df.columns else pd.NA
-
-        cost_per_point.append(nz_div(ch, pts))
-        cost_per_goal.append(nz_div(ch, goals))
-        cost_per_primary_assist.append(nz_div(ch, pas))
-        cost_per_xgoal.append(nz_div(ch, xg))
-
-        net_takeaway_value.append(nz_div(take - give, ch))
-
-        give_for_index = give
-        if give_for_index == 0:
-            give_for_index = 1
-        possession_impact_index.append(nz_div(take / give_for_index, ch))
-
-        if pd.notna(corsi):
-            above50 = corsi - 50
-            if above50 < 0:
-                above50 = 0
-            cost_per_corsi_above_50.append(nz_div(ch, above50))
-        else:
-            cost_per_corsi_above_50.append(pd.NA)
-
-        cost_per_mp_value.append(nz_div(ch, mpv))
-
-    df["cost_per_point"] = cost_per_point
-    df["cost_per_goal"] = cost_per_goal
-    df["cost_per_primary_assist"] = cost_per_primary_assist
-    df["cost_per_xgoal"] = cost_per_xgoal
-    df["net_takeaway_value"] = net_takeaway_value
-    df["possession_impact_index"] = possession_impact_index
-    df["cost_per_corsi_above_50"] = cost_per_corsi_above_50
-    df["cost_per_mp_value"] = cost_per_mp_value
-
-    keep = [
-        "Name", "team", "position", "season", "games_played",
-        "cap_hit", "cap_millions",
-        "I_F_points", "I_F_goals", "I_F_primaryAssists", "I_F_xGoals",
-        "I_F_takeaways", "I_F_giveaways", "onIce_corsiPercentage",
-        "mp_value", "gs_per_game", "gs_per60", "icetime_minutes",
-        "I_F_goals_per60", "I_F_primaryAssists_per60", "I_F_secondaryAssists_per60",
-        "I_F_points_per60", "I_F_shotsOnGoal_per60", "I_F_xGoals_per60",
-        "I_F_hits_per60", "I_F_takeaways_per60", "I_F_giveaways_per60",
-        "cost_per_point", "cost_per_goal", "cost_per_primary_assist", "cost_per_xgoal",
-        "net_takeaway_value", "possession_impact_index", "cost_per_corsi_above_50",
-        "cost_per_mp_value",
-    ]
+    df = add_efficiency_metrics(df)
 
     final_cols = []
-    for c in keep:
+    for c in EFF_COLS:
         if c in df.columns:
             final_cols.append(c)
 
-    eff = df[final_cols].copy()
-    eff.to_csv(OUT_EFF_FILE, index=False)
-
+    return df[final_cols].copy()
+
+def merge_duckdb():
+    # Same joins, filters and ratios as merge_pandas, run as DuckDB queries
+    # over the processed tables. Name normalization and matching stay in
+    # Python, on the distinct names only, and are handed to DuckDB as tables.
+    # Both outputs are streamed to disk from DuckDB; only the unmatched list
+    # comes back to pandas. Returns the salary match rate.
+    import duckdb_engine
+    from duckdb_engine import ident, fetch
+
+    con = duckdb_engine.connect()
+    try:
+        stats_src = duckdb_engine.table_source(MP_FILE)
+        stats_cols = duckdb_engine.columns_of(con, stats_src)
+        select = ", ".join(
+            ident(c) + (' AS "Name"' if c == "name" else "") for c in stats_cols
+        )
+        con.execute("CREATE TEMP TABLE stats AS SELECT row_number() OVER () AS _row, {} FROM {}".format(
+            select, stats_src))
+
+        sal_src = duckdb_engine.table_source(SAL_FILE)
+        sal_cols = duckdb_engine.columns_of(con, sal_src)
+        sal_select = ", ".join(
+            ident(c) + (' AS "CapHit"' if c == "Cap Hit" and "CapHit" not in sal_cols else "")
+            for c in sal_cols
+        )
+        con.execute("CREATE TEMP TABLE sal_raw AS SELECT row_number() OVER () AS _row, {} FROM {}".format(
+            sal_select, sal_src))
+
+        sal_names = fetch(con, 'SELECT DISTINCT "Name" FROM sal_raw WHERE "Name" IS NOT NULL', schema=False)
+        sal_names["Name_norm"] = normalize_names(sal_names["Name"])
+        con.register("sal_names", sal_names)
+        # top CapHit per normalized name, ties in file order
+        con.execute("""
+            CREATE TEMP TABLE sal AS
+            SELECT s.*, COALESCE(m.Name_norm, '') AS Name_norm
+            FROM sal_raw s LEFT JOIN sal_names m ON s."Name" = m."Name"
+            QUALIFY row_number() OVER (
+                PARTITION BY COALESCE(m.Name_norm, '') ORDER BY CAST(s."CapHit" AS DOUBLE) DESC NULLS LAST, s._row
+            ) = 1
+        """)
+        sal_extra = ', "Team"' if "Team" in sal_cols else ""
+        sal = fetch(con, 'SELECT Name_norm, "Pos"{} FROM sal ORDER BY CAST("CapHit" AS DOUBLE) DESC NULLS LAST, _row'.format(
+            sal_extra))
+
+        names = fetch(con, """
+            SELECT "Name", team, position, min(_row) AS _first, count(*) AS n
+            FROM stats GROUP BY ALL ORDER BY _first
+        """)
+        names["Name_norm"] = normalize_names(names["Name"])
+        names["sal_key"] = match_salary_keys(names, sal, weights=names["n"])
+        keys = names[["Name", "team", "position", "Name_norm", "sal_key"]].astype(object)
+        con.register("name_keys", keys)
+
+        same = " AND ".join("st.{0} IS NOT DISTINCT FROM k.{0}".format(ident(c)) for c in ["Name", "team", "position"])
+        con.execute("""
+            CREATE TEMP TABLE merged AS
+            SELECT st.*, k.Name_norm, s."CapHit", s."Pos", s."Length", s."Start Year"
+            FROM stats st
+            LEFT JOIN name_keys k ON {same}
+            LEFT JOIN sal s ON s.Name_norm = k.sal_key
+            ORDER BY st._row
+        """.format(same=same))
+        merged_cols = set(duckdb_engine.columns_of(con, "merged")) - {"_row"}
+        duckdb_engine.stream_table(con, "SELECT * EXCLUDE (_row) FROM merged ORDER BY _row", OUT_MERGED_FILE)
+        unmatched_cols = [c for c in ["Name", "team", "position", "games_played"] if c in merged_cols]
+        write_unmatched(fetch(con, 'SELECT {}, "CapHit" FROM merged WHERE "CapHit" IS NULL ORDER BY _row'.format(
+            ", ".join(ident(c) for c in unmatched_cols))))
+        match_rate = con.execute(
+            'SELECT coalesce(avg(CASE WHEN "CapHit" IS NOT NULL THEN 100.0 ELSE 0.0 END), 0.0) FROM merged'
+        ).fetchone()[0]
+        before = con.execute(
+            'SELECT count(*) FROM merged WHERE TRY_CAST("CapHit" AS DOUBLE) > 0'
+        ).fetchone()[0]
+
+        def num(col):
+            return "CAST({} AS DOUBLE)".format(ident(col)) if col in merged_cols else "NULL::DOUBLE"
+
+        def ratio(a, b):
+            return "{} / NULLIF({}, 0)".format(a, b)
+
+        metrics = {
+            "cost_per_point": ratio("cap_hit", num("I_F_points")),
+            "cost_per_goal": ratio("cap_hit", num("I_F_goals")),
+            "cost_per_primary_assist": ratio("cap_hit", num("I_F_primaryAssists")),
+            "cost_per_xgoal": ratio("cap_hit", num("I_F_xGoals")),
+            "net_takeaway_value": ratio(
+                "({} - {})".format(num("I_F_takeaways"), num("I_F_giveaways")), "cap_hit"),
+            "possession_impact_index": ratio("({} / CASE WHEN {} = 0 THEN 1.0::DOUBLE ELSE {} END)".format(
+                num("I_F_takeaways"), num("I_F_giveaways"), num("I_F_giveaways")), "cap_hit"),
+            "cost_per_corsi_above_50": ratio(
+                "cap_hit", "GREATEST({} - 50.0::DOUBLE, 0.0::DOUBLE)".format(num("onIce_corsiPercentage"))),
+            "cost_per_mp_value": ratio("cap_hit", num("mp_value")),
+        }
+        derived = {"cap_hit": None, "cap_millions": "cap_hit / 1000000.0::DOUBLE"}
+        derived.update(metrics)
+        select = []
+        for c in EFF_COLS:
+            if c in derived:
+                select.append("{} AS {}".format(derived[c] or "cap_hit", ident(c)))
+            elif c in merged_cols:
+                select.append(ident(c))
+            elif c in KEEP_NUMERIC:
+                select.append("NULL AS " + ident(c))
+        where = ["cap_hit IS NOT NULL", "cap_hit > 0"]
+        if "I_F_points" in merged_cols and "games_played" in merged_cols:
+            where += ["I_F_points >= {}".format(MIN_POINTS), "games_played >= {}".format(MIN_GP)]
+        rows, _ = duckdb_engine.stream_table(con, """
+            WITH m AS (SELECT *, TRY_CAST("CapHit" AS DOUBLE) AS cap_hit FROM merged)
+            SELECT {} FROM m WHERE {} ORDER BY _row
+        """.format(", ".join(select), " AND ".join(where)), OUT_EFF_FILE)
+        if "I_F_points" in merged_cols and "games_played" in merged_cols:
+            print("Filtered for contributors (>= {} points & >= {} GP): {} -> {} rows".format(
+                MIN_POINTS, MIN_GP, before, rows)
+            )
+    finally:
+        con.close()
+    return match_rate
+
+def write_unmatched(merged):
     if "CapHit" in merged.columns:
-        match_rate = merged["CapHit"].notna().mean() * 100
+        unmatched = merged[merged["CapHit"].isna()]
+        cols2 = ["Name", "team", "position", "games_played"]
+        cols2 = [c for c in cols2 if c in unmatched.columns]
+        unmatched = unmatched[cols2].drop_duplicates()
+        unmatched.to_csv(UNMATCHED_FILE, index=False)
+    else:
+        empty_df = pd.DataFrame(columns=["Name", "team", "position", "games_played"])
+        empty_df.to_csv(UNMATCHED_FILE, index=False)
+
+def main(engine=None):
+    os.makedirs(os.path.dirname(OUT_MERGED_FILE), exist_ok=True)
+    os.makedirs(os.path.dirname(OUT_EFF_FILE), exist_ok=True)
+    os.makedirs(os.path.dirname(UNMATCHED_FILE), exist_ok=True)
+
+    engine = engine or ENGINE
+    if engine == "duckdb":
+        match_rate = merge_duckdb()
     else:
-        match_rate = 0.0
+        merged, eff = merge_pandas()
+        write_table(merged, OUT_MERGED_FILE)
+        write_unmatched(merged)
+        write_table(eff, OUT_EFF_FILE)
+        if "CapHit" in merged.columns:
+            match_rate = merged["CapHit"].notna().mean() * 100
+        else:
+            match_rate = 0.0
 
     print("Saved base ->", OUT_MERGED_FILE)
     print("Saved efficiency ->", OUT_EFF_FILE)
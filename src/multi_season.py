@@ -0,0 +1,284 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from ortools.sat.python import cp_model
+import telemetry
+from roster_model import prepare_pool, group_minimums, add_linear, VALUE_SCALE, ROSTER_COLS
+from table_io import read_table
+
+# Plans the roster over several seasons at once. A player kept in the first
+# season stays (and counts against every season's cap) until the contract
+# runs out; after that the player can be re-signed, for a raise, one season
+# at a time. Each season has its own cap, and value in later seasons is
+# discounted.
+HORIZON = 3
+CAP = 83_500_000
+CAP_GROWTH = 0.05
+ROSTER_SIZE = 21
+MIN_FORWARDS = 12
+MIN_DEFENSEMEN = 6
+MUST_INCLUDE = ["Auston Matthews", "William Nylander"]
+MUST_EXCLUDE = ["Mitch Marner"]
+
+DISCOUNT = 0.9
+# raise per season past expiry on a re-signed contract; None keeps expired
+# players off the plan
+RESIGN_RAISE = 0.05
+# seasons assumed left on a contract the salary data does not cover
+DEFAULT_YEARS = 1
+
+TIME_LIMIT = 30
+NUM_WORKERS = 8
+
+IN_FILE = "data/processed/player_predictions.csv"
+CONTRACTS_FILE = "data/processed/player_data.csv"
+OUT_FILE = "data/processed/multi_season_plan.csv"
+CONTRACT_COLS = ["Length", "Start Year"]
+
+
+def season_label(year):
+    return "{}-{:02d}".format(int(year), (int(year) + 1) % 100)
+
+
+def default_caps(horizon, cap=CAP, growth=CAP_GROWTH):
+    return [int(round(cap * (1 + growth) ** s)) for s in range(horizon)]
+
+
+def attach_contracts(df, path=CONTRACTS_FILE):
+    # contract terms stay out of the efficiency table (and so the
+    # predictions), whose schema and row hashes they would change; they are
+    # joined from the merged player table, which keeps them from the salaries
+    if all(c in df.columns for c in CONTRACT_COLS):
+        return df
+    contracts = read_table(path)
+    keys = [c for c in ["Name", "team", "position", "season"] if c in df.columns and c in contracts.columns]
+    contracts = contracts.drop_duplicates(keys)[keys + CONTRACT_COLS]
+    return df.drop(columns=[c for c in CONTRACT_COLS if c in df.columns]).merge(contracts, on=keys, how="left")
+
+
+def years_left(df, start):
+    # seasons from start (inclusive) through the last season of the contract;
+    # "Start Year" reads like "2023-24"
+    first = pd.to_numeric(df["Start Year"].astype(str).str[:4], errors="coerce")
+    last = first + pd.to_numeric(df["Length"], errors="coerce") - 1
+    left = (last - int(start) + 1).fillna(DEFAULT_YEARS)
+    return left.clip(lower=1).to_numpy(dtype=np.int64)
+
+
+class SeasonMatrices:
+    # Everything the model needs as player x season arrays.
+
+    def __init__(self, pool, start, horizon, discount=DISCOUNT, resign_raise=RESIGN_RAISE):
+        n = len(pool)
+        seasons = np.arange(horizon)
+        self.start = int(start)
+        self.horizon = int(horizon)
+        self.left = np.minimum(years_left(pool, start), horizon)
+        under = seasons[None, :] < self.left[:, None]
+        cap_hit = pool["cap_hit"].to_numpy(dtype=float)
+        self.contract = under
+        past = np.maximum(seasons[None, :] - self.left[:, None] + 1, 0)
+        if resign_raise is None:
+            self.available = under
+            raise_ = np.ones((n, horizon))
+        else:
+            self.available = np.ones((n, horizon), dtype=bool)
+            raise_ = (1 + resign_raise) ** past
+        self.costs = np.round(cap_hit[:, None] * raise_).astype(np.int64)
+        weights = discount ** seasons
+        self.values = np.round(pool["pred_mp_value"].to_numpy(dtype=float)[:, None] * VALUE_SCALE
+                               * weights[None, :]).astype(np.int64)
+        # one variable per player for the seasons the current contract
+        # covers, then one per re-signed season. A player under contract
+        # shares season 0's variable, so is kept for the whole contract or
+        # not at all and cannot be acquired in a later season; once the
+        # contract runs out each season is picked on its own, with no tie to
+        # the seasons before it
+        self.var = np.zeros((n, horizon), dtype=np.int64)
+        self.var[:, 0] = np.arange(n)
+        count = n
+        for s in range(1, horizon):
+            fresh = ~under[:, s]
+            self.var[:, s] = self.var[:, s - 1]
+            self.var[fresh, s] = count + np.arange(int(fresh.sum()))
+            count += int(fresh.sum())
+        self.num_vars = count
+
+
+class SeasonPlan:
+    def __init__(self, status, pool, mats, selected, elapsed, gap=None):
+        self.status = status
+        self.elapsed = elapsed
+        self.gap = gap
+        self.start = mats.start
+        self.selected = selected
+        self.names = pool["Name"].to_numpy()
+        expires = np.array([season_label(mats.start + k - 1) for k in years_left(pool, mats.start)])
+        rows = []
+        cols = [c for c in ROSTER_COLS if c != "cap_hit"]
+        for s in range(mats.horizon):
+            on = selected[:, s]
+            part = pool.loc[pool.index[on], cols].copy()
+            part.insert(0, "season", season_label(mats.start + s))
+            part["cap_hit"] = mats.costs[on, s]
+            part["discounted_value"] = mats.values[on, s] / VALUE_SCALE
+            part["contract"] = np.where(mats.contract[on, s], "signed", "re-signed")
+            part["expires"] = expires[on]
+            rows.append(part.sort_values(["group", "pred_mp_value"], ascending=[True, False]))
+        self.plan = pd.concat(rows, ignore_index=True)
+        self.seasons = self.plan.groupby("season", sort=False).agg(
+            players=("Name", "size"),
+            forwards=("group", lambda g: int((g == "F").sum())),
+            defense=("group", lambda g: int((g == "D").sum())),
+            total_cap=("cap_hit", "sum"),
+            total_value=("pred_mp_value", "sum"),
+            discounted_value=("discounted_value", "sum"),
+        )
+        self.objective = float(self.plan["discounted_value"].sum())
+
+    @property
+    def feasible(self):
+        return self.status in ("OPTIMAL", "FEASIBLE")
+
+
+def build_model(mats, is_forward, caps, roster_size, min_forwards, min_defense, forced):
+    model = cp_model.CpModel()
+    proto = model.Proto()
+    # a variable is fixed at 0 when no season it stands for is available
+    open_ = np.zeros(mats.num_vars, dtype=bool)
+    np.logical_or.at(open_, mats.var.ravel(), mats.available.ravel())
+    for ok in open_:
+        var = proto.variables.add()
+        var.domain.extend([0, 1] if ok else [0, 0])
+    n = len(is_forward)
+    f_min, d_min = group_minimums(is_forward, roster_size, min_forwards, min_defense)
+    for s in range(mats.horizon):
+        col = mats.var[:, s]
+        add_linear(model, col, mats.costs[:, s], 0, caps[s])
+        add_linear(model, col, np.ones(n), roster_size, roster_size)
+        add_linear(model, col[is_forward], np.ones(int(is_forward.sum())), f_min, n)
+        add_linear(model, col[~is_forward], np.ones(int((~is_forward).sum())), d_min, n)
+    for i in np.flatnonzero(forced):
+        add_linear(model, mats.var[i, :1], [1], 1, 1)
+
+    # seasons sharing a contract variable add up into one coefficient
+    coeffs = np.bincount(mats.var.ravel(), weights=mats.values.ravel(), minlength=mats.num_vars)
+    obj = proto.objective
+    obj.vars.extend(range(mats.num_vars))
+    obj.coeffs.extend((-coeffs.astype(np.int64)).tolist())
+    obj.scaling_factor = -1
+    return model
+
+
+def hint_matrix(previous, names, start, horizon):
+    # carries an earlier plan over to this one by player name; seasons the
+    # earlier plan does not reach repeat its last season
+    hint = np.zeros((len(names), horizon), dtype=bool)
+    rows = pd.Series(np.arange(len(previous.names)), index=previous.names)
+    rows = rows[~rows.index.duplicated()]
+    row = rows.reindex(names).fillna(-1).to_numpy(dtype=np.int64)
+    known = row >= 0
+    last = previous.selected.shape[1] - 1
+    for s in range(horizon):
+        k = min(max(start + s - previous.start, 0), last)
+        hint[known, s] = previous.selected[row[known], k]
+    return hint
+
+
+def add_hint(model, mats, hint):
+    # a contract variable takes the hint of its first season
+    values = np.zeros(mats.num_vars, dtype=np.int64)
+    values[mats.var[:, ::-1].ravel()] = hint[:, ::-1].ravel()
+    model.ClearHints()
+    proto = model.Proto()
+    proto.solution_hint.vars.extend(range(mats.num_vars))
+    proto.solution_hint.values.extend(values.tolist())
+
+
+def plan_seasons(
+    df,
+    horizon=HORIZON,
+    caps=None,
+    start=None,
+    roster_size=ROSTER_SIZE,
+    min_forwards=MIN_FORWARDS,
+    min_defense=MIN_DEFENSEMEN,
+    must_include=None,
+    must_exclude=None,
+    discount=DISCOUNT,
+    resign_raise=RESIGN_RAISE,
+    time_limit=TIME_LIMIT,
+    num_workers=NUM_WORKERS,
+    warm_start=None,
+):
+    # caps: one cap per season (default: CAP growing by CAP_GROWTH); start:
+    # first season's year, default the latest season in df; warm_start: an
+    # earlier SeasonPlan to hint the search with
+    t0 = time.perf_counter()
+    caps = default_caps(horizon) if caps is None else [int(c) for c in caps]
+    if len(caps) != horizon:
+        raise ValueError("need one cap per season: got {} for {} seasons".format(len(caps), horizon))
+    df = attach_contracts(df)
+    if start is None:
+        start = int(pd.to_numeric(df["season"], errors="coerce").max()) if "season" in df.columns else 0
+    pool = prepare_pool(df, must_exclude)
+    mats = SeasonMatrices(pool, start, horizon, discount, resign_raise)
+    is_forward = pool["group"].to_numpy() == "F"
+    forced = pool["Name"].isin(must_include or []).to_numpy()
+    model = build_model(mats, is_forward, caps, roster_size, min_forwards, min_defense, forced)
+    if warm_start is not None:
+        add_hint(model, mats, hint_matrix(warm_start, pool["Name"].to_numpy(), start, horizon))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_search_workers = num_workers
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return SeasonPlan(telemetry.status_name(status), pool, mats, np.zeros((len(pool), horizon), dtype=bool),
+                          time.perf_counter() - t0)
+    sol = np.asarray(solver.ResponseProto().solution, dtype=np.int64)
+    best, bound = solver.ObjectiveValue(), solver.BestObjectiveBound()
+    return SeasonPlan(telemetry.status_name(status), pool, mats, sol[mats.var] == 1, time.perf_counter() - t0,
+                      gap=(bound - best) / max(abs(bound), 1.0))
+
+
+def plan_horizons(df, horizons, **kwargs):
+    # each horizon starts from the plan for the one before it
+    caps = kwargs.pop("caps", None)
+    plans = []
+    for h in horizons:
+        plans.append(plan_seasons(df, horizon=h, caps=None if caps is None else caps[:h],
+                                  warm_start=plans[-1] if plans else None, **kwargs))
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan the roster over several seasons.")
+    parser.add_argument("--input", default=IN_FILE)
+    parser.add_argument("--horizon", type=int, default=HORIZON)
+    parser.add_argument("--caps", default=None, help="comma-separated cap per season")
+    parser.add_argument("--start", type=int, default=None)
+    parser.add_argument("--discount", type=float, default=DISCOUNT)
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    parser.add_argument("--warm", action="store_true", help="solve shorter horizons first and warm-start from them")
+    args = parser.parse_args()
+
+    df = read_table(args.input)
+    caps = None if args.caps is None else [float(c) for c in args.caps.split(",")]
+    kwargs = dict(caps=caps, start=args.start, must_include=MUST_INCLUDE, must_exclude=MUST_EXCLUDE,
+                  discount=args.discount, time_limit=args.time_limit)
+    horizons = list(range(min(HORIZON, args.horizon), args.horizon + 1)) if args.warm else [args.horizon]
+    res = plan_horizons(df, horizons, **kwargs)[-1]
+    if not res.feasible:
+        print("No plan found with current constraints ({}).".format(res.status))
+        return
+
+    res.plan.to_csv(OUT_FILE, index=False)
+    print(res.seasons.to_string())
+    print("{} in {:.1f}s: discounted value {:.3f}".format(res.status, res.elapsed, res.objective))
+    print("Saved ->", OUT_FILE)
+
+
+if __name__ == "__main__":
+    main()
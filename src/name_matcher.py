@@ -0,0 +1,135 @@
+import os
+from collections import defaultdict
+from difflib import SequenceMatcher
+import numpy as np
+import pandas as pd
+
+MIN_SCORE = 0.88
+MIN_MARGIN = 0.03
+GROUP_PENALTY = 0.05
+MAX_CANDIDATES = 25
+MAX_POSTING = 400
+NGRAM = 3
+
+D_POSITIONS = {"D", "LD", "RD"}
+
+
+def _group(pos):
+    if pos is None or pd.isna(pos):
+        return None
+    return "D" if str(pos).upper().strip() in D_POSITIONS else "F"
+
+
+def _ngrams(key):
+    text = key.replace(" ", "")
+    if len(text) < NGRAM:
+        return {text} if text else set()
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def load_overrides(path, normalize):
+    # two columns: Name (stats spelling) and salary_name (salary spelling);
+    # an empty salary_name pins the player as unmatched
+    if not path or not os.path.exists(path):
+        return {}
+    table = pd.read_csv(path, dtype=str, keep_default_na=False)
+    out = {}
+    for name, sal_name in zip(table["Name"], table["salary_name"]):
+        out[normalize(name)] = normalize(sal_name) if sal_name.strip() else None
+    return out
+
+
+class NameMatcher:
+    # Resolves stats names to salary-table keys: override table first, then
+    # exact normalized key, then a fuzzy search restricted to a blocked
+    # candidate set (same last name, same initial + last-name prefix, or
+    # shared character trigrams), so no query is compared against every name.
+
+    def __init__(self, keys, positions=None, overrides=None):
+        self.keys = list(keys)
+        self.key_set = set(self.keys)
+        self.groups = [_group(p) for p in positions] if positions is not None else [None] * len(self.keys)
+        self.overrides = overrides or {}
+
+        self.by_last = defaultdict(list)
+        self.by_initial = defaultdict(list)
+        self.by_ngram = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            parts = key.split()
+            if not parts:
+                continue
+            last = parts[-1]
+            self.by_last[last].append(i)
+            self.by_initial[(parts[0][0], last[:3])].append(i)
+            for g in _ngrams(key):
+                self.by_ngram[g].append(i)
+
+    def candidates(self, key):
+        parts = key.split()
+        if not parts:
+            return []
+        last = parts[-1]
+        found = set(self.by_last.get(last, []))
+        found.update(self.by_initial.get((parts[0][0], last[:3]), []))
+        grams = _ngrams(key)
+        counts = defaultdict(int)
+        for g in grams:
+            posting = self.by_ngram.get(g, [])
+            if len(posting) > MAX_POSTING:
+                continue
+            for i in posting:
+                counts[i] += 1
+        need = max(1, len(grams) // 2)
+        shared = [i for i, c in counts.items() if c >= need]
+        shared.sort(key=lambda i: -counts[i])
+        found.update(shared[:MAX_CANDIDATES])
+        return list(found)
+
+    def score(self, key, i, group=None):
+        s = SequenceMatcher(None, key, self.keys[i], autojunk=False).ratio()
+        if group is not None and self.groups[i] is not None and group != self.groups[i]:
+            s -= GROUP_PENALTY
+        return s
+
+    def match_one(self, key, position=None):
+        if key in self.overrides:
+            target = self.overrides[key]
+            return (target, "override", 1.0) if target in self.key_set else (None, "override", 0.0)
+        if key in self.key_set:
+            return key, "exact", 1.0
+        group = _group(position)
+        scored = []
+        for i in self.candidates(key):
+            scored.append((self.score(key, i, group), i))
+        if not scored:
+            return None, "none", 0.0
+        scored.sort(key=lambda t: -t[0])
+        best, i = scored[0]
+        if best < MIN_SCORE:
+            return None, "none", best
+        close = [j for s, j in scored[1:] if best - s < MIN_MARGIN]
+        if close:
+            # near-tie: prefer the candidate in the same position group; give
+            # up if that still does not separate them
+            tied = [i] + close
+            same_group = [j for j in tied if group is not None and self.groups[j] == group]
+            if len(same_group) == 1:
+                return self.keys[same_group[0]], "fuzzy", best
+            return None, "ambiguous", best
+        return self.keys[i], "fuzzy", best
+
+    def match(self, keys, positions=None):
+        keys = pd.Series(keys)
+        positions = pd.Series(positions, index=keys.index) if positions is not None else pd.Series(None, index=keys.index)
+        frame = pd.DataFrame({"key": keys, "position": positions})
+        # each distinct (name, position) is resolved once
+        uniq = frame.drop_duplicates()
+        out = [self.match_one(k, p) for k, p in zip(uniq["key"], uniq["position"])]
+        uniq = uniq.assign(
+            match_key=[o[0] for o in out],
+            match_type=[o[1] for o in out],
+            match_score=np.array([o[2] for o in out], dtype=float),
+        )
+        return frame.merge(uniq, on=["key", "position"], how="left")[
+            ["match_key", "match_type", "match_score"]
+        ].set_axis(keys.index)
@@ -1,10 +1,21 @@
 import os
+import sys
+import glob
 import pandas as pd
 import numpy as np
+from table_io import TableWriter
 
 RAW_FILE = "data/raw/skaters.csv"
 OUT_FILE = "data/processed/moneypuck_clean.csv"
 
+# one or more season dumps: a glob and/or a comma-separated list of paths
+RAW_FILES = os.getenv("MONEYPUCK_FILES", RAW_FILE)
+CHUNK_ROWS = 100_000
+
+# "pandas" streams chunks through clean_frame; "duckdb" runs the same
+# cleaning as one multi-threaded query over all season files
+ENGINE = os.getenv("PIPELINE_ENGINE", "pandas")
+
 BASE_COLS = [
     "playerId", "season", "name", "team", "position", "situation",
     "games_played", "icetime", "shifts",
@@ -21,15 +32,72 @@ RATE_COLS = [
     "I_F_shotsOnGoal", "I_F_xGoals", "I_F_hits", "I_F_takeaways", "I_F_giveaways"
 ]
 
+STR_COLS = ["name", "team", "position", "situation"]
+# whole-number columns in the MoneyPuck dumps. A column with a missing value
+# anywhere in the raw files is read as float64 for every chunk, the way a
+# single read_csv of the whole file types it; the others are int64
+INT_COLS = [
+    "playerId", "season", "games_played", "icetime", "shifts",
+    "I_F_goals", "I_F_primaryAssists", "I_F_secondaryAssists", "I_F_points",
+    "I_F_shotsOnGoal", "I_F_hits", "I_F_takeaways", "I_F_giveaways",
+]
+
 def rate_per60(counts, minutes):
     result = np.where((minutes > 0) & minutes.notna(), counts / minutes, 0.0)
     return result
 
-def main():
-    os.makedirs(os.path.dirname(OUT_FILE), exist_ok=True)
-
-    df = pd.read_csv(RAW_FILE)
-
+def resolve_sources(sources):
+    if isinstance(sources, str):
+        sources = [s.strip() for s in sources.split(",") if s.strip()]
+    paths = []
+    for src in sources:
+        matches = sorted(glob.glob(src))
+        paths.extend(matches if matches else [src])
+    if not paths:
+        raise FileNotFoundError("no MoneyPuck files matched {}".format(sources))
+    return paths
+
+def column_dtypes(columns, gaps=()):
+    dtypes = {}
+    for col in columns:
+        if col in STR_COLS:
+            dtypes[col] = str
+        elif col in INT_COLS and col not in gaps:
+            dtypes[col] = "Int64"
+        else:
+            dtypes[col] = "float64"
+    return dtypes
+
+def int_gaps(paths, chunk_rows=CHUNK_ROWS):
+    # INT_COLS with a missing value in any row of any file, situation rows
+    # included; reads only those columns
+    gaps = set()
+    for path in paths:
+        header = pd.read_csv(path, nrows=0).columns
+        usecols = [c for c in INT_COLS if c in header]
+        if not usecols:
+            continue
+        for chunk in pd.read_csv(path, usecols=usecols, dtype="float64", chunksize=chunk_rows):
+            gaps.update(chunk.columns[chunk.isna().any()])
+    return gaps
+
+def iter_chunks(paths, chunk_rows=CHUNK_ROWS):
+    # Reads only BASE_COLS, with fixed dtypes, a chunk at a time, and drops
+    # non-"all" situations before anything else sees the rows.
+    gaps = int_gaps(paths, chunk_rows)
+    for path in paths:
+        header = pd.read_csv(path, nrows=0).columns
+        usecols = [c for c in BASE_COLS if c in header]
+        reader = pd.read_csv(path, usecols=usecols, dtype=column_dtypes(usecols, gaps), chunksize=chunk_rows)
+        for chunk in reader:
+            if "situation" in chunk.columns:
+                chunk = chunk[chunk["situation"] == "all"]
+            for col in INT_COLS:
+                if col in chunk.columns and col not in gaps:
+                    chunk[col] = chunk[col].astype("int64")
+            yield chunk
+
+def clean_frame(df):
     if "situation" in df.columns:
         df = df[df["situation"] == "all"].copy()
         df.drop(columns=["situation"], inplace=True, errors="ignore")
@@ -70,11 +138,103 @@ def main():
 
     df["season"] = pd.to_numeric(df["season"], errors="ignore")
     df["position"] = df["position"].astype(str)
+    return df
+
+def prepare_query(paths, header, gaps=()):
+    # SQL version of clean_frame; the column order and the fill values for
+    # missing columns follow it exactly
+    from duckdb_engine import csv_source, ident, SQL_TYPES
 
-    df.to_csv(OUT_FILE, index=False)
+    usecols = [c for c in BASE_COLS if c in header]
+    types = {c: SQL_TYPES[t] for c, t in column_dtypes(usecols, gaps).items()}
+    source = csv_source(paths, types)
 
-    print("Saved", OUT_FILE, "with", df.shape[0], "rows and", df.shape[1], "columns")
-    print("Per-60 columns:", [c for c in df.columns if c.endswith("_per60")])
+    base = []
+    for col in BASE_COLS:
+        q = ident(col)
+        if col == "situation":
+            expr = "NULL"
+        elif col in header and col in RATE_COLS:
+            expr = "COALESCE({}, 0)".format(q)
+        elif col == "position" and col in header:
+            expr = "COALESCE({}, 'nan')".format(q)
+        elif col in header:
+            expr = q
+        elif col in ["onIce_xGoalsPercentage", "onIce_corsiPercentage", "onIce_fenwickPercentage"]:
+            expr = "50.0::DOUBLE"
+        elif col.startswith("I_F_") or col in ["shifts", "ppTimeOnIce", "pkTimeOnIce", "powerPlayIcetime",
+                                               "shortHandedIcetime", "pp_toi", "pk_toi", "gameScore",
+                                               "games_played", "icetime"]:
+            expr = "0::BIGINT"
+        else:
+            expr = "NULL"
+        base.append("{} AS {}".format(expr, q))
+    where = "WHERE situation = 'all'" if "situation" in header else ""
+
+    rate = "CASE WHEN icetime_minutes > 0 THEN {} / icetime_minutes ELSE 0.0::DOUBLE END"
+    per60 = [
+        (rate.format("CAST({} AS DOUBLE)".format(ident(c))) + " AS " + ident(c + "_per60"))
+        for c in RATE_COLS
+    ]
+    base_cols = ", ".join(ident(c) for c in BASE_COLS)
+    return """
+        WITH base AS (SELECT {base} FROM {source} {where}),
+        t AS (
+            SELECT *,
+                CASE WHEN CAST(icetime AS DOUBLE) / 60.0::DOUBLE < 0 THEN NULL
+                     ELSE CAST(icetime AS DOUBLE) / 60.0::DOUBLE END AS icetime_minutes,
+                COALESCE(CAST(gameScore AS DOUBLE), 0.0::DOUBLE) AS _gs,
+                CAST(NULLIF(games_played, 0) AS DOUBLE) AS _gp
+            FROM base
+        )
+        SELECT {base_cols}, icetime_minutes,
+            COALESCE(_gs / _gp, 0.0::DOUBLE) AS gs_per_game,
+            {gs_rate} AS gs_per60,
+            {gs_rate} AS mp_value,
+            {per60}
+        FROM t
+    """.format(
+        base=", ".join(base), source=source, where=where, base_cols=base_cols,
+        gs_rate=rate.format("_gs"), per60=", ".join(per60),
+    )
+
+def prepare_duckdb(paths, out_file=OUT_FILE):
+    # streams the query result to out_file batch by batch; DuckDB spills to
+    # disk past its memory limit, so neither side holds the whole table
+    import duckdb_engine
+
+    header = set()
+    for path in paths:
+        header.update(pd.read_csv(path, nrows=0).columns)
+    con = duckdb_engine.connect()
+    try:
+        # the pandas pre-pass reads only INT_COLS and beats a DuckDB scan
+        gaps = int_gaps(paths)
+        return duckdb_engine.stream_table(con, prepare_query(paths, header, gaps), out_file, schema=False)
+    finally:
+        con.close()
+
+def main(sources=None, chunk_rows=CHUNK_ROWS, engine=None):
+    os.makedirs(os.path.dirname(OUT_FILE), exist_ok=True)
+    paths = resolve_sources(sources or RAW_FILES)
+    engine = engine or ENGINE
+
+    if engine == "duckdb":
+        rows, columns = prepare_duckdb(paths, OUT_FILE)
+        print("Read", len(paths), "file(s) with DuckDB:", ", ".join(paths))
+        print("Saved", OUT_FILE, "with", rows, "rows and", len(columns), "columns")
+        print("Per-60 columns:", [c for c in columns if c.endswith("_per60")])
+        return
+
+    # each chunk is cleaned and appended as it arrives, so memory stays at one
+    # chunk no matter how many seasons are stacked
+    with TableWriter(OUT_FILE) as out:
+        for chunk in iter_chunks(paths, chunk_rows):
+            out.write(clean_frame(chunk))
+
+    print("Read", len(paths), "file(s):", ", ".join(paths))
+    print("Saved", OUT_FILE, "with", out.rows, "rows and", len(out.columns), "columns")
+    print("Per-60 columns:", [c for c in out.columns if c.endswith("_per60")])
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:] or None)
@@ -0,0 +1,45 @@
+import numpy as np
+
+BLOCK = 1024
+
+# Player q dominates p when both are in the same F/D group, q costs no more and
+# is worth no less (ties broken by position in the pool). If p has at least
+# roster_size dominators, any roster containing p leaves one of them out, and
+# swapping it in keeps the cap, the size and the group counts while the value
+# does not drop. Among the first roster_size dominators of p in dominance
+# order none can itself be removed, so some optimal roster avoids every removed
+# player and the reduced model has the same optimum. This only holds for the
+# plain single-roster problem, not for enumeration with no-good cuts.
+
+
+def _count_reaches(vals, r, block=BLOCK):
+    # vals is already in dominance order (cheapest first, best value first on
+    # ties). For every entry, is at least r of the earlier entries >= it?
+    n = len(vals)
+    out = np.zeros(n, dtype=bool)
+    if r <= 0:
+        out[:] = True
+        return out
+    top = np.empty(0, dtype=vals.dtype)
+    for start in range(0, n, block):
+        c = vals[start:start + block]
+        # top keeps the r largest earlier values; when fewer than r of them are
+        # >= x it holds every earlier value >= x, so the count is exact
+        before = len(top) - np.searchsorted(top, c, side="left")
+        within = np.tril(c[None, :] >= c[:, None], -1).sum(axis=1)
+        out[start:start + len(c)] = before + within >= r
+        top = np.sort(np.concatenate([top, c]))[-r:]
+    return out
+
+
+def dominated_mask(values, costs, groups, forced, roster_size):
+    values = np.asarray(values)
+    costs = np.asarray(costs)
+    groups = np.asarray(groups)
+    dominated = np.zeros(len(values), dtype=bool)
+    for g in np.unique(groups):
+        idx = np.flatnonzero(groups == g)
+        order = idx[np.lexsort((idx, -values[idx], costs[idx]))]
+        dominated[order] = _count_reaches(values[order], int(roster_size))
+    return dominated & ~np.asarray(forced, dtype=bool)
+
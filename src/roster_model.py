@@ -0,0 +1,405 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from ortools.sat.python import cp_model
+import knapsack_engine
+import telemetry
+from presolve import dominated_mask
+
+VALUE_SCALE = 1000
+EXCLUDE_LEAGUE_MIN = True
+LEAGUE_MIN = 999_000
+
+TIME_LIMIT = 10
+NUM_WORKERS = 8
+ENGINE = "auto"
+ENGINES = ["auto", "cpsat", "knapsack"]
+PRESOLVE = True
+
+D_POSITIONS = ["D", "LD", "RD"]
+ROSTER_COLS = ["Name", "team", "position", "group", "cap_hit", "pred_mp_value"]
+
+
+def to_group(pos):
+    pos = str(pos).upper().strip()
+    return "D" if pos in D_POSITIONS else "F"
+
+
+def position_groups(positions):
+    pos = positions.astype(str).str.upper().str.strip()
+    return pd.Series(np.where(pos.isin(D_POSITIONS), "D", "F"), index=positions.index)
+
+
+def prepare_pool(df, must_exclude=None, exclude_league_min=EXCLUDE_LEAGUE_MIN, league_min=LEAGUE_MIN):
+    df = df.copy()
+    df["cap_hit"] = pd.to_numeric(df["cap_hit"], errors="coerce")
+    df["pred_mp_value"] = pd.to_numeric(df["pred_mp_value"], errors="coerce")
+    df = df[df["cap_hit"].notna() & (df["cap_hit"] > 0)]
+    df = df[df["pred_mp_value"].notna()]
+    df["group"] = position_groups(df["position"])
+    if exclude_league_min:
+        df = df[df["cap_hit"] > league_min]
+    if must_exclude:
+        df = df[~df["Name"].isin(must_exclude)]
+    return df
+
+
+def scaled_values(pool):
+    return (pool["pred_mp_value"].to_numpy(dtype=float) * VALUE_SCALE).astype(np.int64)
+
+
+def presolve_pool(pool, roster_size, must_include=None):
+    # Drops players that provably cannot be needed in an optimal roster; see
+    # presolve.py for the argument.
+    if len(pool) == 0:
+        return pool
+    if must_include:
+        forced = pool["Name"].isin(must_include).to_numpy()
+    else:
+        forced = np.zeros(len(pool), dtype=bool)
+    drop = dominated_mask(
+        scaled_values(pool),
+        pool["cap_hit"].to_numpy(dtype=float).astype(np.int64),
+        pool["group"].to_numpy(),
+        forced,
+        roster_size,
+    )
+    logging.info("presolve kept %d of %d players", len(pool) - int(drop.sum()), len(pool))
+    return pool[~drop]
+
+
+def group_minimums(is_forward, roster_size, min_forwards, min_defense):
+    nF = int(is_forward.sum())
+    nD = int(len(is_forward) - nF)
+    f_min = min(int(min_forwards), nF)
+    d_min = min(int(min_defense), nD)
+    while f_min + d_min > int(roster_size) and f_min > 0:
+        f_min -= 1
+    while f_min + d_min > int(roster_size) and d_min > 0:
+        d_min -= 1
+    return f_min, d_min
+
+
+def add_linear(model, var_index, coeffs, lo, hi):
+    # Writes one linear constraint straight into the proto; far cheaper than
+    # building a Python expression tree when there are thousands of terms.
+    ct = model.Proto().constraints.add()
+    ct.linear.vars.extend(var_index.tolist())
+    ct.linear.coeffs.extend(np.asarray(coeffs, dtype=np.int64).tolist())
+    ct.linear.domain.extend([int(lo), int(hi)])
+    return ct
+
+
+class RosterModel:
+    def __init__(self, pool, cap, roster_size, min_forwards, min_defense, must_include=None):
+        self.pool = pool
+        self.cap = int(cap)
+        self.roster_size = int(roster_size)
+        self.values = scaled_values(pool)
+        self.costs = pool["cap_hit"].to_numpy(dtype=float).astype(np.int64)
+        self.is_forward = pool["group"].to_numpy() == "F"
+        self.is_defense = pool["group"].to_numpy() == "D"
+        self.f_min, self.d_min = group_minimums(
+            self.is_forward, roster_size, min_forwards, min_defense
+        )
+        if must_include:
+            self.forced = pool["Name"].isin(must_include).to_numpy()
+        else:
+            self.forced = np.zeros(len(pool), dtype=bool)
+
+        self.var_index = np.arange(len(pool), dtype=np.int64)
+        self._model = None
+        self._core_size = 0
+
+    @property
+    def model(self):
+        # The CP-SAT model is only built when a CP-SAT solve (or a hint, cut or
+        # extra constraint) needs it; the knapsack engine works off the arrays.
+        if self._model is None:
+            self._build()
+        return self._model
+
+    def is_core(self):
+        if self._model is None:
+            return True
+        return len(self._model.Proto().constraints) == self._core_size
+
+    def _build(self):
+        n = len(self.pool)
+        model = cp_model.CpModel()
+        self._model = model
+        self.x = [model.NewBoolVar("x_" + str(i)) for i in range(n)]
+
+        obj = model.Proto().objective
+        obj.vars.extend(self.var_index.tolist())
+        obj.coeffs.extend((-self.values).tolist())
+        obj.scaling_factor = -1
+
+        add_linear(model, self.var_index, self.costs, 0, self.cap)
+        add_linear(model, self.var_index, np.ones(n), self.roster_size, self.roster_size)
+        add_linear(model, self.var_index[self.is_forward],
+                   np.ones(int(self.is_forward.sum())), self.f_min, n)
+        add_linear(model, self.var_index[self.is_defense],
+                   np.ones(int(self.is_defense.sum())), self.d_min, n)
+        for i in np.flatnonzero(self.forced):
+            model.Add(self.x[i] == 1)
+        self._core_size = len(model.Proto().constraints)
+
+    def add_hint(self, mask):
+        self.model.ClearHints()
+        hint = self.model.Proto().solution_hint
+        hint.vars.extend(self.var_index.tolist())
+        hint.values.extend(np.asarray(mask, dtype=np.int64).tolist())
+
+    def mask_for(self, names):
+        if names is None or len(names) == 0:
+            return np.zeros(len(self.pool), dtype=bool)
+        return self.pool["Name"].isin(list(names)).to_numpy()
+
+    def repair(self, mask):
+        # Greedily turns a previous roster into a starting point that meets the
+        # current constraints: forced players in, surplus out, group minimums
+        # and roster size filled, then cheaper swaps until the cap holds.
+        sel = np.asarray(mask, dtype=bool) | self.forced
+        vals = self.values
+        costs = self.costs
+
+        def group_count(g):
+            return int((sel & g).sum())
+
+        while sel.sum() > self.roster_size:
+            removable = sel & ~self.forced
+            if group_count(self.is_forward) <= self.f_min:
+                removable &= ~self.is_forward
+            if group_count(self.is_defense) <= self.d_min:
+                removable &= ~self.is_defense
+            if not removable.any():
+                break
+            cand = np.flatnonzero(removable)
+            sel[cand[np.argmin(vals[cand])]] = False
+
+        budget = self.cap - int(costs[sel].sum())
+        for g, need in ((self.is_forward, self.f_min), (self.is_defense, self.d_min)):
+            missing = need - group_count(g)
+            if missing <= 0:
+                continue
+            cand = np.flatnonzero(g & ~sel)
+            cand = cand[np.argsort(-vals[cand], kind="stable")]
+            slots_left = self.roster_size - int(sel.sum())
+            for i in cand:
+                if missing == 0 or slots_left == 0:
+                    break
+                if costs[i] <= budget:
+                    sel[i] = True
+                    budget -= int(costs[i])
+                    missing -= 1
+                    slots_left -= 1
+
+        if sel.sum() < self.roster_size:
+            cand = np.flatnonzero(~sel)
+            cand = cand[np.argsort(-vals[cand], kind="stable")]
+            for i in cand:
+                if sel.sum() >= self.roster_size:
+                    break
+                if costs[i] <= budget:
+                    sel[i] = True
+                    budget -= int(costs[i])
+
+        while budget < 0:
+            out = np.flatnonzero(sel & ~self.forced)
+            if len(out) == 0:
+                break
+            worst = out[np.argmax(costs[out])]
+            same = self.is_forward if self.is_forward[worst] else self.is_defense
+            cand = np.flatnonzero(same & ~sel & (costs < costs[worst]))
+            if len(cand) == 0:
+                break
+            best = cand[np.argmax(vals[cand] - (costs[cand] > costs[worst] + budget) * 10 ** 9)]
+            sel[worst] = False
+            sel[best] = True
+            budget += int(costs[worst] - costs[best])
+        return sel
+
+    def selection(self, solver):
+        sol = np.asarray(solver.ResponseProto().solution, dtype=np.int64)
+        return sol[self.var_index] == 1
+
+    def roster(self, chosen):
+        cols = list(ROSTER_COLS)
+        if "mp_value" in self.pool.columns:
+            cols.append("mp_value")
+        roster = self.pool.loc[self.pool.index[chosen], cols].copy()
+        if not roster.empty:
+            roster = roster.sort_values(["group", "pred_mp_value"], ascending=[True, False])
+        return roster
+
+
+class RosterResult:
+    def __init__(self, status, roster, objective=None):
+        self.status = status
+        self.roster = roster
+        self.objective = objective
+        if roster.empty:
+            self.total_cap = 0.0
+            self.total_value = 0.0
+        else:
+            self.total_cap = float(roster["cap_hit"].sum())
+            self.total_value = float(roster["pred_mp_value"].sum())
+
+    @property
+    def feasible(self):
+        return self.status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+    def copy(self):
+        return RosterResult(self.status, self.roster.copy(), self.objective)
+
+    def as_tuple(self):
+        return self.roster, self.total_cap, self.total_value
+
+
+class SolveControl:
+    # Shared between the thread running Solve and whoever may want to stop it.
+    # on_solution receives a RosterResult for every improving incumbent.
+
+    def __init__(self, on_solution=None):
+        self.on_solution = on_solution
+        self.cancelled = threading.Event()
+        self._solver = None
+        self._lock = threading.Lock()
+
+    def attach(self, solver):
+        with self._lock:
+            self._solver = solver
+
+    def cancel(self):
+        self.cancelled.set()
+        with self._lock:
+            if self._solver is not None:
+                self._solver.StopSearch()
+
+
+class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    def __init__(self, rm, control):
+        super().__init__()
+        self.rm = rm
+        self.control = control
+
+    def on_solution_callback(self):
+        if self.control.cancelled.is_set():
+            self.StopSearch()
+            return
+        if self.control.on_solution is None:
+            return
+        sol = np.asarray(self.Response().solution, dtype=np.int64)
+        chosen = sol[self.rm.var_index] == 1
+        self.control.on_solution(
+            RosterResult(cp_model.FEASIBLE, self.rm.roster(chosen), int(self.ObjectiveValue()))
+        )
+
+
+def make_solver(time_limit=TIME_LIMIT, num_workers=NUM_WORKERS):
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_search_workers = num_workers
+    return solver
+
+
+def knapsack_fits(rm):
+    return rm.is_core() and knapsack_engine.dp_cells(
+        rm.values, rm.is_forward, rm.forced, rm.roster_size
+    ) <= knapsack_engine.MAX_CELLS
+
+
+def solve_knapsack(rm):
+    mask = knapsack_engine.solve_knapsack(
+        rm.values, rm.costs, rm.is_forward, rm.forced,
+        rm.cap, rm.roster_size, rm.f_min, rm.d_min,
+    )
+    if mask is None:
+        return RosterResult(cp_model.INFEASIBLE, rm.roster(np.zeros(len(rm.pool), dtype=bool)))
+    return RosterResult(cp_model.OPTIMAL, rm.roster(mask), int(rm.values[mask].sum()))
+
+
+def solve_model(rm, time_limit=TIME_LIMIT, num_workers=NUM_WORKERS, control=None, engine=ENGINE):
+    # engine: "cpsat", "knapsack", or "auto" (knapsack whenever the model is
+    # the plain core problem and its DP tables fit, CP-SAT otherwise)
+    if engine not in ENGINES:
+        raise ValueError("unknown engine: " + str(engine))
+    if engine != "cpsat" and knapsack_fits(rm):
+        with telemetry.span("solve", engine="knapsack", players=len(rm.pool)) as sp:
+            res = solve_knapsack(rm)
+            sp.update(status=telemetry.status_name(res.status))
+        return res
+    if engine == "knapsack":
+        logging.info("knapsack engine cannot express this model, falling back to CP-SAT")
+    with telemetry.span("build"):
+        model = rm.model
+    solver = make_solver(time_limit, num_workers)
+    with telemetry.span("solve", engine="cpsat", players=len(rm.pool)) as sp:
+        if control is None:
+            status = solver.Solve(model)
+        else:
+            control.attach(solver)
+            if control.cancelled.is_set():
+                status = cp_model.UNKNOWN
+            else:
+                status = solver.Solve(model, IncumbentCallback(rm, control))
+            control.attach(None)
+        sp.update(**telemetry.solver_stats(solver, status, model))
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return RosterResult(status, rm.roster(np.zeros(len(rm.pool), dtype=bool)))
+    return RosterResult(status, rm.roster(rm.selection(solver)), int(solver.ObjectiveValue()))
+
+
+def solve_roster(
+    df,
+    cap,
+    roster_size,
+    min_forwards,
+    min_defense,
+    must_include=None,
+    must_exclude=None,
+    time_limit=TIME_LIMIT,
+    num_workers=NUM_WORKERS,
+    cache=None,
+    control=None,
+    hint=None,
+    engine=ENGINE,
+    presolve=PRESOLVE,
+):
+    key = None
+    if cache is not None:
+        with telemetry.span("cache") as sp:
+            key = cache.key(df, cap, roster_size, min_forwards, min_defense,
+                            must_include, must_exclude, time_limit, engine, presolve)
+            hit = cache.get(key)
+            sp.update(hit=hit is not None)
+        if hit is not None:
+            return hit
+
+    with telemetry.span("prepare", rows=len(df)) as sp:
+        pool = prepare_pool(df, must_exclude)
+        if presolve:
+            pool = presolve_pool(pool, roster_size, must_include)
+        sp.update(players=len(pool))
+    with telemetry.span("build"):
+        rm = RosterModel(pool, cap, roster_size, min_forwards, min_defense, must_include)
+        if hint is not None and len(hint) > 0 and not (engine != "cpsat" and knapsack_fits(rm)):
+            rm.add_hint(rm.repair(rm.mask_for(hint)))
+    res = solve_model(rm, time_limit, num_workers, control, engine)
+
+    # only proven answers are kept: a FEASIBLE or UNKNOWN result depends on
+    # the time limit and workers this solve got, and a search stopped by the
+    # caller is not the answer for these constraints
+    proven = res.status in (cp_model.OPTIMAL, cp_model.INFEASIBLE)
+    if key is not None and proven and not (control is not None and control.cancelled.is_set()):
+        cache.put(key, res)
+    return res
+
+
+def optimize_roster(df, cap, roster_size, min_forwards, min_defense, must_include, must_exclude,
+                    cache=None, engine=ENGINE):
+    res = solve_roster(df, cap, roster_size, min_forwards, min_defense, must_include, must_exclude,
+                       cache=cache, engine=engine)
+    return res.as_tuple()
@@ -0,0 +1,287 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from solve_cache import table_hash
+from features import CLUSTER_COLS, TARGET, NUMERIC_FEATURES, CATEGORICAL_FEATURES
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "data/processed/pipeline_state.json"
+MAX_PROCESSES = int(os.getenv("PIPELINE_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+# environment switches that change what a stage writes
+PARAM_ENV = ["PIPELINE_FORMAT", "PIPELINE_CSV", "MONEYPUCK_FILES", "CLUSTER_K", "CLUSTER_BACKEND", "MODEL_SEARCH", "MODEL_SEARCH_BUDGET",
+             "PIPELINE_ENGINE"]
+
+# the columns the training stage reads, from the lists it trains on
+TRAIN_COLS = [TARGET] + CATEGORICAL_FEATURES + NUMERIC_FEATURES
+
+
+class Stage:
+    # inputs maps a path (or glob) to the columns the stage reads from it:
+    # None hashes the whole table, "file" hashes the raw bytes. Hashing only
+    # the columns a stage reads lets e.g. training skip when salaries change
+    # for players that never reach the efficiency table.
+
+    def __init__(self, name, inputs, outputs, deps=(), code=(), source=False):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = list(deps)
+        self.code = [name] + list(code)
+        self.source = source
+
+
+STAGES = [
+    Stage(
+        "prepare_moneypuck",
+        {os.getenv("MONEYPUCK_FILES", "data/raw/skaters.csv"): "file"},
+        ["data/processed/moneypuck_clean.csv"],
+        code=["table_io", "duckdb_engine"], source=True,
+    ),
+    Stage(
+        "clean_puckpedia",
+        {"data/raw/puckpedia_raw.xlsx": "file"},
+        ["data/processed/puckpedia_salaries.csv"],
+        code=["table_io"], source=True,
+    ),
+    Stage(
+        "merge_player_data",
+        {
+            "data/processed/moneypuck_clean.csv": None,
+            "data/processed/puckpedia_salaries.csv": None,
+            "data/processed/name_overrides.csv": "file",
+        },
+        ["data/processed/player_data.csv", "data/processed/player_salary_efficiency.csv"],
+        deps=["prepare_moneypuck", "clean_puckpedia"],
+        code=["table_io", "name_matcher", "duckdb_engine"],
+    ),
+    Stage(
+        "cluster_roles",
+        {"data/processed/player_salary_efficiency.csv": ["Name", "team", "position", "cap_hit", "mp_value"] + CLUSTER_COLS},
+        ["artifacts/clusters/player_roles.csv", "artifacts/clusters/cluster_artifacts.joblib"],
+        deps=["merge_player_data"],
+        code=["table_io", "features"],
+    ),
+    Stage(
+        "train_predictive_model",
+        {"data/processed/player_salary_efficiency.csv": TRAIN_COLS},
+        ["artifacts/model/mp_value_pipeline.joblib", "artifacts/model/metrics.json"],
+        deps=["merge_player_data"],
+        code=["table_io", "features"],
+    ),
+    Stage(
+        "generate_predictions",
+        {
+            "data/processed/player_salary_efficiency.csv": None,
+            "artifacts/model/mp_value_pipeline.joblib": "file",
+            "artifacts/clusters/cluster_artifacts.joblib": "file",
+        },
+        ["data/processed/player_predictions.csv"],
+        deps=["train_predictive_model", "cluster_roles"],
+        code=["table_io", "assign_roles"],
+    ),
+]
+
+
+def _file_digest(h, path):
+    if not os.path.exists(path):
+        # optional side files such as the name overrides
+        h.update(b"<missing>")
+        return
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+
+
+def _input_paths(pattern):
+    matches = sorted(glob.glob(pattern))
+    return matches if matches else [pattern]
+
+
+def inputs_available(stage):
+    from table_io import parquet_path
+
+    for pattern, columns in stage.inputs.items():
+        for path in _input_paths(pattern):
+            if not os.path.exists(path) and not (columns != "file" and os.path.exists(parquet_path(path))):
+                return False
+    return True
+
+
+def outputs_present(stage):
+    from table_io import parquet_path
+
+    return all(os.path.exists(p) or os.path.exists(parquet_path(p)) for p in stage.outputs)
+
+
+def fingerprint(stage):
+    from table_io import read_table
+
+    h = hashlib.blake2b(digest_size=16)
+    for mod in stage.code:
+        h.update(mod.encode())
+        _file_digest(h, os.path.join(SRC_DIR, mod + ".py"))
+    h.update(json.dumps({k: os.getenv(k) for k in PARAM_ENV}, sort_keys=True).encode())
+    for pattern, columns in sorted(stage.inputs.items()):
+        for path in _input_paths(pattern):
+            h.update(path.encode())
+            if columns == "file":
+                _file_digest(h, path)
+            else:
+                df = read_table(path)
+                if columns is not None:
+                    df = df[[c for c in columns if c in df.columns]]
+                h.update(table_hash(df).encode())
+    return h.hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(state, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _run_stage(name):
+    # runs in a worker process
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    t0 = time.perf_counter()
+    try:
+        importlib.import_module(name).main()
+    except Exception:
+        return name, False, time.perf_counter() - t0, traceback.format_exc()
+    return name, True, time.perf_counter() - t0, ""
+
+
+def select(targets):
+    # the named stages plus everything upstream of them
+    by_name = {s.name: s for s in STAGES}
+    if not targets:
+        return list(STAGES)
+    keep = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in by_name:
+            raise ValueError("unknown stage: {}".format(name))
+        if name not in keep:
+            keep.add(name)
+            todo.extend(by_name[name].deps)
+    return [s for s in STAGES if s.name in keep]
+
+
+def run(targets=None, force=(), dry_run=False, processes=MAX_PROCESSES):
+    stages = select(targets)
+    selected = {s.name for s in stages}
+    force = set(force)
+    state = load_state()
+    done = set()
+    failed = set()
+    running = {}
+    pending = set()
+    report = []
+
+    executor = None
+    try:
+        while len(done) + len(failed) < len(stages):
+            blocked = [s for s in stages if s.name not in done and s.name not in failed
+                       and s.name not in running and any(d in failed for d in s.deps)]
+            for s in blocked:
+                failed.add(s.name)
+                report.append((s.name, "blocked", 0.0))
+            ready = [s for s in stages if s.name not in done and s.name not in failed
+                     and s.name not in running
+                     and all(d in done or d not in selected for d in s.deps)]
+            if not running and not ready and not blocked:
+                break
+            for s in ready:
+                if s.source and not inputs_available(s):
+                    if outputs_present(s):
+                        # raw exports are not always on disk; keep what was built
+                        done.add(s.name)
+                        report.append((s.name, "no source", 0.0))
+                    else:
+                        failed.add(s.name)
+                        report.append((s.name, "no input", 0.0))
+                    continue
+                try:
+                    fp = fingerprint(s)
+                except (OSError, ValueError) as exc:
+                    failed.add(s.name)
+                    report.append((s.name, "no input", 0.0))
+                    print("stage {}: cannot read inputs ({})".format(s.name, exc))
+                    continue
+                fresh = state.get(s.name, {}).get("fingerprint") == fp and outputs_present(s)
+                # in a dry run nothing upstream was rebuilt, so assume changes
+                fresh = fresh and not any(d in pending for d in s.deps)
+                if fresh and s.name not in force and "all" not in force:
+                    done.add(s.name)
+                    report.append((s.name, "up to date", 0.0))
+                    continue
+                if dry_run:
+                    pending.add(s.name)
+                    done.add(s.name)
+                    report.append((s.name, "would run", 0.0))
+                    continue
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+                running[s.name] = (executor.submit(_run_stage, s.name), fp)
+                print("running", s.name)
+            if not running:
+                continue
+            finished, _ = wait([f for f, _ in running.values()], return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name, ok, seconds, err = fut.result()
+                fp = running.pop(name)[1]
+                if ok:
+                    # the outputs are what downstream stages hash, so the
+                    # recorded fingerprint is the one taken before the run
+                    state[name] = {"fingerprint": fp, "seconds": round(seconds, 3), "finished": time.time()}
+                    save_state(state)
+                    done.add(name)
+                    report.append((name, "ran", seconds))
+                else:
+                    failed.add(name)
+                    report.append((name, "failed", seconds))
+                    print("stage {} failed:\n{}".format(name, err))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return report, not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the data pipeline, skipping stages whose inputs, code and settings are unchanged.")
+    parser.add_argument("stages", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--force", action="append", default=[], help="re-run a stage even if fresh ('all' for every stage)")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would run")
+    parser.add_argument("--processes", type=int, default=MAX_PROCESSES)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    report, ok = run(args.stages, args.force, args.dry_run, args.processes)
+    for name, status, seconds in report:
+        print("{:<24} {:<12} {:>7.2f}s".format(name, status, seconds))
+    print("Pipeline {} in {:.1f}s".format("finished" if ok else "FAILED", time.perf_counter() - t0))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
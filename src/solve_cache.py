@@ -0,0 +1,109 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+MAX_ENTRIES = 256
+MAX_BYTES = 32 * 1024 * 1024
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def table_hash(df):
+    # Content hash of the player table, memoized per frame object so the
+    # shared dataset frame is only hashed once per version.
+    key = id(df)
+    with _hash_lock:
+        hit = _hash_memo.get(key)
+        if hit is not None and hit[0]() is df:
+            return hit[1]
+    # imported here so the app can load this module before pandas
+    import numpy as np
+    import pandas as pd
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update("\x1f".join(map(str, df.columns)).encode())
+    h.update(np.ascontiguousarray(pd.util.hash_pandas_object(df, index=True).to_numpy()).tobytes())
+    digest = h.hexdigest()
+    with _hash_lock:
+        _hash_memo[key] = (weakref.ref(df, lambda _r, k=key: _hash_memo.pop(k, None)), digest)
+    return digest
+
+
+def _names(names):
+    if not names:
+        return ()
+    return tuple(sorted({str(n).strip() for n in names if str(n).strip() != ""}))
+
+
+def constraint_key(cap, roster_size, min_forwards, min_defense, must_include, must_exclude, *extra):
+    return (
+        int(cap),
+        int(roster_size),
+        int(min_forwards),
+        int(min_defense),
+        _names(must_include),
+        _names(must_exclude),
+    ) + tuple(extra)
+
+
+def _result_bytes(result):
+    return int(result.roster.memory_usage(index=True, deep=True).sum()) + 256
+
+
+class SolveCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, df, *constraints):
+        return (table_hash(df),) + constraint_key(*constraints)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy()
+
+    def put(self, key, result):
+        size = _result_bytes(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (result.copy(), size)
+            self.bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self.bytes -= dropped
+                self.evictions += 1
+
+    def clear(self, *_):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,180 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+# One scheduler per process for every solve the app runs. At most
+# MAX_CONCURRENT jobs run at once, sessions take turns (round robin) instead
+# of first come first served, and each job is given a share of the cores the
+# running jobs have not claimed, so a busy box runs several small solves
+# rather than oversubscribing it with 8 CP-SAT workers per click.
+CORES = int(os.getenv("SOLVER_CORES", str(os.cpu_count() or 1)))
+MAX_CONCURRENT = int(os.getenv("SOLVER_CONCURRENCY", str(max(1, min(4, CORES // 2)))))
+MAX_WORKERS = int(os.getenv("SOLVER_MAX_WORKERS", "8"))
+QUEUE_TIMEOUT = float(os.getenv("SOLVER_QUEUE_TIMEOUT", "30"))
+
+
+class QueueTimeout(RuntimeError):
+    pass
+
+
+class Job:
+    def __init__(self, session, fn, args, kwargs, max_workers):
+        self.session = session
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.max_workers = max_workers
+        self.future = Future()
+        self.submitted = time.time()
+        self.started = None
+        self.workers = None
+
+    @property
+    def wait_s(self):
+        end = self.started if self.started is not None else time.time()
+        return end - self.submitted
+
+    def cancel(self):
+        # only succeeds while the job is still queued; a running solve is
+        # stopped through its SolveControl
+        return self.future.cancel()
+
+
+class SolverPool:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, cores=CORES, max_workers=MAX_WORKERS,
+                 queue_timeout=QUEUE_TIMEOUT):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.cores = max(1, int(cores))
+        self.max_workers = max(1, int(max_workers))
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()
+        self._running = []
+        self._used = 0
+        self._threads = []
+        self._completed = 0
+        self._timed_out = 0
+
+    def submit(self, session, fn, *args, max_workers=None, **kwargs):
+        # fn is called as fn(*args, num_workers=<granted>, **kwargs)
+        job = Job(session, fn, args, kwargs, min(max_workers or self.max_workers, self.cores))
+        with self._cond:
+            self._queues.setdefault(session, deque()).append(job)
+            if not self._threads:
+                # the watchdog times out queued jobs while every worker is busy
+                self._start(self._watchdog, "solver-watchdog")
+            if len(self._threads) <= self.max_concurrent:
+                self._start(self._worker, "solver-" + str(len(self._threads) - 1))
+            self._cond.notify_all()
+        return job
+
+    def _start(self, target, name):
+        t = threading.Thread(target=target, name=name, daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    def position(self, job):
+        # 1-based place in the order the queue will be served, 0 once running
+        with self._cond:
+            if job.started is not None:
+                return 0
+            order = self._order()
+            return order.index(job) + 1 if job in order else None
+
+    def status(self):
+        with self._cond:
+            return {
+                "running": len(self._running),
+                "queued": len(self._order()),
+                "cores_used": self._used,
+                "cores": self.cores,
+                "max_concurrent": self.max_concurrent,
+                "completed": self._completed,
+                "timed_out": self._timed_out,
+            }
+
+    def _order(self):
+        # round robin over the sessions, oldest-served session first
+        queues = [[j for j in q if not j.future.cancelled()] for q in self._queues.values()]
+        order = []
+        depth = 0
+        while any(len(q) > depth for q in queues):
+            order.extend(q[depth] for q in queues if len(q) > depth)
+            depth += 1
+        return order
+
+    def _expire(self, now):
+        if self.queue_timeout is None:
+            return
+        for session in list(self._queues):
+            q = self._queues[session]
+            for job in [j for j in q if now - j.submitted > self.queue_timeout]:
+                q.remove(job)
+                if job.future.set_running_or_notify_cancel():
+                    self._timed_out += 1
+                    job.future.set_exception(QueueTimeout(
+                        "waited {:.1f}s for a free solver slot".format(now - job.submitted)))
+            if not q:
+                del self._queues[session]
+
+    def _pop(self):
+        if len(self._running) >= self.max_concurrent:
+            return None
+        while self._queues:
+            session, q = next(iter(self._queues.items()))
+            job = q.popleft()
+            # the session goes to the back of the line once it has been served
+            del self._queues[session]
+            if q:
+                self._queues[session] = q
+            if job.future.cancelled():
+                continue
+            # split the free cores with the queued jobs that can start right
+            # now, and keep one core back for every other open slot
+            open_slots = self.max_concurrent - len(self._running) - 1
+            others = min(len(self._order()), open_slots)
+            free = self.cores - self._used - (open_slots - others)
+            job.workers = max(1, min(job.max_workers, free // (1 + others)))
+            job.started = time.time()
+            self._running.append(job)
+            self._used += job.workers
+            return job
+        return None
+
+    def _next_wait(self, now):
+        if self.queue_timeout is None or not self._queues:
+            return None
+        oldest = min(j.submitted for q in self._queues.values() for j in q)
+        return max(0.01, oldest + self.queue_timeout - now)
+
+    def _watchdog(self):
+        while True:
+            with self._cond:
+                now = time.time()
+                self._expire(now)
+                self._cond.wait(self._next_wait(now))
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    self._expire(now)
+                    job = self._pop()
+                    if job is not None:
+                        break
+                    self._cond.wait(self._next_wait(now))
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(job.fn(*job.args, num_workers=job.workers, **job.kwargs))
+                    except BaseException as e:
+                        job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running.remove(job)
+                    self._used -= job.workers
+                    self._completed += 1
+                    self._cond.notify_all()
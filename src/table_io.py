@@ -0,0 +1,169 @@
+import os
+import pandas as pd
+
+# Pipeline stages hand tables to each other as typed Parquet. CSV copies are
+# still written next to them unless PIPELINE_CSV=0, and PIPELINE_FORMAT=csv
+# goes back to CSV only. Readers take the copy PIPELINE_FORMAT names, never
+# whichever file is newer, and both copies hold the same values.
+FORMAT = os.getenv("PIPELINE_FORMAT", "parquet")
+CSV_EXPORT = os.getenv("PIPELINE_CSV", "1") == "1"
+
+CATEGORY_COLS = ["team", "position", "Pos"]
+INT32_COLS = [
+    "season", "games_played", "icetime", "shifts", "GP",
+    "I_F_goals", "I_F_primaryAssists", "I_F_secondaryAssists", "I_F_points",
+    "I_F_shotsOnGoal", "I_F_hits", "I_F_takeaways", "I_F_giveaways",
+    "role_cluster",
+]
+
+
+def parquet_path(path):
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def apply_schema(df):
+    # Casts the declared columns that are present. Integer columns that hold
+    # missing values become nullable Int32; anything that will not cast
+    # cleanly (stray text, fractions) is left as it was. Floats stay float64
+    # so a Parquet read gives the same values, and row hashes, as a CSV read.
+    df = df.copy()
+    for col in CATEGORY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in INT32_COLS:
+        if col in df.columns:
+            num = pd.to_numeric(df[col], errors="coerce")
+            if num.isna().sum() != df[col].isna().sum() or (num.dropna() % 1 != 0).any():
+                continue
+            df[col] = num.astype("int32") if not num.isna().any() else num.astype("Int32")
+    return df
+
+
+def storage_frame(df):
+    # Parquet files hold plain strings for the categorical columns so chunks
+    # written separately share one schema; read_table restores the categories.
+    df = apply_schema(df)
+    for col in CATEGORY_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df
+
+
+def remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def write_table(df, path, fmt=None, csv_export=None):
+    # a copy this run does not write is removed, so no stale copy is left
+    # next to the new one
+    fmt = fmt or FORMAT
+    csv_export = CSV_EXPORT if csv_export is None else csv_export
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if fmt == "parquet":
+        storage_frame(df).to_parquet(parquet_path(path), index=False)
+        if csv_export:
+            df.to_csv(path, index=False)
+        else:
+            remove_file(path)
+    else:
+        df.to_csv(path, index=False)
+        remove_file(parquet_path(path))
+
+
+def use_parquet(path, fmt=None):
+    # the Parquet copy in parquet mode; tables only ever written as CSV (raw
+    # inputs, committed outputs) are read from the CSV
+    return (fmt or FORMAT) == "parquet" and os.path.exists(parquet_path(path))
+
+
+def read_table(path, columns=None, fmt=None):
+    if use_parquet(path, fmt):
+        return apply_schema(pd.read_parquet(parquet_path(path), columns=columns))
+    # round_trip parses each float back to the exact value to_csv wrote, as
+    # the Parquet copy holds it; the default parser can be off in the last bit
+    return apply_schema(pd.read_csv(path, usecols=columns, float_precision="round_trip"))
+
+
+class TableWriter:
+    # Appends frames to one table as they are produced, so a stage never has
+    # to hold its whole output in memory. Both copies go to temp files and
+    # replace the old ones together on close; on an error the old copies are
+    # left alone and the temp files removed.
+
+    def __init__(self, path, fmt=None, csv_export=None):
+        self.path = path
+        self.fmt = fmt or FORMAT
+        self.csv_export = CSV_EXPORT if csv_export is None else csv_export
+        self.rows = 0
+        self.columns = []
+        self._pq = None
+        self._schema = None
+        self._csv = None
+        self._pq_tmp = None
+        self._csv_tmp = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self.fmt == "parquet":
+            self._pq_tmp = parquet_path(path) + ".tmp"
+        if self.fmt != "parquet" or self.csv_export:
+            self._csv_tmp = path + ".tmp"
+            self._csv = open(self._csv_tmp, "w", newline="")
+
+    def write(self, df):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(storage_frame(df), schema=self._schema, preserve_index=False)
+            if self._pq is None:
+                self._schema = table.schema
+                self._pq = pq.ParquetWriter(self._pq_tmp, self._schema)
+            self._pq.write_table(table)
+        if self._csv is not None:
+            df.to_csv(self._csv, index=False, header=(self.rows == 0 and not self.columns))
+        self.rows += len(df)
+        self.columns = list(df.columns)
+
+    def close(self):
+        try:
+            if self.fmt == "parquet" and self._pq is None:
+                # nothing was written: an empty Parquet replaces the old copy
+                # just as the empty CSV does
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                pq.write_table(pa.table({}), self._pq_tmp)
+            self._close_files()
+            if self._csv_tmp is not None:
+                os.replace(self._csv_tmp, self.path)
+            else:
+                remove_file(self.path)
+            if self._pq_tmp is not None:
+                os.replace(self._pq_tmp, parquet_path(self.path))
+            else:
+                remove_file(parquet_path(self.path))
+        finally:
+            self._discard()
+
+    def _close_files(self):
+        if self._pq is not None:
+            self._pq.close()
+            self._pq = None
+        if self._csv is not None:
+            self._csv.close()
+            self._csv = None
+
+    def _discard(self):
+        self._close_files()
+        for tmp in [self._csv_tmp, self._pq_tmp]:
+            if tmp is not None:
+                remove_file(tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
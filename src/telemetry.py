@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+
+# Timing spans for app requests, written as one JSON object per line to the
+# app log next to the plain text lines. Each span line carries the request id,
+# so phases that run on different threads (data load on the session thread,
+# solve in the pool, rendering back on the session) group into one request.
+LOG_FILE = os.getenv("TELEMETRY_LOG", "app.log")
+ENABLED = os.getenv("TELEMETRY", "1") == "1"
+PERCENTILES = [50, 95, 99]
+
+_logger = None
+_logger_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("telemetry")
+            logger.setLevel(logging.INFO)
+            # raw JSON, not the "time level message" layout of the root logger
+            logger.propagate = False
+            handler = logging.FileHandler(LOG_FILE)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+
+def emit(record):
+    if ENABLED:
+        _get_logger().info(json.dumps(record, default=str, separators=(",", ":")))
+
+
+class Span:
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def update(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.start) * 1000.0
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.record(self.name, ms, self.attrs)
+        return False
+
+
+class _NullSpan:
+    # what span() hands out when no request is being traced
+
+    def update(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    # One optimizer (or frontier) request. finish() writes the closing line
+    # with the total time and whatever was attached along the way.
+
+    def __init__(self, name, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def annotate(self, **attrs):
+        with self._lock:
+            self.attrs.update(attrs)
+
+    def record(self, span, ms, attrs=None):
+        rec = {"ts": round(time.time(), 3), "request": self.id, "kind": self.name,
+               "span": span, "ms": round(ms, 3)}
+        if attrs:
+            rec.update(attrs)
+        emit(rec)
+
+    def finish(self, **attrs):
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.attrs.update(attrs)
+            fields = dict(self.attrs)
+        self.record("total", (time.perf_counter() - self.start) * 1000.0, fields)
+
+
+class activate:
+    # Makes trace the current one on this thread for span() / annotate().
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __enter__(self):
+        self.previous = getattr(_local, "trace", None)
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.trace = self.previous
+        return False
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+def span(name, trace=None, **attrs):
+    trace = trace or current()
+    if trace is None:
+        return NULL_SPAN
+    return trace.span(name, **attrs)
+
+
+def annotate(**attrs):
+    trace = current()
+    if trace is not None:
+        trace.annotate(**attrs)
+
+
+def status_name(status):
+    # CP-SAT statuses are enum members in current ortools, plain ints in old
+    name = getattr(status, "name", None)
+    if name:
+        return name
+    if isinstance(status, int):
+        from ortools.sat import cp_model_pb2
+        return cp_model_pb2.CpSolverStatus.Name(status)
+    return str(status)
+
+
+def solver_stats(solver, status, model=None):
+    # CP-SAT response statistics; the bound and gap only mean something once
+    # a solution exists
+    stats = {
+        "status": status_name(status),
+        "wall_s": round(solver.WallTime(), 4),
+        "branches": int(solver.NumBranches()),
+        "conflicts": int(solver.NumConflicts()),
+    }
+    if stats["status"] in ("OPTIMAL", "FEASIBLE"):
+        obj = solver.ObjectiveValue()
+        bound = solver.BestObjectiveBound()
+        stats["objective"] = obj
+        stats["bound"] = bound
+        stats["gap"] = abs(bound - obj) / max(1.0, abs(obj))
+    if model is not None:
+        proto = model.Proto()
+        stats["variables"] = len(proto.variables)
+        stats["constraints"] = len(proto.constraints)
+    return stats
+
+
+def read_records(path=LOG_FILE):
+    # span lines are the ones that parse as JSON objects; the rest of the log
+    # is skipped
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line.startswith("{"):
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if "request" in rec and "span" in rec:
+                records.append(rec)
+    return records
+
+
+def summarize(records, since=None):
+    import pandas as pd
+
+    df = pd.DataFrame(records)
+    if df.empty:
+        return df
+    if since is not None:
+        df = df[df["ts"] >= since]
+    # a phase can run more than once per request (e.g. a render per
+    # incumbent), so it is summed per request before the percentiles
+    per_request = df.groupby(["kind", "span", "request"], sort=False)["ms"].sum().reset_index()
+    rows = []
+    for (kind, name), grp in per_request.groupby(["kind", "span"], sort=False):
+        row = {"kind": kind, "span": name, "n": len(grp)}
+        for q in PERCENTILES:
+            row["p{}_ms".format(q)] = grp["ms"].quantile(q / 100.0)
+        row["max_ms"] = grp["ms"].max()
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def report(path=LOG_FILE, hours=None):
+    import pandas as pd
+
+    records = read_records(path)
+    since = time.time() - hours * 3600 if hours else None
+    table = summarize(records, since)
+    if table.empty:
+        print("No telemetry in", path)
+        return table
+    with pd.option_context("display.float_format", "{:,.1f}".format, "display.width", 200):
+        print(table.to_string(index=False))
+
+    solves = pd.DataFrame([r for r in records if r["span"] == "solve" and (since is None or r["ts"] >= since)])
+    if not solves.empty and "status" in solves.columns:
+        print()
+        print(solves.groupby(["engine", "status"]).size().rename("solves").reset_index().to_string(index=False))
+        if "gap" in solves.columns and solves["gap"].notna().any():
+            print("CP-SAT gap p50 {:.4f}  p95 {:.4f}; branches p95 {:.0f}, conflicts p95 {:.0f}".format(
+                solves["gap"].quantile(0.5), solves["gap"].quantile(0.95),
+                solves["branches"].quantile(0.95), solves["conflicts"].quantile(0.95)))
+    return table
+
+
+if __name__ == "__main__":
+    # python src/telemetry.py report [app.log] [--hours N]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize request timing spans from the app log.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("path", nargs="?", default=LOG_FILE)
+    parser.add_argument("--hours", type=float, default=None, help="only the last N hours")
+    args = parser.parse_args()
+    report(args.path, args.hours)
@@ -0,0 +1,114 @@
+import os
+import math
+import time
+import numpy as np
+import pandas as pd
+from ortools.sat.python import cp_model
+import telemetry
+from roster_model import (
+    prepare_pool, RosterModel, RosterResult, add_linear, make_solver, NUM_WORKERS,
+)
+
+K = 20
+MIN_DISTANCE = 2
+ROUND_TIME_LIMIT = 10
+
+CAP = 83_500_000
+ROSTER_SIZE = 21
+MIN_FORWARDS = 12
+MIN_DEFENSEMEN = 6
+MUST_INCLUDE = ["Auston Matthews", "William Nylander"]
+MUST_EXCLUDE = ["Mitch Marner"]
+
+OUT_FILE = "data/processed/top_rosters.csv"
+
+
+def add_no_good(rm, chosen, min_distance):
+    # Two rosters of the same size at Hamming distance d share at most
+    # roster_size - ceil(d / 2) players.
+    keep = rm.roster_size - int(math.ceil(min_distance / 2))
+    idx = rm.var_index[chosen]
+    add_linear(rm.model, idx, np.ones(len(idx)), 0, keep)
+
+
+def enumerate_rosters(rm, k=K, min_distance=MIN_DISTANCE, time_limit=ROUND_TIME_LIMIT, num_workers=NUM_WORKERS):
+    # Re-solves the same model k times, cutting off each roster found so far
+    # so the next round returns the best roster at least min_distance away.
+    # Each round is hinted with the roster before it: the cut rules that
+    # roster out, but its neighbours are where the next one usually is.
+    if min_distance < 1:
+        raise ValueError("min_distance must be at least 1")
+    results = []
+    for _ in range(int(k)):
+        solver = make_solver(time_limit, num_workers)
+        status = solver.Solve(rm.model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+        chosen = rm.selection(solver)
+        results.append(RosterResult(status, rm.roster(chosen), int(solver.ObjectiveValue())))
+        add_no_good(rm, chosen, min_distance)
+        rm.add_hint(chosen)
+    return results
+
+
+def top_k_rosters(
+    df,
+    cap=CAP,
+    roster_size=ROSTER_SIZE,
+    min_forwards=MIN_FORWARDS,
+    min_defense=MIN_DEFENSEMEN,
+    must_include=None,
+    must_exclude=None,
+    k=K,
+    min_distance=MIN_DISTANCE,
+    time_limit=ROUND_TIME_LIMIT,
+    num_workers=NUM_WORKERS,
+):
+    pool = prepare_pool(df, must_exclude)
+    rm = RosterModel(pool, cap, roster_size, min_forwards, min_defense, must_include)
+    results = enumerate_rosters(rm, k, min_distance, time_limit, num_workers)
+
+    rows = []
+    if results:
+        best = results[0]
+        for rank, res in enumerate(results, start=1):
+            rows.append({
+                "rank": rank,
+                "objective": res.objective,
+                "objective_gap": best.objective - res.objective,
+                # a round stopped by the time limit at FEASIBLE may have
+                # missed a better roster, so its gap is only an estimate
+                "status": telemetry.status_name(res.status),
+                "exact_gap": res.status == cp_model.OPTIMAL and best.status == cp_model.OPTIMAL,
+                "total_value": res.total_value,
+                "value_gap": best.total_value - res.total_value,
+                "total_cap": res.total_cap,
+                "roster": "; ".join(res.roster["Name"].tolist()),
+            })
+    summary = pd.DataFrame(rows, columns=[
+        "rank", "objective", "objective_gap", "status", "exact_gap", "total_value",
+        "value_gap", "total_cap", "roster",
+    ])
+    return summary, results
+
+
+def main():
+    from optimize_roster import load_players
+
+    df = load_players()
+    t0 = time.perf_counter()
+    summary, _ = top_k_rosters(df, must_include=MUST_INCLUDE, must_exclude=MUST_EXCLUDE)
+    elapsed = time.perf_counter() - t0
+
+    os.makedirs(os.path.dirname(OUT_FILE), exist_ok=True)
+    summary.to_csv(OUT_FILE, index=False)
+    print("Saved ->", OUT_FILE)
+    print("Enumerated {} rosters in {:.1f}s".format(len(summary), elapsed))
+    print(summary[["rank", "total_value", "value_gap", "status", "total_cap"]].to_string(index=False))
+    if not summary["exact_gap"].all():
+        print("Some rounds hit the {}s limit before proving optimality; their gaps are estimates.".format(
+            ROUND_TIME_LIMIT))
+
+
+if __name__ == "__main__":
+    main()
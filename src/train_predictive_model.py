@@ -1,5 +1,7 @@
 import os
 import json
+import time
+import argparse
 import joblib
 import numpy as np
 import pandas as pd
@@ -8,29 +10,135 @@ from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
-from sklearn.linear_model import RidgeCV
-from sklearn.model_selection import KFold, cross_validate
-from sklearn.metrics import r2_score, mean_absolute_error, make_scorer
+from sklearn.linear_model import RidgeCV, ElasticNetCV
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.model_selection import KFold
+from sklearn.metrics import r2_score, mean_absolute_error
+from joblib import Parallel, delayed
+from table_io import read_table
+from features import TARGET, NUMERIC_FEATURES, CATEGORICAL_FEATURES
 
 IN_FILE = "data/processed/player_salary_efficiency.csv"
 OUT_DIR = "artifacts/model"
 os.makedirs(OUT_DIR, exist_ok=True)
 
-TARGET = "mp_value"
+MODEL_FILE = os.path.join(OUT_DIR, "mp_value_pipeline.joblib")
+METRICS_FILE = os.path.join(OUT_DIR, "metrics.json")
+
+N_SPLITS = 5
+SEED = 42
+
+# model search: every candidate is cross-validated on the same folds, and
+# the fastest one whose mean R^2 is within TOLERANCE of the best wins
+SEARCH = os.getenv("MODEL_SEARCH", "0") == "1"
+TOLERANCE = 0.01
+BUDGET_S = float(os.getenv("MODEL_SEARCH_BUDGET", "120"))
+N_JOBS = int(os.getenv("MODEL_SEARCH_JOBS", "-1"))
+
+# cheapest first, so a tight budget still covers the linear models
+CANDIDATES = {
+    "ridge": lambda: RidgeCV(alphas=np.logspace(-3, 3, 25), cv=5),
+    "elasticnet": lambda: ElasticNetCV(l1_ratio=[0.2, 0.5, 0.8, 1.0], cv=5, random_state=SEED, max_iter=5000),
+    "kneighbors": lambda: KNeighborsRegressor(n_neighbors=10, weights="distance"),
+    "hist_gb": lambda: HistGradientBoostingRegressor(max_iter=300, learning_rate=0.05, random_state=SEED),
+    "random_forest": lambda: RandomForestRegressor(n_estimators=300, min_samples_leaf=2, random_state=SEED, n_jobs=1),
+}
+
+def make_preprocessor(numeric, categorical):
+    numeric_transformer = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="median")),
+        ("scaler", StandardScaler())
+    ])
+
+    categorical_transformer = Pipeline(steps=[
+        ("imputer", SimpleImputer(strategy="most_frequent")),
+        ("encoder", OneHotEncoder(handle_unknown="ignore"))
+    ])
 
-NUMERIC_FEATURES = [
-    "games_played", "cap_hit", "onIce_corsiPercentage", "icetime_minutes",
-    "I_F_points", "I_F_goals", "I_F_primaryAssists", "I_F_xGoals",
-    "I_F_takeaways", "I_F_giveaways",
-    "I_F_goals_per60", "I_F_primaryAssists_per60", "I_F_secondaryAssists_per60",
-    "I_F_points_per60", "I_F_shotsOnGoal_per60", "I_F_xGoals_per60",
-    "I_F_hits_per60", "I_F_takeaways_per60", "I_F_giveaways_per60"
-]
+    return ColumnTransformer(transformers=[
+        ("num", numeric_transformer, numeric),
+        ("cat", categorical_transformer, categorical)
+    ])
 
-CATEGORICAL_FEATURES = ["position"]
+def preprocess_folds(X, y, numeric, categorical):
+    # the preprocessor is fitted once per fold and the transformed arrays are
+    # shared by every candidate
+    folds = []
+    for train_idx, test_idx in KFold(n_splits=N_SPLITS, shuffle=True, random_state=SEED).split(X):
+        pre = make_preprocessor(numeric, categorical)
+        Xtr = pre.fit_transform(X.iloc[train_idx])
+        Xte = pre.transform(X.iloc[test_idx])
+        if hasattr(Xtr, "toarray"):
+            Xtr, Xte = Xtr.toarray(), Xte.toarray()
+        folds.append((Xtr, y.iloc[train_idx].to_numpy(), Xte, y.iloc[test_idx].to_numpy()))
+    return folds
+
+def fit_fold(name, fold, Xtr, ytr, Xte, yte, deadline):
+    # tasks that have not started by the deadline are skipped; ones already
+    # running are allowed to finish
+    if deadline is not None and time.time() > deadline:
+        return name, fold, None
+    model = CANDIDATES[name]()
+    t0 = time.perf_counter()
+    model.fit(Xtr, ytr)
+    fit_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    pred = model.predict(Xte)
+    predict_s = time.perf_counter() - t0
+    return name, fold, {
+        "r2": float(r2_score(yte, pred)),
+        "mae": float(mean_absolute_error(yte, pred)),
+        "fit_s": fit_s,
+        "predict_s": predict_s,
+        "alpha": float(model.alpha_) if hasattr(model, "alpha_") else None,
+    }
 
-def main():
-    df = pd.read_csv(IN_FILE)
+def search(folds, names, budget_s=BUDGET_S, n_jobs=N_JOBS):
+    deadline = time.time() + budget_s
+    tasks = [(name, i) for name in names for i in range(len(folds))]
+    results = {name: {} for name in names}
+    jobs = n_jobs if len(tasks) > 1 else 1
+    # the first candidate is the baseline and always runs to completion, so
+    # there is a model to fall back on however tight the budget
+    for name, fold, res in Parallel(n_jobs=jobs)(
+        delayed(fit_fold)(name, i, *folds[i], None if name == names[0] else deadline) for name, i in tasks
+    ):
+        if res is not None:
+            results[name][fold] = res
+
+    rows = []
+    for name in names:
+        got = [results[name][i] for i in sorted(results[name])]
+        row = {"model": name, "folds": len(got)}
+        if len(got) == len(folds):
+            r2 = np.array([g["r2"] for g in got])
+            mae = np.array([g["mae"] for g in got])
+            row.update({
+                "status": "ok",
+                "cv_r2_mean": float(np.mean(r2)),
+                "cv_r2_std": float(np.std(r2)),
+                "cv_mae_mean": float(np.mean(mae)),
+                "cv_mae_std": float(np.std(mae)),
+                "fit_s": float(np.mean([g["fit_s"] for g in got])),
+                "predict_s": float(np.mean([g["predict_s"] for g in got])),
+            })
+            if got[0]["alpha"] is not None:
+                row["best_alpha"] = got[int(np.argmax(r2))]["alpha"]
+        else:
+            row["status"] = "over budget"
+        rows.append(row)
+    return rows
+
+def select_model(rows, tolerance=TOLERANCE):
+    done = [r for r in rows if r["status"] == "ok"]
+    best = max(r["cv_r2_mean"] for r in done)
+    close = [r for r in done if r["cv_r2_mean"] >= best - tolerance]
+    return min(close, key=lambda r: r["fit_s"] + r["predict_s"])
+
+def main(search_mode=None, candidates=None, budget_s=BUDGET_S):
+    search_mode = SEARCH if search_mode is None else search_mode
+    df = read_table(IN_FILE)
     df = df[df[TARGET].notna()]
     df = df.replace([np.inf, -np.inf], np.nan)
 
@@ -47,65 +155,55 @@ def main():
     X = df[available_numeric + available_categorical].copy()
     y = df[TARGET].astype(float)
 
-    numeric_transformer = Pipeline(steps=[
-        ("imputer", SimpleImputer(strategy="median")),
-        ("scaler", StandardScaler())
-    ])
-
-    categorical_transformer = Pipeline(steps=[
-        ("imputer", SimpleImputer(strategy="most_frequent")),
-        ("encoder", OneHotEncoder(handle_unknown="ignore"))
-    ])
-
-    preprocessor = ColumnTransformer(transformers=[
-        ("num", numeric_transformer, available_numeric),
-        ("cat", categorical_transformer, available_categorical)
-    ])
+    names = list(candidates or (CANDIDATES if search_mode else ["ridge"]))
+    t0 = time.perf_counter()
+    folds = preprocess_folds(X, y, available_numeric, available_categorical)
+    rows = search(folds, names, budget_s)
+    chosen = select_model(rows)
+    search_s = time.perf_counter() - t0
 
-    ridge_model = RidgeCV(alphas=np.logspace(-3, 3, 25), cv=5)
     pipe = Pipeline(steps=[
-        ("preprocess", preprocessor),
-        ("model", ridge_model)
+        ("preprocess", make_preprocessor(available_numeric, available_categorical)),
+        ("model", CANDIDATES[chosen["model"]]())
     ])
-
-    cv_splitter = KFold(n_splits=5, shuffle=True, random_state=42)
-
-    scoring = {
-        "r2": make_scorer(r2_score),
-        "mae": make_scorer(mean_absolute_error, greater_is_better=False)
-    }
-
-    results = cross_validate(
-        pipe, X, y, cv=cv_splitter, scoring=scoring, return_estimator=True
-    )
-
-    best_index = int(np.argmax(results["test_r2"]))
-    best_alpha = float(results["estimator"][best_index].named_steps["model"].alpha_)
-
     pipe.fit(X, y)
 
     model_bundle = {
         "pipeline": pipe,
         "features": available_numeric + available_categorical,
-        "target": TARGET
+        "target": TARGET,
+        "model_name": chosen["model"],
     }
-    joblib.dump(model_bundle, os.path.join(OUT_DIR, "mp_value_ridge_pipeline.joblib"))
+    joblib.dump(model_bundle, MODEL_FILE)
 
     metrics_summary = {
         "n": int(len(df)),
         "p": int(len(available_numeric) + len(available_categorical)),
-        "cv_r2_mean": float(np.mean(results["test_r2"])),
-        "cv_r2_std": float(np.std(results["test_r2"])),
-        "cv_mae_mean": float(-np.mean(results["test_mae"])),
-        "cv_mae_std": float(np.std(-results["test_mae"])),
-        "best_alpha": best_alpha
+        "model": chosen["model"],
+        "cv_r2_mean": chosen["cv_r2_mean"],
+        "cv_r2_std": chosen["cv_r2_std"],
+        "cv_mae_mean": chosen["cv_mae_mean"],
+        "cv_mae_std": chosen["cv_mae_std"],
     }
+    if "best_alpha" in chosen:
+        metrics_summary["best_alpha"] = chosen["best_alpha"]
+    metrics_summary["search_s"] = search_s
+    metrics_summary["candidates"] = rows
 
-    with open(os.path.join(OUT_DIR, "metrics.json"), "w") as f:
+    with open(METRICS_FILE, "w") as f:
         json.dump(metrics_summary, f, indent=2)
 
-    print("Saved model ->", os.path.join(OUT_DIR, "mp_value_ridge_pipeline.joblib"))
-    print("CV summary:", metrics_summary)
+    if len(rows) > 1:
+        cols = ["model", "status", "cv_r2_mean", "cv_mae_mean", "fit_s", "predict_s"]
+        print(pd.DataFrame(rows).reindex(columns=cols).to_string(index=False))
+    print("Saved model ->", MODEL_FILE)
+    print("CV summary:", {k: v for k, v in metrics_summary.items() if k != "candidates"})
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the mp_value model.")
+    parser.add_argument("--search", action="store_true", help="cross-validate every candidate model and keep the fastest near-best one")
+    parser.add_argument("--models", default=None, help="comma-separated subset of: " + ", ".join(CANDIDATES))
+    parser.add_argument("--budget", type=float, default=BUDGET_S, help="wall-clock budget for the search in seconds")
+    args = parser.parse_args()
+    models = args.models.split(",") if args.models else None
+    main(search_mode=args.search or SEARCH, candidates=models, budget_s=args.budget)
@@ -1,9 +1,9 @@
 import os, boto3
 from pathlib import Path
 
-MODEL_PATH = Path("artifacts/model/mp_value_ridge_pipeline.joblib")
+MODEL_PATH = Path("artifacts/model/mp_value_pipeline.joblib")
 S3_BUCKET  = os.environ.get("S3_BUCKET")         
-S3_KEY     = os.environ.get("S3_MODEL_KEY", "models/mp_value_ridge_pipeline.joblib")
+S3_KEY     = os.environ.get("S3_MODEL_KEY", "models/mp_value_pipeline.joblib")
 
 def main():
     if not S3_BUCKET:
@@ -0,0 +1,22 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+def synthetic_players(n, seed=0):
+    # a fixed player table for the solver tests, kept apart from the bench
+    # generators so editing a bench cannot change what the tests check
+    rng = np.random.default_rng(seed)
+    cap_hit = np.clip(np.round(rng.lognormal(np.log(2_500_000), 0.7, size=n) / 2500) * 2500, 775_000, 14_000_000)
+    value = 0.012 + 0.05 * rng.beta(2, 4, size=n) + 0.004 * np.log(cap_hit / 775_000)
+    return pd.DataFrame({
+        "Name": ["Player " + str(i) for i in range(n)],
+        "team": rng.choice(["TOR", "MTL", "BOS", "EDM", "VAN", "NYR"], size=n),
+        "position": rng.choice(["C", "L", "R", "D"], size=n, p=[0.3, 0.2, 0.2, 0.3]),
+        "cap_hit": cap_hit,
+        "pred_mp_value": value,
+        "mp_value": value,
+    })
@@ -0,0 +1,34 @@
+import joblib
+import numpy as np
+import pandas as pd
+import cluster_roles
+from cluster_roles import cluster, CLUSTER_COLS
+
+
+def player_frame(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.normal(size=(n, len(CLUSTER_COLS))), columns=CLUSTER_COLS)
+
+
+def test_cached_fits_reused_for_same_settings(tmp_path):
+    path = tmp_path / "artifacts.joblib"
+    df = player_frame()
+    _, artifacts, refit = cluster(df, k=3, backend="kmeans", n_jobs=1, artifacts_path=path)
+    assert refit == [3]
+    joblib.dump(artifacts, path)
+    _, _, refit = cluster(df, k=3, backend="kmeans", n_jobs=1, artifacts_path=path)
+    assert refit == []
+
+
+def test_changed_seed_or_n_init_refits(tmp_path, monkeypatch):
+    path = tmp_path / "artifacts.joblib"
+    df = player_frame()
+    _, artifacts, _ = cluster(df, k=3, backend="kmeans", n_jobs=1, artifacts_path=path)
+    joblib.dump(artifacts, path)
+    monkeypatch.setattr(cluster_roles, "SEED", cluster_roles.SEED + 1)
+    _, artifacts, refit = cluster(df, k=3, backend="kmeans", n_jobs=1, artifacts_path=path)
+    assert refit == [3]
+    joblib.dump(artifacts, path)
+    monkeypatch.setattr(cluster_roles, "N_INIT", cluster_roles.N_INIT + 1)
+    _, _, refit = cluster(df, k=3, backend="kmeans", n_jobs=1, artifacts_path=path)
+    assert refit == [3]
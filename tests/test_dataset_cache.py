@@ -0,0 +1,130 @@
+import os
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from dataset_cache import DatasetCache
+
+CSV_V1 = b"Name,cap_hit,pred_mp_value\nA,1000000,0.03\nB,2000000,0.04\n"
+CSV_V2 = b"Name,cap_hit,pred_mp_value\nA,1000000,0.03\nB,2000000,0.04\nC,3000000,0.05\n"
+
+
+class StandIn:
+    # A local stand-in for the S3 object: serves one CSV with an ETag and
+    # answers If-None-Match with 304, like S3 does.
+
+    def __init__(self, body):
+        self.body = body
+        self.fail = False
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.requests.append({k.lower(): v for k, v in self.headers.items()})
+                if stand_in.fail:
+                    self.send_error(503)
+                    return
+                etag = '"' + hashlib.md5(stand_in.body).hexdigest() + '"'
+                if self.headers.get("if-none-match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(stand_in.body)))
+                self.end_headers()
+                self.wfile.write(stand_in.body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/player_predictions.csv".format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn(CSV_V1)
+    yield server
+    server.stop()
+
+
+def leftovers(cache_dir):
+    return [f for f in os.listdir(cache_dir) if f.startswith(".")]
+
+
+def test_cold_fetch_then_304(stand_in, tmp_path):
+    cache = DatasetCache(stand_in.url, cache_dir=str(tmp_path), ttl=0)
+    assert len(cache.get()) == 2
+    first = cache.version
+    assert cache.refresh() is False
+    assert stand_in.requests[-1].get("if-none-match") == cache.meta["etag"]
+    assert cache.version == first
+    assert leftovers(str(tmp_path)) == []
+
+
+def test_new_etag_installs_and_notifies(stand_in, tmp_path):
+    cache = DatasetCache(stand_in.url, cache_dir=str(tmp_path), ttl=0)
+    cache.get()
+    seen = []
+    cache.add_listener(lambda c: seen.append(c.version))
+    stand_in.body = CSV_V2
+    assert cache.refresh() is True
+    assert len(cache.get()) == 3
+    assert seen == [cache.version]
+
+
+def test_ttl_refresh_runs_in_background(stand_in, tmp_path):
+    cache = DatasetCache(stand_in.url, cache_dir=str(tmp_path), ttl=0.05)
+    cache.get()
+    stand_in.body = CSV_V2
+    time.sleep(0.1)
+    # the stale frame is served at once, the new one lands after the refresh
+    assert len(cache.get()) == 2
+    cache._refresh_thread.join(5)
+    assert len(cache.get()) == 3
+
+
+def test_offline_serves_last_snapshot(stand_in, tmp_path):
+    cache = DatasetCache(stand_in.url, cache_dir=str(tmp_path), ttl=0)
+    version = cache.get().attrs["dataset_version"]
+    stand_in.fail = True
+    assert cache.refresh() is False
+    assert cache.version == version
+    stand_in.stop()
+    # a new process with the server gone starts from the snapshot on disk
+    restarted = DatasetCache(stand_in.url, cache_dir=str(tmp_path), ttl=1e9)
+    assert len(restarted.get()) == 2
+    assert restarted.version == version
+
+
+def test_cold_start_without_server_raises(tmp_path):
+    cache = DatasetCache("http://127.0.0.1:9/missing.csv", cache_dir=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        cache.get()
+
+
+def test_seed_matches_download(stand_in, tmp_path):
+    seed = tmp_path / "seed.csv"
+    seed.write_bytes(CSV_V1)
+    cache = DatasetCache(stand_in.url, cache_dir=str(tmp_path / "cache"), ttl=0)
+    seen = []
+    cache.add_listener(lambda c: seen.append(c.version))
+    assert cache.seed(str(seed)) is True
+    seen.clear()
+    # same bytes from the server: no reinstall, and the ETag is kept for
+    # the next conditional request
+    assert cache.refresh() is False
+    assert seen == []
+    assert cache.meta["etag"]
+    assert cache.refresh() is False
+    assert "if-none-match" in stand_in.requests[-1]
@@ -0,0 +1,41 @@
+import pandas as pd
+import table_io
+import generate_predictions as gp
+
+
+def predictions():
+    df = pd.DataFrame({"Name": ["A", "B", "C"], "cap_hit": [1.0, 2.0, 3.0]})
+    df["row_hash"] = gp.row_hashes(df)
+    df["pred_mp_value"] = [0.1, 0.2, 0.3]
+    df["model_version"] = "v1"
+    return df
+
+
+def saved(tmp_path, monkeypatch, df):
+    path = str(tmp_path / "player_predictions.csv")
+    monkeypatch.setattr(gp, "OUT_FILE", path)
+    table_io.write_table(df, path, csv_export=True)
+    return gp.load_previous(path, "v1")
+
+
+def test_same_table_is_not_rewritten(tmp_path, monkeypatch):
+    df = predictions()
+    assert gp.unchanged(saved(tmp_path, monkeypatch, df), df)
+
+
+def test_changed_prediction_or_order_is_rewritten(tmp_path, monkeypatch):
+    df = predictions()
+    previous = saved(tmp_path, monkeypatch, df)
+    edited = df.copy()
+    edited.loc[1, "pred_mp_value"] = 0.25
+    assert not gp.unchanged(previous, edited)
+    assert not gp.unchanged(previous, df.iloc[::-1].reset_index(drop=True))
+    assert not gp.unchanged(previous, df.iloc[:2])
+    assert not gp.unchanged(None, df)
+
+
+def test_missing_copy_is_rewritten(tmp_path, monkeypatch):
+    df = predictions()
+    previous = saved(tmp_path, monkeypatch, df)
+    table_io.remove_file(table_io.parquet_path(gp.OUT_FILE))
+    assert gp.unchanged(previous, df) == (table_io.FORMAT != "parquet")
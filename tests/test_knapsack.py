@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from roster_model import prepare_pool, RosterModel, solve_model
+from conftest import synthetic_players
+
+CASES = 40
+
+
+def random_case(seed):
+    rng = np.random.default_rng(seed)
+    df = synthetic_players(int(rng.integers(40, 400)), seed=seed)
+    if rng.random() < 0.3:
+        # below replacement level: negative values the DP has to handle
+        df["pred_mp_value"] = df["pred_mp_value"] - 0.03
+    args = {
+        "cap": int(rng.integers(20_000_000, 90_000_000)),
+        "roster_size": int(rng.integers(5, 24)),
+        "min_forwards": int(rng.integers(0, 14)),
+        "min_defense": int(rng.integers(0, 8)),
+    }
+    forced = list(rng.choice(df["Name"], size=int(rng.integers(0, 3)), replace=False))
+    return df, args, forced
+
+
+def check_roster(rm, res):
+    roster = res.roster
+    assert len(roster) == rm.roster_size
+    assert roster["cap_hit"].astype("int64").sum() <= rm.cap
+    assert (roster["group"] == "F").sum() >= rm.f_min
+    assert (roster["group"] == "D").sum() >= rm.d_min
+    assert set(rm.pool.loc[rm.forced, "Name"]) <= set(roster["Name"])
+
+
+@pytest.mark.parametrize("seed", range(CASES))
+def test_knapsack_matches_cpsat(seed):
+    # the DP engine must agree with CP-SAT on feasibility and the optimal
+    # objective for random small instances
+    df, args, forced = random_case(seed)
+    pool = prepare_pool(df, exclude_league_min=False)
+    a = solve_model(RosterModel(pool, must_include=forced, **args), engine="knapsack")
+    b = solve_model(RosterModel(pool, must_include=forced, **args), engine="cpsat")
+    assert a.feasible == b.feasible
+    if a.feasible:
+        assert a.objective == b.objective
+        check_roster(RosterModel(pool, must_include=forced, **args), a)
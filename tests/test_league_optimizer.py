@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import league_optimizer as lo
+from conftest import synthetic_players
+from roster_model import prepare_pool
+
+
+@pytest.mark.parametrize("objective", lo.OBJECTIVES)
+def test_full_model_with_negative_values(objective):
+    # every player below replacement level: the team totals and z are
+    # negative, which the model's bounds must allow
+    df = synthetic_players(300)
+    df["pred_mp_value"] = df["pred_mp_value"] - 0.2
+    res = lo.league_rosters(df, teams=4, objective=objective, method="full", time_limit=5)
+    assert res.feasible
+    assert res.teams["players"].tolist() == [lo.ROSTER_SIZE] * 4
+    assert res.max_value < 0
+
+
+def test_default_team_count_fits_the_pool():
+    df = synthetic_players(250)
+    pool = prepare_pool(df)
+    n_d = int((pool["group"] == "D").sum())
+    expected = min(lo.TEAMS, len(pool) // lo.ROSTER_SIZE, (len(pool) - n_d) // lo.MIN_FORWARDS,
+                   n_d // lo.MIN_DEFENSEMEN)
+    assert lo.fit_teams(pool, lo.CAP, lo.ROSTER_SIZE, lo.MIN_FORWARDS, lo.MIN_DEFENSEMEN) == expected
+    assert lo.fit_teams(pool, lo.CAP, [20, 21, 22], lo.MIN_FORWARDS, lo.MIN_DEFENSEMEN) == 3
+    # a cap below the cheapest rosters leaves room for fewer teams
+    cheapest = pool["cap_hit"].nsmallest(2 * lo.ROSTER_SIZE).sum()
+    assert lo.fit_teams(pool, cheapest / 2, lo.ROSTER_SIZE, lo.MIN_FORWARDS, lo.MIN_DEFENSEMEN) <= 2
+
+
+def test_decompose_status_comes_from_the_assignment():
+    df = synthetic_players(300, seed=3)
+    res = lo.league_rosters(df, teams=6, method="decompose", time_limit=10)
+    assert res.status == "FEASIBLE"
+    league = lo.League(prepare_pool(df), 6, lo.CAP, lo.ROSTER_SIZE, lo.MIN_FORWARDS, lo.MIN_DEFENSEMEN)
+    assert league.valid(res.assign)
+    broken = res.assign.copy()
+    broken[np.flatnonzero(broken == 0)[0]] = -1
+    assert not league.valid(broken)
+    over = res.assign.copy()
+    over[np.flatnonzero(over < 0)[:1]] = 0
+    assert not league.valid(over)
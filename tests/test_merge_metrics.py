@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from merge_player_data import add_efficiency_metrics, nz_div
+
+SCALES = [1, 10, 100]
+METRIC_COLS = [
+    "cost_per_point", "cost_per_goal", "cost_per_primary_assist", "cost_per_xgoal",
+    "net_takeaway_value", "possession_impact_index", "cost_per_corsi_above_50",
+    "cost_per_mp_value",
+]
+
+
+def legacy_metrics(df):
+    # the per-row loop merge_player_data used before add_efficiency_metrics
+    out = {c: [] for c in METRIC_COLS}
+    for i in range(len(df)):
+        row = df.iloc[i]
+        ch = row["cap_hit"]
+        take = row["I_F_takeaways"]
+        give = row["I_F_giveaways"]
+        corsi = row["onIce_corsiPercentage"]
+        out["cost_per_point"].append(nz_div(ch, row["I_F_points"]))
+        out["cost_per_goal"].append(nz_div(ch, row["I_F_goals"]))
+        out["cost_per_primary_assist"].append(nz_div(ch, row["I_F_primaryAssists"]))
+        out["cost_per_xgoal"].append(nz_div(ch, row["I_F_xGoals"]))
+        out["net_takeaway_value"].append(nz_div(take - give, ch))
+        out["possession_impact_index"].append(nz_div(take / (give if give != 0 else 1), ch))
+        if pd.notna(corsi):
+            out["cost_per_corsi_above_50"].append(nz_div(ch, max(corsi - 50, 0)))
+        else:
+            out["cost_per_corsi_above_50"].append(pd.NA)
+        out["cost_per_mp_value"].append(nz_div(ch, row["mp_value"]))
+    df = df.copy()
+    for c in METRIC_COLS:
+        df[c] = out[c]
+    return df
+
+
+def player_frame(n=40, seed=0):
+    # the efficiency table's input columns and dtypes, plus rows that take
+    # every NA path: zero or missing denominators, corsi above 50 and zero
+    # giveaways
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Name": ["Player " + str(i) for i in range(n)],
+        "cap_hit": np.round(rng.uniform(775_000, 13_000_000, n), -4),
+        "I_F_points": rng.integers(0, 90, n),
+        "I_F_goals": rng.integers(0, 45, n),
+        "I_F_primaryAssists": rng.integers(0, 40, n),
+        "I_F_xGoals": np.round(rng.uniform(0, 40, n), 2),
+        "I_F_takeaways": rng.integers(0, 60, n),
+        "I_F_giveaways": rng.integers(0, 60, n),
+        "onIce_corsiPercentage": np.round(rng.uniform(0.4, 0.6, n), 2),
+        "mp_value": rng.uniform(-0.01, 0.06, n),
+    })
+    edge = df.head(6).copy()
+    edge["I_F_points"] = [0, 10, 10, 10, 10, 10]
+    edge["I_F_goals"] = [5, 0, 5, 5, 5, 5]
+    edge["I_F_giveaways"] = [3, 3, 0, 3, 3, 3]
+    edge["onIce_corsiPercentage"] = [0.5, 55.0, 50.0, np.nan, 51.5, 0.4]
+    edge["mp_value"] = [0.0, 0.02, np.nan, 0.01, -0.01, 0.03]
+    edge["I_F_xGoals"] = [np.nan, 1.5, 0.0, 2.0, 2.0, 2.0]
+    return pd.concat([df, edge], ignore_index=True)
+
+
+@pytest.mark.parametrize("scale", SCALES)
+def test_vectorized_metrics_match_row_loop(scale):
+    # the vectorized metrics must write the same CSV bytes as the per-row
+    # loop they replaced, edge rows included
+    df = pd.concat([player_frame()] * scale, ignore_index=True)
+    old = legacy_metrics(df)
+    new = add_efficiency_metrics(df.copy())
+    assert old.to_csv(index=False) == new.to_csv(index=False)
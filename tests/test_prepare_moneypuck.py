@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+import prepare_moneypuck
+from prepare_moneypuck import BASE_COLS, RATE_COLS, rate_per60
+
+
+def legacy_prepare(path):
+    # prepare_moneypuck's main before chunking: one read_csv of the whole
+    # file, so a column's dtype comes from every row in it
+    df = pd.read_csv(path)
+    df = df[df["situation"] == "all"].copy()
+    df.drop(columns=["situation"], inplace=True, errors="ignore")
+    for col in BASE_COLS:
+        if col not in df.columns:
+            df[col] = pd.NA
+    df = df[BASE_COLS].copy()
+    df["icetime_minutes"] = pd.to_numeric(df["icetime"], errors="coerce") / 60.0
+    df.loc[df["icetime_minutes"] < 0, "icetime_minutes"] = np.nan
+    gp = pd.to_numeric(df["games_played"], errors="coerce").replace({0: np.nan})
+    gs = pd.to_numeric(df["gameScore"], errors="coerce").fillna(0.0)
+    df["gs_per_game"] = (gs / gp).fillna(0.0)
+    df["gs_per60"] = rate_per60(gs, df["icetime_minutes"])
+    df["mp_value"] = df["gs_per60"]
+    for col in RATE_COLS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+        df[col + "_per60"] = rate_per60(df[col], df["icetime_minutes"])
+    df["position"] = df["position"].astype(str)
+    return df.to_csv(index=False)
+
+
+def raw_skaters(n=12, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"playerId": np.arange(8470000, 8470000 + n), "season": 2023,
+                       "name": ["Player " + str(i // 2) for i in range(n)],
+                       "team": rng.choice(["TOR", "MTL", "BOS"], n),
+                       "position": rng.choice(["C", "L", "R", "D"], n),
+                       "situation": ["all", "5on5"] * (n // 2),
+                       "games_played": rng.integers(1, 82, n), "icetime": rng.integers(0, 100_000, n)})
+    for col in BASE_COLS:
+        if col not in df.columns:
+            if col in prepare_moneypuck.INT_COLS:
+                df[col] = rng.integers(0, 40, n)
+            else:
+                df[col] = np.round(rng.uniform(0, 60, n), 2)
+    return df
+
+
+@pytest.mark.parametrize("engine", ["pandas", "duckdb"])
+@pytest.mark.parametrize("gap", ["I_F_goals", "games_played", "I_F_hits"])
+def test_missing_counts_match_old_output(engine, gap, tmp_path, monkeypatch):
+    # a missing value in an integer column, in an "all" row except for
+    # I_F_hits, where only a dropped situation row has it: the column is
+    # written as floats throughout, as the single full read did
+    raw = raw_skaters()
+    raw[gap] = raw[gap].astype("float64")
+    raw.loc[1 if gap == "I_F_hits" else 4, gap] = np.nan
+    path = str(tmp_path / "skaters.csv")
+    raw.to_csv(path, index=False)
+    out = str(tmp_path / "moneypuck_clean.csv")
+    monkeypatch.setattr(prepare_moneypuck, "OUT_FILE", out)
+    prepare_moneypuck.main([path], chunk_rows=3, engine=engine)
+    with open(out) as f:
+        assert f.read() == legacy_prepare(path)
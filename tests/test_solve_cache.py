@@ -0,0 +1,27 @@
+from ortools.sat.python import cp_model
+from roster_model import solve_roster
+from solve_cache import SolveCache
+from conftest import synthetic_players
+
+ARGS = (83_500_000, 21, 12, 6)
+
+
+def test_time_limited_result_is_not_cached():
+    df = synthetic_players(300, seed=1)
+    cache = SolveCache()
+    # a cutoff this short stops CP-SAT before its first solution
+    first = solve_roster(df, *ARGS, time_limit=1e-3, num_workers=1, cache=cache, engine="cpsat", presolve=False)
+    assert first.status == cp_model.UNKNOWN
+    again = solve_roster(df, *ARGS, time_limit=1e-3, num_workers=1, cache=cache, engine="cpsat", presolve=False)
+    assert again.status == cp_model.UNKNOWN
+    assert cache.hits == 0
+
+
+def test_optimal_result_is_cached():
+    df = synthetic_players(300, seed=1)
+    cache = SolveCache()
+    first = solve_roster(df, *ARGS, cache=cache, engine="cpsat")
+    assert first.status == cp_model.OPTIMAL
+    again = solve_roster(df, *ARGS, cache=cache, engine="cpsat")
+    assert cache.hits == 1
+    assert again.objective == first.objective
@@ -0,0 +1,84 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from table_io import TableWriter, read_table, write_table, parquet_path
+from solve_cache import table_hash
+
+
+def player_table(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Name": ["Player " + str(i) for i in range(n)],
+        "team": rng.choice(["TOR", "MTL", "BOS"], n),
+        "games_played": rng.integers(1, 82, n),
+        "onIce_corsiPercentage": rng.uniform(0.4, 0.6, n),
+        "gameScore": rng.normal(10, 5, n),
+    })
+
+
+def touch_later(path):
+    t = os.path.getmtime(path) + 10
+    os.utime(path, (t, t))
+
+
+def test_parquet_and_csv_reads_agree(tmp_path):
+    path = str(tmp_path / "t.csv")
+    write_table(player_table(), path, fmt="parquet", csv_export=True)
+    pq = read_table(path, fmt="parquet")
+    csv = read_table(path, fmt="csv")
+    pd.testing.assert_frame_equal(pq, csv)
+    assert table_hash(pq) == table_hash(csv)
+
+
+def test_format_not_mtime_picks_the_copy(tmp_path):
+    path = str(tmp_path / "t.csv")
+    write_table(player_table(), path, fmt="parquet", csv_export=True)
+    # a CSV edited after the Parquet is still not read in parquet mode
+    pd.DataFrame({"Name": ["edited"]}).to_csv(path, index=False)
+    touch_later(path)
+    assert len(read_table(path, fmt="parquet")) == 50
+    assert len(read_table(path, fmt="csv")) == 1
+
+
+def test_csv_write_removes_stale_parquet(tmp_path):
+    path = str(tmp_path / "t.csv")
+    write_table(player_table(), path, fmt="parquet", csv_export=True)
+    write_table(player_table(5), path, fmt="csv")
+    assert not os.path.exists(parquet_path(path))
+    assert len(read_table(path, fmt="parquet")) == 5
+
+
+def test_writer_error_keeps_old_copies(tmp_path):
+    path = str(tmp_path / "t.csv")
+    write_table(player_table(), path, fmt="parquet", csv_export=True)
+    with pytest.raises(RuntimeError):
+        with TableWriter(path, fmt="parquet", csv_export=True) as out:
+            out.write(player_table(3))
+            raise RuntimeError("stage failed")
+    assert sorted(os.listdir(tmp_path)) == ["t.csv", "t.parquet"]
+    assert len(read_table(path, fmt="parquet")) == 50
+    assert len(read_table(path, fmt="csv")) == 50
+
+
+def test_writer_without_chunks_replaces_both_copies(tmp_path):
+    path = str(tmp_path / "t.csv")
+    write_table(player_table(), path, fmt="parquet", csv_export=True)
+    with TableWriter(path, fmt="parquet", csv_export=True):
+        pass
+    assert sorted(os.listdir(tmp_path)) == ["t.csv", "t.parquet"]
+    assert len(pd.read_parquet(parquet_path(path))) == 0
+    assert os.path.getsize(path) == 0
+
+
+def test_writer_chunks_match_write_table(tmp_path):
+    df = player_table()
+    whole = str(tmp_path / "whole.csv")
+    chunked = str(tmp_path / "chunked.csv")
+    write_table(df, whole, fmt="parquet", csv_export=True)
+    with TableWriter(chunked, fmt="parquet", csv_export=True) as out:
+        for start in range(0, len(df), 7):
+            out.write(df.iloc[start:start + 7])
+    with open(whole) as a, open(chunked) as b:
+        assert a.read() == b.read()
+    pd.testing.assert_frame_equal(read_table(whole), read_table(chunked))